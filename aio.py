@@ -0,0 +1,85 @@
+"""
+Background asyncio event loop shared by the async provider calls.
+
+One daemon thread runs the loop; any thread can submit a coroutine and gets a
+concurrent.futures.Future back. Cancelling that future cancels the task on the
+loop, which raises CancelledError inside the provider's `async for` and closes
+the HTTP response. Many requests (tiles, batch pages, hedges) can run at the
+same time without a thread each.
+
+Chunks arrive on the loop thread; the app hands them to render.TextRenderer,
+which draws them on the Tk thread.
+"""
+import asyncio
+import threading
+
+
+class EventLoopThread:
+    """An asyncio event loop running forever in a daemon thread."""
+
+    def __init__(self, name="aio-loop"):
+        self.name = name
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return self
+            self.ready.clear()
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+        self.ready.wait()
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro, context=None):
+        """
+        Schedule a coroutine on the loop from any thread.
+
+        With context (contextvars.copy_context() of the caller) the coroutine
+        sees the caller's context variables, e.g. the rate limit priority.
+        """
+        self.start()
+        if context is not None:
+            coro = _run_in_context(context, coro)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, func, *args):
+        self.start()
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def stop(self):
+        with self.lock:
+            if self.loop is None or not self.thread or not self.thread.is_alive():
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            thread = self.thread
+        thread.join(timeout=5)
+
+
+async def _run_in_context(context, coro):
+    # The task has its own copy of the loop's context, only this task sees the values
+    for variable, value in context.items():
+        variable.set(value)
+    return await coro
+
+
+# Create single instance (the thread starts on first use)
+_loop_thread = EventLoopThread()
+
+def get_loop():
+    return _loop_thread
+
+def submit(coro, context=None):
+    return _loop_thread.submit(coro, context)
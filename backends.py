@@ -0,0 +1,85 @@
+"""
+Lazy provider backends.
+
+The provider modules pull in heavy SDKs (gemini.py imports google.genai and
+requests, openchat.py openai through clients.py). They are imported on first
+use, and only the ones the config actually uses: a Gemini-only setup never
+loads openai and vice versa. warm_up() imports them in a background thread
+right after startup, so the first hotkey doesn't pay for it either.
+"""
+import importlib
+import threading
+import time
+import config
+
+# Backend name -> (module, stream function, client function, async stream function)
+BACKENDS = {
+    "openai": ("openchat", "call_openai_api_stream", "call_openai_api_client", "stream_openai_async"),
+    "gemini": ("gemini", "call_gemini_api_stream", "call_gemini_api_client", "stream_gemini_async"),
+}
+
+_modules = {}
+_lock = threading.Lock()
+
+# Import time (ms) of each loaded backend
+load_ms = {}
+
+
+def backend_name(api_config):
+    # No value or not true then Gemini, otherwise OpenAI compatible
+    return "openai" if config.typed(api_config).api.openai_compatible else "gemini"
+
+"""
+Imports the backend module on first use.
+
+Returns:
+    module: openchat or gemini.
+"""
+def load(name):
+    module = _modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        module = _modules.get(name)
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(BACKENDS[name][0])
+            load_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+            _modules[name] = module
+    return module
+
+"""
+Returns:
+    tuple: (stream function, client function) of the configured backend.
+"""
+def get(api_config):
+    name = backend_name(api_config)
+    module = load(name)
+    _, stream_attr, client_attr, _ = BACKENDS[name]
+    return getattr(module, stream_attr), getattr(module, client_attr)
+
+def get_async(api_config):
+    name = backend_name(api_config)
+    return getattr(load(name), BACKENDS[name][3])
+
+"""
+Imports the backends of every provider profile in a daemon thread.
+
+Returns:
+    threading.Thread: The warm-up thread.
+"""
+def warm_up(api_config):
+    import providers
+    names = list(dict.fromkeys(backend_name(profile.api_config) for profile in providers.profiles(api_config)))
+
+    def run():
+        for name in names:
+            try:
+                load(name)
+            except Exception as e:
+                # Reported again (as a request error) when the backend is used
+                print(f"Warm-up of the {name} backend failed: {e}")
+
+    thread = threading.Thread(target=run, name="backend-warm-up", daemon=True)
+    thread.start()
+    return thread
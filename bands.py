@@ -0,0 +1,199 @@
+"""
+Parallel band translation of tall captures.
+
+A full-window capture of a long web page is split into overlapping horizontal
+bands which are sent concurrently (bounded concurrency) through the same
+stream path as a single request (rate limit, hedging, failover). The results
+are merged in reading order: a band is emitted to the stream callback as soon
+as it and every band above it are complete, and paragraphs repeated in the
+overlap zone are dropped. Cancelling the job stops the bands not sent yet.
+"""
+import asyncio
+import contextvars
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+import config
+import encoder
+import jobs
+import translate
+
+
+"""
+Computes the (top, bottom) pixel rows of overlapping bands covering the height.
+"""
+def split_bands(height, band_height, overlap):
+    band_height = max(1, band_height)
+    overlap = min(max(0, overlap), band_height // 2)
+    bands = []
+    top = 0
+    while True:
+        bottom = min(height, top + band_height)
+        bands.append((top, bottom))
+        if bottom >= height:
+            break
+        top = bottom - overlap
+    return bands
+
+def split_paragraphs(text):
+    return [p.strip() for p in text.replace("\r\n", "\n").split("\n\n") if p.strip()]
+
+def paragraph_key(paragraph):
+    # Ignore width and spacing differences between two readings of the same text
+    return "".join(unicodedata.normalize("NFKC", paragraph).split())
+
+"""
+Drops the paragraphs of a band that were already emitted by the band above it.
+"""
+def dedupe_paragraphs(paragraphs, seen_keys):
+    return [p for p in paragraphs if paragraph_key(p) not in seen_keys]
+
+
+class OrderedBandMerger:
+    """Collects band results and emits them in reading order as soon as possible."""
+
+    def __init__(self, count, callback):
+        self.results = [None] * count
+        self.callback = callback
+        self.next_index = 0
+        self.previous_keys = set()
+        self.lock = threading.Lock()
+
+    def complete(self, index, text):
+        with self.lock:
+            self.results[index] = text
+            while self.next_index < len(self.results) and self.results[self.next_index] is not None:
+                self._emit(self.results[self.next_index])
+                self.next_index += 1
+
+    def _emit(self, text):
+        if translate.is_error_text(text):
+            # Shown in place of the band; the error line keeps the whole text out of the cache and memory
+            self.callback(text + "\n\n", end=False)
+            return
+        paragraphs = split_paragraphs(text)
+        kept = dedupe_paragraphs(paragraphs, self.previous_keys)
+        self.previous_keys = {paragraph_key(p) for p in paragraphs}
+        if kept:
+            self.callback("\n\n".join(kept) + "\n\n", end=False)
+
+
+"""
+Returns True when the capture should be translated in bands according to the
+BANDS section of api.json5.
+"""
+def should_use_bands(image, api_config):
+    bands_config = config.typed(api_config).bands
+    return bands_config.enable and image.height >= bands_config.min_height
+
+"""
+Translates a tall capture band by band and streams the merged text to callback.
+
+Parameters:
+    image (PIL.Image): The capture.
+    api_config (dict): The app config.
+    callback (callable): callback(chunk, end) like the provider stream functions.
+    stream_fn (callable): Stream function stream_fn(payload, api_config, callback) of a
+        single request, with its hedging and failover.
+    job (jobs.Job): Cancelling it stops the band requests; bands not started are never sent.
+
+Raises:
+    jobs.JobCancelled: The job was cancelled (or callback raised it for a late chunk).
+"""
+def translate_in_bands(image, api_config, callback, stream_fn, job=None):
+    bands_config = config.typed(api_config).bands
+    band_height = bands_config.band_height
+    overlap = bands_config.overlap
+    concurrency = bands_config.concurrency
+
+    boxes = split_bands(image.height, band_height, overlap)
+    print(f"Translating {len(boxes)} bands, {concurrency} at a time")
+    merger = OrderedBandMerger(len(boxes), callback)
+    stopped = threading.Event()
+    if job:
+        job.add_cancel_handler(stopped.set)
+
+    def run_band(index, top, bottom):
+        if stopped.is_set():
+            raise jobs.JobCancelled("bands cancelled")
+        chunks = []
+
+        def collect(text, end=False):
+            if stopped.is_set() and not end:
+                # Stops the provider loop of this band
+                raise jobs.JobCancelled("bands cancelled")
+            if text:
+                chunks.append(text)
+
+        try:
+            payload = encoder.ImagePayload.from_image(image.crop((0, top, image.width, bottom)), api_config)
+            stream_fn(payload, api_config, collect)
+            text = "".join(chunks)
+        except jobs.JobCancelled:
+            stopped.set()
+            raise
+        except Exception as e:
+            text = f"Request Error: {e}"
+        if stopped.is_set():
+            raise jobs.JobCancelled("bands cancelled")
+        try:
+            # Outside the request's try: a cancelled callback stops the bands, it isn't a band error
+            merger.complete(index, text)
+        except jobs.JobCancelled:
+            stopped.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Bands keep the caller's context (rate limit priority)
+        futures = [executor.submit(contextvars.copy_context().run, run_band, index, top, bottom)
+                   for index, (top, bottom) in enumerate(boxes)]
+        try:
+            for future in futures:
+                future.result()
+        except jobs.JobCancelled:
+            stopped.set()
+            for future in futures:
+                future.cancel()
+            raise
+
+    callback("", end=True)
+    return ""
+
+
+"""
+Async variant of translate_in_bands for the aio event loop: the bands are
+requested concurrently without a thread each and the merged text is yielded in
+reading order. Cancelling the consumer cancels every band request.
+
+Parameters:
+    stream_async (callable): Async provider stream stream_async(payload, api_config) yielding chunks.
+"""
+async def translate_in_bands_async(image, api_config, stream_async):
+    bands_config = config.typed(api_config).bands
+    band_height = bands_config.band_height
+    overlap = bands_config.overlap
+    semaphore = asyncio.Semaphore(bands_config.concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def run_band(top, bottom):
+        async with semaphore:
+            try:
+                band = image.crop((0, top, image.width, bottom))
+                payload = await loop.run_in_executor(None, encoder.ImagePayload.from_image, band, api_config)
+                return "".join([chunk async for chunk in stream_async(payload, api_config)])
+            except Exception as e:
+                return f"Request Error: {e}"
+
+    boxes = split_bands(image.height, band_height, overlap)
+    print(f"Translating {len(boxes)} bands (async)")
+    tasks = [asyncio.ensure_future(run_band(top, bottom)) for top, bottom in boxes]
+    merged = []
+    merger = OrderedBandMerger(len(tasks), lambda text, end=False: merged.append(text))
+    try:
+        for index, task in enumerate(tasks):
+            merger.complete(index, await task)
+            while merged:
+                yield merged.pop(0)
+    finally:
+        for task in tasks:
+            task.cancel()
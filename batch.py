@@ -0,0 +1,243 @@
+"""
+Batch translation of image folders (manga pages, screenshots).
+
+Images are decoded, downscaled and encoded in a process pool, then sent to the
+configured provider with bounded concurrency (hedging, failover and the
+translation memory apply as in the app). Every page is appended to a JSONL
+file as soon as it is done and, optionally, the whole run is rendered as one
+Markdown file in page order.
+
+A checkpoint file records the pages translated successfully, so an interrupted
+run continues where it stopped; failed pages are retried on the next run.
+
+Usage:
+    python batch.py manga/ --output manga.jsonl --markdown manga.md
+    python batch.py "shots/*.png" --workers 4 --concurrency 3
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff")
+
+
+"""
+Expands directories and glob patterns into a sorted list of image files.
+"""
+def collect_images(inputs, recursive=False):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=recursive) or [item]
+        files.extend(path for path in candidates
+                     if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(dict.fromkeys(os.path.abspath(path) for path in files))
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+class Checkpoint:
+    """Pages already translated, keyed by path and checked against size/mtime."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.done = json.load(f).get("done", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable checkpoint '{path}': {e}")
+
+    def is_done(self, path):
+        try:
+            return self.done.get(path) == file_signature(path)
+        except OSError:
+            return False
+
+    def mark_done(self, path):
+        with self.lock:
+            self.done[path] = file_signature(path)
+            # Write a new file and swap it in, a crash never leaves half a checkpoint
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"done": self.done}, f)
+            os.replace(tmp_path, self.path)
+
+
+"""
+Process pool worker: decodes and encodes one page.
+
+Returns:
+    tuple: (path, encoded bytes, mime type, encoder.EncodeStats), or (path, None, error, None).
+"""
+def encode_page(path, settings):
+    import encoder
+    from PIL import Image
+    try:
+        with Image.open(path) as image:
+            image.load()
+            if image.mode not in ("RGB", "RGBA", "L"):
+                image = image.convert("RGB")
+            buffered, mime_type, stats = encoder.encode_to_buffer(image, settings)
+        return path, buffered.getvalue(), mime_type, stats
+    except Exception as e:
+        return path, None, f"Error preparing image: {e}", None
+
+def translate_page(path, data, mime_type, stats, api_config):
+    import encoder
+    import translate
+    payload = encoder.ImagePayload(io.BytesIO(data), mime_type, stats)
+    start = time.perf_counter()
+    text = translate.call_real_api(payload, api_config)
+    request_ms = (time.perf_counter() - start) * 1000
+    if not translate.is_error_text(text):
+        translate.remember_translation(text, api_config)
+    return text, request_ms
+
+"""
+Renders the last result of every page as Markdown, in page order.
+"""
+def write_markdown(jsonl_path, markdown_path, order):
+    results = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                results[record["file"]] = record
+    rank = {path: index for index, path in enumerate(order)}
+    with open(markdown_path, "w", encoding="utf-8") as f:
+        for path in sorted(results, key=lambda p: (rank.get(p, len(rank)), p)):
+            record = results[path]
+            f.write(f"## {os.path.basename(path)}\n\n")
+            if record.get("error"):
+                f.write(f"> {record['error']}\n\n")
+            else:
+                f.write(record["text"].strip() + "\n\n")
+
+
+def run_batch(args):
+    import encoder
+    import pipeline
+    import ratelimit
+    import translate
+    import tracing
+    api_config = pipeline.load_config(args.config)
+    if api_config is None:
+        raise SystemExit(1)
+    # No hotkey jobs here, the spans would only pile up
+    tracing.tracer.configure(enabled=False)
+
+    files = collect_images(args.inputs, args.recursive)
+    checkpoint = Checkpoint(args.checkpoint or args.output + ".checkpoint.json")
+    todo = [path for path in files if not checkpoint.is_done(path)]
+    print(f"{len(files)} pages, {len(files) - len(todo)} already done, {len(todo)} to translate")
+
+    settings = encoder.encoder_settings(api_config)
+    write_lock = threading.Lock()
+    errors = Counter()
+    request_ms = []
+    done = 0
+    start = time.perf_counter()
+
+    def finish(path, text, error, timings):
+        nonlocal done
+        record = {"file": path, "text": "" if error else text, "error": error, "time": time.time(), **timings}
+        with write_lock:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if error:
+                errors[error.split(":")[0]] += 1
+                print(f"[failed] {os.path.basename(path)}: {error}")
+            else:
+                checkpoint.mark_done(path)
+                done += 1
+                print(f"[{done}/{len(todo)}] {os.path.basename(path)}")
+
+    def request(path, data, mime_type, stats):
+        try:
+            # Pages yield to interactive hotkey jobs sharing the provider's rate limit
+            with ratelimit.background():
+                text, ms = translate_page(path, data, mime_type, stats, api_config)
+        except Exception as e:
+            text, ms = f"Request Error: {e}", 0.0
+        error = text if translate.is_error_text(text) else None
+        with write_lock:
+            request_ms.append(ms)
+        finish(path, text, error, {"encode_ms": round(stats.encode_ms, 1), "encode_bytes": stats.num_bytes,
+                                   "request_ms": round(ms, 1)})
+
+    # Encoding is CPU bound (process pool), requests are I/O bound (bounded thread pool).
+    # Only a few encoded pages wait for a request slot, a 500 page run never sits in memory.
+    slots = threading.BoundedSemaphore(args.concurrency * 2)
+    window = max(1, args.workers) * 2
+
+    def release_after(path, data, mime_type, stats):
+        try:
+            request(path, data, mime_type, stats)
+        finally:
+            slots.release()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as encoders, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as senders:
+        remaining = iter(todo)
+        encoding = set()
+        pending = []
+        while True:
+            for path in remaining:
+                encoding.add(encoders.submit(encode_page, path, settings))
+                if len(encoding) >= window:
+                    break
+            if not encoding:
+                break
+            finished, encoding = wait(encoding, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path, data, mime_type, stats = future.result()
+                if data is None:
+                    finish(path, "", mime_type, {})
+                    continue
+                slots.acquire()
+                pending.append(senders.submit(release_after, path, data, mime_type, stats))
+        for future in pending:
+            future.result()
+
+    elapsed = time.perf_counter() - start
+    if args.markdown and os.path.exists(args.output):
+        write_markdown(args.output, args.markdown, files)
+
+    failed = sum(errors.values())
+    print(f"\nTranslated {done} pages in {elapsed:.1f} s ({done / elapsed * 60 if elapsed else 0:.1f} pages/min), "
+          f"{failed} failed, {len(files) - len(todo)} skipped (checkpoint)")
+    if request_ms:
+        print(f"Request latency: {tracing.percentiles(request_ms)} ms")
+    if ratelimit.is_enabled(api_config):
+        print(f"Rate limits: {ratelimit.registry.stats()}")
+    for kind, count in errors.most_common():
+        print(f"  {kind}: {count}")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sakana Lens batch translation")
+    parser.add_argument("inputs", nargs="+", help="Image directories, files or glob patterns")
+    parser.add_argument("--output", default="batch.jsonl", help="JSONL results, appended per page")
+    parser.add_argument("--markdown", help="Also write all pages to this Markdown file")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Encoding processes")
+    parser.add_argument("--concurrency", type=int, default=3, help="Requests in flight")
+    parser.add_argument("--recursive", action="store_true", help="Descend into subdirectories")
+    parser.add_argument("--config", default="api.json5", help="Config file")
+    args = parser.parse_args()
+    raise SystemExit(1 if run_batch(args) else 0)
@@ -0,0 +1,329 @@
+"""
+Mock-provider end-to-end benchmark.
+
+Spins up local stand-in servers for the OpenAI-compatible chat completions API
+and the Gemini generateContent/streamGenerateContent API (in a separate process,
+so their CPU is not charged to the pipeline), then drives
+translate.call_real_api with a corpus of images, streaming and non-streaming.
+
+Reports p50/p95/p99 of time to first chunk, total latency, encode time and CPU
+per job, and saves the results as JSON for comparison between runs (in the
+temp directory unless --output says otherwise).
+
+Usage:
+    python benchmark.py --images manga.png image.png --jobs 20
+    python benchmark.py --ttft 300 --tps 40 --jitter 0.2 --error-rate 0.05 --output bench.json
+    python benchmark.py --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_TRANSLATION = (
+    "日本のテキスト段落1\nTranslated English text 1\n\n"
+    "この文章には、例えば 123 のような数字が含まれています。\n"
+    "This text contains numbers, such as 123.\n\n"
+)
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """Answers OpenAI and Gemini style requests with a canned translation."""
+    protocol_version = "HTTP/1.1"
+    settings = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+
+        if random.random() < self.settings["error_rate"]:
+            self._send_json(500, {"error": {"code": 500, "message": "mock server error", "status": "INTERNAL"}})
+            return
+
+        path = self.path.split("?")[0]
+        if path.endswith("/chat/completions"):
+            self._openai(stream=bool(body.get("stream")))
+        elif path.endswith(":streamGenerateContent"):
+            self._gemini(stream=True)
+        elif path.endswith(":generateContent"):
+            self._gemini(stream=False)
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": f"unknown path {path}"}})
+
+    # Timing model
+
+    def _tokens(self):
+        return [token + " " for token in self.settings["text"].split(" ")]
+
+    def _sleep(self, seconds):
+        jitter = self.settings["jitter"]
+        time.sleep(max(0.0, seconds * random.uniform(1 - jitter, 1 + jitter)))
+
+    def _wait_first_token(self):
+        self._sleep(self.settings["ttft_ms"] / 1000)
+
+    def _token_delay(self):
+        return 1.0 / max(1e-3, self.settings["tps"])
+
+    # OpenAI compatible
+
+    def _openai(self, stream):
+        tokens = self._tokens()
+        self._wait_first_token()
+        if not stream:
+            time.sleep(self._token_delay() * len(tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+                "model": "mock",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1000, "completion_tokens": len(tokens), "total_tokens": 1000 + len(tokens)},
+            })
+            return
+        self._start_sse()
+        for i, token in enumerate(tokens):
+            if i:
+                self._sleep(self._token_delay())
+            self._send_event({
+                "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": "mock",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            })
+        self._send_event({
+            "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": "mock", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        })
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    # Gemini
+
+    def _gemini_response(self, text, finished):
+        response = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}],
+                    "modelVersion": "mock"}
+        if finished:
+            response["candidates"][0]["finishReason"] = "STOP"
+        return response
+
+    def _gemini(self, stream):
+        tokens = self._tokens()
+        self._wait_first_token()
+        if not stream:
+            time.sleep(self._token_delay() * len(tokens))
+            self._send_json(200, self._gemini_response("".join(tokens), True))
+            return
+        self._start_sse()
+        for i, token in enumerate(tokens):
+            if i:
+                self._sleep(self._token_delay())
+            self._send_event(self._gemini_response(token, i == len(tokens) - 1))
+        self._write_chunk(b"")
+
+    # HTTP helpers
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_event(self, body):
+        self._write_chunk(("data: " + json.dumps(body) + "\n\n").encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+"""
+Runs the mock server until the process is terminated (multiprocessing target).
+"""
+def serve(port, settings, ready):
+    MockProviderHandler.settings = settings
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockProviderHandler)
+    server.daemon_threads = True
+    ready.set()
+    server.serve_forever()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_mock_server(settings):
+    port = free_port()
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=serve, args=(port, settings, ready), daemon=True)
+    process.start()
+    ready.wait(10)
+    return process, f"http://127.0.0.1:{port}"
+
+
+"""
+Builds an api config that points the selected provider at the mock server.
+Cache, OCR, memory and bands are left out so only the pipeline is measured.
+"""
+def mock_config(provider, base_url, stream, image_format):
+    import config
+    api = {
+        "OPENAI_COMPATIBLE": "True" if provider == "openai" else "False",
+        "STREAM": str(stream),
+        "MODEL": "mock-model",
+        "KEY": "mock-key",
+        "ENDPOINT": base_url + "/v1",
+        "BASE_URL": base_url,
+        "PROMPT": "Translate the Japanese text in this image into English.",
+        "SYS_PROMPT": "You are an expert in OCR text extraction and translation.",
+        "TEMPERATURE": "0.8",
+        "IMAGE_FORMAT": image_format,
+    }
+    return config.AppConfig({"API": api, "SPEECH": {"STREAM": "False"}, "TRACE": {"ENABLE": "False"}})
+
+"""
+Runs one translation and measures it.
+
+Returns:
+    dict: ttfc_ms (None when non-streaming), total_ms, encode_ms, encode_bytes, cpu_ms, error
+"""
+def run_job(image, api_config, stream):
+    import translate
+    first_chunk = []
+    chunks = []
+
+    def on_chunk(text, end=False):
+        if text and not first_chunk:
+            first_chunk.append(time.perf_counter())
+        if text:
+            chunks.append(text)
+
+    cpu_start = time.thread_time()
+    start = time.perf_counter()
+    if stream:
+        translate.call_real_api(image, api_config, on_chunk)
+        text = "".join(chunks)
+    else:
+        text = translate.call_real_api(image, api_config)
+    total = time.perf_counter() - start
+    cpu = time.thread_time() - cpu_start
+
+    # This job's own timings, other jobs run concurrently with --concurrency
+    timings = translate.last_timings()
+    return {
+        "ttfc_ms": (first_chunk[0] - start) * 1000 if first_chunk else None,
+        "total_ms": total * 1000,
+        "encode_ms": timings.get("encode_ms"),
+        "encode_bytes": timings.get("encode_bytes"),
+        "cpu_ms": cpu * 1000,
+        "error": translate.is_error_text(text),
+    }
+
+def summarize(results, points=(50, 95, 99)):
+    import tracing
+    summary = {"jobs": len(results), "errors": sum(1 for r in results if r["error"])}
+    for metric in ("ttfc_ms", "total_ms", "encode_ms", "encode_bytes", "cpu_ms"):
+        values = [r[metric] for r in results if r[metric] is not None and not r["error"]]
+        summary[metric] = {f"p{p}": v for p, v in tracing.percentiles(values, points).items()}
+    return summary
+
+def run_benchmark(args):
+    from PIL import Image
+    settings = {
+        "ttft_ms": args.ttft,
+        "tps": args.tps,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "text": SAMPLE_TRANSLATION,
+    }
+    process, base_url = start_mock_server(settings)
+    images = [Image.open(path) for path in args.images]
+    for image in images:
+        image.load()
+
+    report = {"settings": {k: v for k, v in settings.items() if k != "text"},
+              "images": args.images, "jobs": args.jobs, "concurrency": args.concurrency,
+              "image_format": args.image_format, "time": time.time(), "scenarios": {}}
+    try:
+        for provider in args.providers:
+            for stream in (True, False):
+                name = f"{provider}-{'stream' if stream else 'nonstream'}"
+                api_config = mock_config(provider, base_url, stream, args.image_format)
+                # Warm up (imports, client construction) outside the measurement
+                run_job(images[0], api_config, stream)
+
+                jobs = [images[i % len(images)] for i in range(args.jobs)]
+                with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                    results = list(executor.map(lambda image: run_job(image, api_config, stream), jobs))
+                report["scenarios"][name] = summarize(results)
+                print_scenario(name, report["scenarios"][name])
+    finally:
+        process.terminate()
+    import clients
+    report["clients"] = clients.registry.stats()
+    return report
+
+def print_scenario(name, summary, previous=None):
+    print(f"\n{name}: {summary['jobs']} jobs, {summary['errors']} errors")
+    for metric in ("ttfc_ms", "total_ms", "encode_ms", "encode_bytes", "cpu_ms"):
+        values = summary.get(metric) or {}
+        if not values:
+            continue
+        line = "  ".join(f"{p}={v:8.1f}" for p, v in values.items())
+        if previous and previous.get(metric):
+            deltas = []
+            for p, v in values.items():
+                old = previous[metric].get(p)
+                if old:
+                    deltas.append(f"{p} {100 * (v - old) / old:+.1f}%")
+            line += "   (" + ", ".join(deltas) + ")"
+        print(f"  {metric:<10} {line}")
+
+def compare(report, previous):
+    print("\nCompared with", previous.get("time"))
+    for name, summary in report["scenarios"].items():
+        print_scenario(name, summary, previous.get("scenarios", {}).get(name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock-provider benchmark of the translation pipeline")
+    parser.add_argument("--images", nargs="+", default=["manga.png", "image.png"], help="Image corpus")
+    parser.add_argument("--providers", nargs="+", choices=["openai", "gemini"], default=["openai", "gemini"])
+    parser.add_argument("--jobs", type=int, default=20, help="Jobs per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs running at the same time")
+    parser.add_argument("--ttft", type=float, default=400, help="Mock time to first token (ms)")
+    parser.add_argument("--tps", type=float, default=50, help="Mock output tokens per second")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Relative timing jitter (0.1 = +-10%%)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--image-format", default="PNG", help="IMAGE_FORMAT used by the encoder")
+    parser.add_argument("--output", default=os.path.join(tempfile.gettempdir(), "bench_results.json"),
+                        help="Where to save the results (default: the temp directory)")
+    parser.add_argument("--compare", help="Previous results JSON to compare with")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
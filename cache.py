@@ -0,0 +1,292 @@
+"""
+Translation cache - remembers the translation of a captured image so that
+pressing Ctrl+T again on an unchanged page does not pay another LLM round trip.
+
+Two tiers are used:
+    1. A bounded in-memory LRU for the current session.
+    2. A size-capped on-disk store (one small JSON file per entry) that
+       survives restarts.
+
+Entries are keyed on a perceptual hash (dHash) of the captured image plus a
+digest of the model/prompt configuration. Lookups accept a small Hamming
+distance so that anti-aliasing or cursor blinking noise still hits the cache.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from PIL import Image
+import config
+import translate
+
+
+"""
+Computes a difference hash (dHash) of the image.
+
+The image is reduced to a (hash_size+1) x hash_size grayscale thumbnail and each
+bit records whether a pixel is brighter than its right neighbour. Text pages need
+a larger hash than photos, otherwise a single changed line barely flips any bits.
+
+Parameters:
+    image (PIL.Image): The captured screenshot.
+    hash_size (int): Width/height of the hash grid, the hash has hash_size**2 bits.
+
+Returns:
+    int: The hash as a python integer.
+"""
+def perceptual_hash(image, hash_size=32):
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+# Every config value that changes what is sent to the model (or who answers)
+DIGEST_KEYS = {
+    "API": ("OPENAI_COMPATIBLE", "NAME", "ENDPOINT", "BASE_URL", "MODEL", "PROMPT", "SYS_PROMPT", "TEMPERATURE",
+            "IMAGE_FORMAT", "PNG_COMPRESS_LEVEL", "IMAGE_QUALITY", "MAX_LONG_EDGE", "MAX_MEGAPIXELS"),
+    "OCR": ("ENABLE", "ENGINE", "LANG", "MIN_CONFIDENCE", "TEXT_PROMPT"),
+    "BANDS": ("ENABLE", "MIN_HEIGHT", "BAND_HEIGHT", "OVERLAP"),
+    # Hashes of another size never match, they go to other buckets
+    "CACHE": ("HASH_SIZE",),
+}
+
+"""
+Builds a digest of every config value that changes the translation output.
+Two captures only share cache entries if they were translated the same way.
+Computed once per loaded config.
+"""
+def config_digest(api_config):
+    typed_config = config.typed(api_config)
+    cached = typed_config.__dict__.get("_cache_digest")
+    if cached is not None:
+        return cached
+    parts = {name: {key: getattr(getattr(typed_config, name.lower()), key.lower()) for key in keys}
+             for name, keys in DIGEST_KEYS.items()}
+    # Profiles are merged over API, a failover or hedge may answer with any of them
+    parts["PROVIDERS"] = [{key: value for key, value in entry.items() if key != "KEY"}
+                          for entry in api_config.get("PROVIDERS") or []]
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    typed_config.__dict__["_cache_digest"] = digest
+    return digest
+
+
+class CacheKey:
+    """Lookup key of a capture: exact config digest and size plus a fuzzy image hash."""
+
+    def __init__(self, digest, size, phash):
+        self.digest = digest
+        self.size = size
+        self.phash = phash
+
+    def bucket(self):
+        return f"{self.digest}_{self.size[0]}x{self.size[1]}"
+
+    def name(self):
+        return f"{self.bucket()}_{self.phash:x}"
+
+
+class TranslationCache:
+    """Two-tier (memory LRU + disk) cache of translated text."""
+
+    def __init__(self, disk_dir=None, memory_entries=64, disk_max_bytes=50 * 1024 * 1024,
+                 hash_size=32, tolerance=6):
+        self.disk_dir = disk_dir
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.hash_size = hash_size
+        self.tolerance = tolerance
+        self.memory = OrderedDict()  # name -> (key, text)
+        self.disk_index = {}  # bucket -> {phash: file path}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            self._load_disk_index()
+
+    def make_key(self, image, api_config):
+        return CacheKey(config_digest(api_config), image.size, perceptual_hash(image, self.hash_size))
+
+    def lookup(self, key):
+        """Return the cached text for the key, or None on a miss."""
+        with self.lock:
+            text = self._lookup_memory(key)
+            if text is None:
+                text = self._lookup_disk(key)
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return text
+
+    def store(self, key, text):
+        """Remember a translation. Empty results and texts with an error message (a failed band) are never cached."""
+        if not text or translate.contains_error_text(text):
+            return
+        with self.lock:
+            self._store_memory(key, text)
+            if self.disk_dir:
+                self._store_disk(key, text)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            for entries in self.disk_index.values():
+                for path in entries.values():
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self.disk_index.clear()
+
+    # Memory tier
+
+    def _lookup_memory(self, key):
+        best_name, best_distance = None, None
+        for name, (entry_key, _) in self.memory.items():
+            if entry_key.digest != key.digest or entry_key.size != key.size:
+                continue
+            distance = hamming_distance(entry_key.phash, key.phash)
+            if distance <= self.tolerance and (best_distance is None or distance < best_distance):
+                best_name, best_distance = name, distance
+        if best_name is None:
+            return None
+        self.memory.move_to_end(best_name)
+        return self.memory[best_name][1]
+
+    def _store_memory(self, key, text):
+        self.memory[key.name()] = (key, text)
+        self.memory.move_to_end(key.name())
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    # Disk tier
+
+    def _load_disk_index(self):
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            for file_name in os.listdir(self.disk_dir):
+                if not file_name.endswith(".json"):
+                    continue
+                try:
+                    bucket, phash = file_name[:-len(".json")].rsplit("_", 1)
+                    self.disk_index.setdefault(bucket, {})[int(phash, 16)] = os.path.join(self.disk_dir, file_name)
+                except ValueError:
+                    continue
+        except OSError as e:
+            print(f"Translation cache disabled on disk: {e}")
+            self.disk_dir = None
+
+    def _lookup_disk(self, key):
+        entries = self.disk_index.get(key.bucket())
+        if not entries:
+            return None
+        best = min(entries, key=lambda phash: hamming_distance(phash, key.phash))
+        if hamming_distance(best, key.phash) > self.tolerance:
+            return None
+        path = entries[best]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = json.load(f)["text"]
+            # Touch the file, eviction is by last use
+            os.utime(path, None)
+        except (OSError, ValueError, KeyError):
+            del entries[best]
+            return None
+        # Promote to the memory tier
+        self._store_memory(CacheKey(key.digest, key.size, best), text)
+        return text
+
+    def _store_disk(self, key, text):
+        path = os.path.join(self.disk_dir, key.name() + ".json")
+        try:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"text": text, "time": time.time()}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self.disk_index.setdefault(key.bucket(), {})[key.phash] = path
+            self._evict_disk()
+        except OSError as e:
+            print(f"Error writing translation cache: {e}")
+
+    def _evict_disk(self):
+        files = []
+        total = 0
+        for bucket, entries in self.disk_index.items():
+            for phash, path in entries.items():
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, bucket, phash, path))
+                total += stat.st_size
+        # Oldest used entries go first
+        files.sort()
+        for _, file_size, bucket, phash, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.disk_index[bucket].pop(phash, None)
+            total -= file_size
+
+
+"""
+Wraps a stream callback so that the streamed text is stored in the cache once
+the stream finishes successfully. The wrapped callback is forwarded unchanged.
+"""
+def recording_callback(cache, key, callback):
+    chunks = []
+
+    def record(text, end=False):
+        if text:
+            chunks.append(text)
+        # cache.store() refuses a stream that failed or contains a failed band
+        if end:
+            cache.store(key, "".join(chunks))
+        callback(text, end=end)
+
+    return record
+
+# Create single instance (lazily, it depends on api.json5)
+_translation_cache = None
+_cache_settings = None  # The CACHE values _translation_cache was built from
+_cache_lock = threading.Lock()
+
+"""
+Returns the process-wide translation cache, or None when the CACHE section is
+missing or disabled in api.json5. The cache is rebuilt when the CACHE section
+changed (config hot reload); disk entries stay where they are.
+"""
+def get_cache(api_config):
+    global _translation_cache, _cache_settings
+    cache_config = config.typed(api_config).cache if api_config else None
+    if not cache_config or not cache_config.enable:
+        return None
+
+    disk_dir = cache_config.disk_dir
+    if disk_dir:
+        disk_dir = config.get_resource_path(disk_dir, external=True)
+    settings = (disk_dir or None, cache_config.memory_entries, int(cache_config.disk_max_mb * 1024 * 1024),
+                cache_config.hash_size, cache_config.tolerance)
+    with _cache_lock:
+        if _translation_cache is None or _cache_settings != settings:
+            _translation_cache = TranslationCache(
+                disk_dir=settings[0],
+                memory_entries=settings[1],
+                disk_max_bytes=settings[2],
+                hash_size=settings[3],
+                tolerance=settings[4],
+            )
+            _cache_settings = settings
+        return _translation_cache
@@ -0,0 +1,224 @@
+"""
+Long-lived provider clients.
+
+Building an OpenAI(...) or genai.Client(...) per request means a new
+connection pool, and therefore new TCP and TLS handshakes, on every Ctrl+T.
+The registry keeps one client per (provider, endpoint, key) and hands the same
+instance to every worker thread; the SDK clients are thread-safe.
+
+    openai       OpenAI client on a shared httpx.Client with keep-alive
+    openai-async AsyncOpenAI client for the aio event loop
+    gemini       genai.Client (reused, so its own HTTP pool is reused too),
+                 client.aio serves the async calls
+    gemini-http  requests.Session for gemini.call_gemini_api_http
+
+Requests hold their client with `with clients.use(provider, api_config) as client:`.
+When api.json5 is reloaded with a different API section (configure()), every
+client is retired: new requests get new clients, and a retired client is only
+closed once the last request using it released it, so in-flight jobs finish
+with the client they started with. Pool statistics: registry.stats().
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+import config
+
+
+class ClientEntry:
+    """A pooled client and its usage counters."""
+
+    def __init__(self, provider, endpoint, client, http_client=None):
+        self.provider = provider
+        self.endpoint = endpoint
+        self.client = client
+        self.http_client = http_client  # Transport we own and must close
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.uses = 0
+        self.users = 0  # Requests holding the client right now
+        self.retired = False  # Replaced by a reload, closed when the last user releases it
+
+    def close(self):
+        target = self.http_client or self.client
+        close = getattr(target, "aclose", None) or getattr(target, "close", None)
+        if close is None:
+            return
+        try:
+            result = close()
+            if asyncio.iscoroutine(result):
+                # Async transports belong to the aio event loop
+                import aio
+                aio.get_loop().submit(result)
+        except Exception as e:
+            print(f"Error closing {self.provider} client: {e}")
+
+    def open_connections(self):
+        """Connections currently held by the httpx pool, None when unknown."""
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return len(connections) if connections is not None else None
+
+    def to_dict(self):
+        now = time.monotonic()
+        return {
+            "provider": self.provider,
+            "endpoint": self.endpoint,
+            "uses": self.uses,
+            "reuses": max(0, self.uses - 1),
+            "age_s": round(now - self.created, 1),
+            "idle_s": round(now - self.last_used, 1),
+            "in_use": self.users,
+            "open_connections": self.open_connections(),
+        }
+
+
+class ClientRegistry:
+    """Thread-safe registry of provider clients keyed by (provider, endpoint, key)."""
+
+    def __init__(self, max_connections=10, keepalive_expiry=60.0):
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.entries = {}
+        self.retired = []  # Retired entries still in use
+        self.config_digest = None
+        self.lock = threading.Lock()
+        self.created = 0
+        self.invalidations = 0
+
+    def configure(self, max_connections=10, keepalive_expiry=60.0, config_digest=None):
+        """Apply pool settings; clients are recreated when they or the API config changed."""
+        with self.lock:
+            changed = ((max_connections, keepalive_expiry, config_digest) !=
+                       (self.max_connections, self.keepalive_expiry, self.config_digest))
+            self.max_connections = max_connections
+            self.keepalive_expiry = keepalive_expiry
+            self.config_digest = config_digest
+        if changed:
+            self.invalidate()
+
+    @contextmanager
+    def use(self, provider, api_config):
+        """
+        Holds the client of the provider for this API config, creating it on
+        first use; a client retired meanwhile is closed when the block exits.
+        """
+        entry = self.acquire(provider, api_config)
+        try:
+            yield entry.client
+        finally:
+            self.release(entry)
+
+    def acquire(self, provider, api_config):
+        api = api_config["API"]
+        endpoint = api.get("BASE_URL", "") if provider == "gemini" else api.get("ENDPOINT", "")
+        key = (provider, endpoint, api.get("KEY", ""))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self._create(provider, endpoint, api)
+                self.entries[key] = entry
+                self.created += 1
+            entry.uses += 1
+            entry.users += 1
+            entry.last_used = time.monotonic()
+            return entry
+
+    def release(self, entry):
+        with self.lock:
+            entry.users -= 1
+            close = entry.retired and entry.users == 0
+            if close:
+                self.retired.remove(entry)
+        if close:
+            entry.close()
+
+    def invalidate(self):
+        """Retire every client: idle ones are closed now, the others when their last user releases them."""
+        with self.lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+            if entries:
+                self.invalidations += 1
+            idle = []
+            for entry in entries:
+                entry.retired = True
+                if entry.users:
+                    self.retired.append(entry)
+                else:
+                    idle.append(entry)
+        for entry in idle:
+            entry.close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "clients": [entry.to_dict() for entry in self.entries.values()],
+                "retired_in_use": len(self.retired),
+                "created": self.created,
+                "invalidations": self.invalidations,
+            }
+
+    def _create(self, provider, endpoint, api):
+        if provider == "openai":
+            import httpx
+            from openai import OpenAI
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=self.keepalive_expiry),
+                timeout=httpx.Timeout(600.0, connect=10.0))
+            client = OpenAI(base_url=endpoint, api_key=api["KEY"], http_client=http_client)
+            return ClientEntry(provider, endpoint, client, http_client)
+        if provider == "openai-async":
+            import httpx
+            from openai import AsyncOpenAI
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections,
+                                    keepalive_expiry=self.keepalive_expiry),
+                timeout=httpx.Timeout(600.0, connect=10.0))
+            client = AsyncOpenAI(base_url=endpoint, api_key=api["KEY"], http_client=http_client)
+            return ClientEntry(provider, endpoint, client, http_client)
+        if provider == "gemini":
+            from google import genai
+            from google.genai import types
+            http_options = types.HttpOptions(base_url=endpoint) if endpoint else None
+            return ClientEntry(provider, endpoint, genai.Client(api_key=api["KEY"], http_options=http_options))
+        if provider == "gemini-http":
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            return ClientEntry(provider, endpoint, session, session)
+        raise ValueError(f"Unknown provider '{provider}'")
+
+
+# Create single instance
+registry = ClientRegistry()
+
+"""
+Applies the CLIENTS section of api.json5 to the process-wide registry. Call it
+whenever api.json5 is (re)loaded: a changed API section retires every client.
+"""
+def configure(api_config):
+    clients_config = config.typed(api_config or {}).clients
+    api = api_config.get("API", {}) if api_config else {}
+    # Only what a client is built from: a new model or prompt keeps the warm clients
+    connection = {key: api.get(key) for key in ("ENDPOINT", "BASE_URL", "KEY")}
+    connection["PROVIDERS"] = api_config.get("PROVIDERS") if api_config else None
+    digest = hashlib.sha1(json.dumps(connection, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    registry.configure(
+        max_connections=clients_config.max_connections,
+        keepalive_expiry=clients_config.keepalive_expiry,
+        config_digest=digest)
+
+"""
+Context manager holding a pooled client: with clients.use("openai", api_config) as client: ...
+"""
+def use(provider, api_config):
+    return registry.use(provider, api_config)
@@ -1,6 +1,8 @@
 import json5
+import keyword
 import sys
 import os
+import threading
     
 def get_resource_path(relative_path, external=False):
     """
@@ -30,17 +32,296 @@ def get_resource_path(relative_path, external=False):
         base_dir = os.path.dirname(os.path.abspath(__file__))
         return os.path.join(base_dir, relative_path)
 
+"""
+Interprets a switch value from api.json5 such as "True", "yes" or "False".
+
+Parameters:
+    value: The raw value read from the config (string, bool or None).
+
+Returns:
+    bool: True only for "true"/"yes" (case insensitive) or a real True.
+"""
+def is_enabled(value):
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("true", "yes")
+
+class ConfigError(ValueError):
+    """api.json5 holds values that can't be used; the message lists every one of them."""
+
+
+class Field:
+    """Type, default and allowed range of one config value."""
+
+    def __init__(self, kind=str, default=None, minimum=None, maximum=None, choices=None):
+        self.kind = kind
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+
+    def parse(self, raw):
+        if raw is None or raw == "" and self.kind is not str:
+            return self.default
+        if self.kind is bool:
+            text = str(raw).strip().lower()
+            if isinstance(raw, bool):
+                return raw
+            if text not in ("true", "yes", "false", "no"):
+                raise ValueError(f"expected True or False, got {raw!r}")
+            return text in ("true", "yes")
+        if self.kind in (int, float):
+            if self.choices and str(raw).strip().lower() in self.choices:
+                # A keyword instead of a number, e.g. "auto"
+                return str(raw).strip().lower()
+            try:
+                value = self.kind(float(raw)) if self.kind is int and float(raw).is_integer() else self.kind(raw)
+            except (TypeError, ValueError):
+                raise ValueError(f"expected {'an integer' if self.kind is int else 'a number'}, got {raw!r}")
+            if self.minimum is not None and value < self.minimum or self.maximum is not None and value > self.maximum:
+                raise ValueError(f"{value} is outside {self.minimum} - {self.maximum}")
+            return value
+        if self.kind is list:
+            if not isinstance(raw, list):
+                raise ValueError(f"expected a list, got {raw!r}")
+            return raw
+        value = str(raw)
+        if self.choices and value.lower() not in self.choices:
+            raise ValueError(f"expected one of {', '.join(self.choices)}, got {raw!r}")
+        return value
+
+
+# Known values of api.json5; unknown keys are kept as they are
+SCHEMA = {
+    "API": {
+        "OPENAI_COMPATIBLE": Field(bool, False),
+        "STREAM": Field(bool, False),
+        "ASYNC": Field(bool, False),
+        "NAME": Field(str, ""),
+        "MODEL": Field(str, ""),
+        "KEY": Field(str, ""),
+        "ENDPOINT": Field(str, ""),
+        "BASE_URL": Field(str, ""),
+        "PROMPT": Field(str, ""),
+        "SYS_PROMPT": Field(str, ""),
+        "TEMPERATURE": Field(float, 0.8, 0.0, 2.0),
+        "IMAGE_FORMAT": Field(str, "PNG", choices=("png", "jpeg", "jpg", "webp")),
+        "PNG_COMPRESS_LEVEL": Field(int, 6, 0, 9),
+        "IMAGE_QUALITY": Field(int, 85, 1, 100),
+        "MAX_LONG_EDGE": Field(int, 0, 0),
+        "MAX_MEGAPIXELS": Field(float, 0, 0),
+        "RPM": Field(float, None, 0),
+        "TPM": Field(float, None, 0),
+        "MAX_CONCURRENCY": Field(int, None, 1),
+    },
+    "HEDGE": {
+        "ENABLE": Field(bool, False),
+        "DELAY_MS": Field(float, "auto", 0, choices=("auto",)),
+        "DEFAULT_DELAY_MS": Field(float, 1500, 0),
+        "MIN_SAMPLES": Field(int, 10, 1),
+        "MIN_DELAY_MS": Field(float, 300, 0),
+    },
+    "FAILOVER": {
+        "ENABLE": Field(bool, False),
+        "WINDOW_S": Field(float, 60, 1),
+        "ERROR_RATE": Field(float, 0.5, 0.0, 1.0),
+        "MIN_REQUESTS": Field(int, 4, 1),
+        "CONSECUTIVE_FAILURES": Field(int, 3, 1),
+        "COOLDOWN_S": Field(float, 30, 0),
+    },
+    "RATE_LIMIT": {
+        "ENABLE": Field(bool, False),
+        "RPM": Field(float, 0, 0),
+        "TPM": Field(float, 0, 0),
+        "OUTPUT_TOKENS": Field(int, 800, 0),
+        "MAX_CONCURRENCY": Field(int, 4, 1),
+        "MIN_CONCURRENCY": Field(int, 1, 1),
+        "TARGET_LATENCY_MS": Field(float, 0, 0),
+    },
+    "SPEECH": {
+        "STREAM": Field(bool, False),
+        "TYPE": Field(str, "sambert", choices=("sambert", "kokoro-online", "kokoro-offline")),
+        "LANG": Field(str, "en"),
+        "MODEL": Field(str, ""),
+        "KEY": Field(str, ""),
+        "ENDPOINT": Field(str, ""),
+        "RATE": Field(float, 1.0, 0.5, 2.0),
+        "INCREMENTAL": Field(bool, False),
+    },
+    "WIN": {
+        "TEXT_FONT": Field(list, ["Courier New", "14"]),
+        "WIDTH": Field(int, 400, 100),
+        "HEIGHT": Field(int, 800, 100),
+        "POSITION": Field(str, "right", choices=("left", "right", "center")),
+        "REGION": Field(str, "#CCFF00"),
+        "RENDER_FPS": Field(int, 30, 1, 120),
+        "INFO": Field(str, ""),
+        "HOWTO": Field(str, ""),
+    },
+    "CACHE": {
+        "ENABLE": Field(bool, False),
+        "MEMORY_ENTRIES": Field(int, 64, 0),
+        "DISK_DIR": Field(str, ""),
+        "DISK_MAX_MB": Field(float, 50, 0),
+        "HASH_SIZE": Field(int, 32, 8),
+        "TOLERANCE": Field(int, 6, 0),
+    },
+    "TILES": {
+        "ENABLE": Field(bool, False),
+        "ROWS": Field(int, 8, 1),
+        "COLS": Field(int, 8, 1),
+        "MAX_DIRTY_RATIO": Field(float, 0.6, 0.0, 1.0),
+        "TOLERANCE": Field(int, 24, 0),
+        "CONCURRENCY": Field(int, 3, 1),
+    },
+    "WATCH": {
+        "FPS": Field(float, 2, 0.1),
+        "THRESHOLD": Field(float, 3.0, 0),
+        "SETTLE_MS": Field(int, 500, 0),
+        "CPU_TARGET": Field(float, 0.02, 0.001, 1.0),
+    },
+    "BANDS": {
+        "ENABLE": Field(bool, False),
+        "MIN_HEIGHT": Field(int, 1600, 1),
+        "BAND_HEIGHT": Field(int, 900, 1),
+        "OVERLAP": Field(int, 120, 0),
+        "CONCURRENCY": Field(int, 3, 1),
+    },
+    "OCR": {
+        "ENABLE": Field(bool, False),
+        "ENGINE": Field(str, "tesseract", choices=("tesseract", "onnx", "fake")),
+        "LANG": Field(str, "jpn"),
+        "MIN_CONFIDENCE": Field(float, 0.8, 0.0, 1.0),
+        "TEXT_PROMPT": Field(str, ""),
+        "FAKE_TEXT": Field(str, ""),
+        "FAKE_CONFIDENCE": Field(float, 1.0, 0.0, 1.0),
+    },
+    "MEMORY": {
+        "ENABLE": Field(bool, False),
+        "PATH": Field(str, "memory.sqlite3"),
+        "MAX_ENTRIES": Field(int, 50000, 1),
+    },
+    "TRACE": {
+        "ENABLE": Field(bool, True),
+        "KEEP": Field(int, 200, 1),
+        "FILE": Field(str, ""),
+    },
+    "JOBS": {
+        "POLICY": Field(str, "latest", choices=("latest", "queue", "drop")),
+        "WORKERS": Field(int, 2, 1, 16),
+        "WATCH_DEADLINE_S": Field(float, 5, 0),
+    },
+    "CLIENTS": {
+        "MAX_CONNECTIONS": Field(int, 10, 1),
+        "KEEPALIVE_EXPIRY": Field(float, 60, 0),
+    },
+    "CONFIG": {
+        "HOT_RELOAD": Field(bool, True),
+        "POLL_S": Field(float, 1.0, 0.1),
+    },
+    "KOKORO": {
+        "MODEL": Field(str, "kokoro/kokoro-v1.0.int8.onnx"),
+        "VOICES": Field(str, "kokoro/voices-v1.0.bin"),
+        "INTRA_OP_THREADS": Field(int, 0, 0),
+        "INTER_OP_THREADS": Field(int, 0, 0),
+        "WARM_UP": Field(bool, True),
+    },
+    "DEBUG": {
+        "SCREENSHOT": Field(str, ""),
+        "STARTUP_REPORT": Field(bool, False),
+    },
+}
+
+
+class Section:
+    """
+    Parsed values of one section: api_config.api.stream, api_config.speech.rate, ...
+    Keys that are Python keywords get a trailing underscore (api_config.api.async_).
+    """
+
+    def __init__(self, values):
+        for key, value in values.items():
+            name = key.lower()
+            self.__dict__[name + "_" if keyword.iskeyword(name) else name] = value
+
+    def __getattr__(self, name):
+        # Keys missing from both api.json5 and the schema
+        raise AttributeError(f"No config value '{name.upper()}'")
+
+
+class AppConfig(dict):
+    """
+    The app config, parsed and validated once.
+
+    Still the dict read from api.json5 (api_config["API"]["MODEL"] keeps
+    working, with the raw strings), plus typed sections as attributes:
+    api_config.api.stream is a bool, api_config.api.temperature a float.
+    """
+
+    def __init__(self, raw, path=None, mtime=None):
+        super().__init__(raw)
+        self.path = path
+        self.mtime = mtime
+        errors = []
+        self._sections = {name: self._parse(name, self.get(name) or {}, errors) for name in SCHEMA}
+        for name, value in self.items():
+            if name not in SCHEMA and isinstance(value, dict):
+                self._sections[name] = Section(value)
+        for index, entry in enumerate(self.get("PROVIDERS") or []):
+            # Profiles are merged over the API section, their values must be valid API values too
+            self._parse("API", entry, errors, f"PROVIDERS[{index}]")
+        if errors:
+            raise ConfigError("Invalid config values:\n  " + "\n  ".join(errors))
+
+    @staticmethod
+    def _parse(name, raw, errors, label=None):
+        values = dict(raw)
+        for key, field in SCHEMA.get(name, {}).items():
+            try:
+                values[key] = field.parse(raw.get(key))
+            except ValueError as e:
+                errors.append(f"{label or name}.{key}: {e}")
+                values[key] = field.default
+        return Section(values)
+
+    def __getattr__(self, name):
+        sections = self.__dict__.get("_sections")
+        if sections is not None and name.upper() in sections:
+            return sections[name.upper()]
+        raise AttributeError(f"No config section '{name.upper()}'")
+
+    def with_api(self, entry):
+        """A copy with entry (a PROVIDERS profile) merged over the API section."""
+        merged = dict(self)
+        merged["API"] = {**self["API"], **entry}
+        return AppConfig(merged, self.path, self.mtime)
+
+"""
+Returns the config as an AppConfig, parsing plain dicts (tests, benchmark mock configs).
+"""
+def typed(api_config):
+    return api_config if isinstance(api_config, AppConfig) else AppConfig(api_config)
+
+"""
+Reads and validates a config file.
+
+Raises:
+    FileNotFoundError, ConfigError, or the parser's error for malformed JSON5.
+"""
+def load_config(filename):
+    # Look for api.json5 in the same directory as the .app
+    config_path = get_resource_path(filename, external=True)
+    mtime = os.stat(config_path).st_mtime_ns
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return AppConfig(json5.load(f), config_path, mtime)
+
 def read_config(filename):
     try:
-        # Look for api.json5 in the same directory as the .app
-        config_path = get_resource_path(filename, external=True)
-
         # for debug only
         #print(f"Looking for file at: {config_path}")
-
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json5.load(f)            
-            return config
+        return load_config(filename)
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found in the script's directory.")
         return None
@@ -49,6 +330,62 @@ def read_config(filename):
         return None
 
 
+class ConfigWatcher:
+    """
+    Polls the config file's modification time and reloads it when it changed.
+
+    on_reload(new_config, old_config) is called from the watcher thread with a
+    fully validated config; a file that doesn't parse or validate is reported
+    and the current config stays in use.
+    """
+
+    def __init__(self, api_config, on_reload, interval=1.0):
+        self.current = api_config
+        self.on_reload = on_reload
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if not self.current.path:
+            # Not read from a file (defaults, a test config): nothing to watch
+            return False
+        self.thread = threading.Thread(target=self.run, name="config-watcher", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        path = self.current.path
+        if not path:
+            return
+        stat = os.stat(path)
+        seen = (stat.st_mtime_ns, stat.st_size)
+        while not self.stop_event.wait(self.interval):
+            try:
+                stat = os.stat(path)
+                mtime = stat.st_mtime_ns
+                # The size too: a file caught half written changes again when the write completes
+                if (mtime, stat.st_size) == seen:
+                    continue
+                seen = (mtime, stat.st_size)
+                with open(path, 'r', encoding='utf-8') as f:
+                    new_config = AppConfig(json5.load(f), path, mtime)
+            except Exception as e:
+                print(f"Config not reloaded, keeping the current one: {e}")
+                continue
+            if dict(new_config) == dict(self.current):
+                continue
+            old_config, self.current = self.current, new_config
+            print(f"Config reloaded from {path}")
+            try:
+                self.on_reload(new_config, old_config)
+            except Exception as e:
+                print(f"Error applying the reloaded config: {e}")
+
+
 if __name__ == "__main__":
     cfg = read_config('api.json5')
     print(cfg["API"]["PROMPT"])  # Prints the entire JSON object
@@ -0,0 +1,164 @@
+"""
+Image encoding stage for provider uploads.
+
+Screenshots are downscaled to a configurable resolution cap and encoded as
+PNG (tunable zlib level), JPEG or WebP before being sent to the model. The
+settings live in the API section of api.json5:
+
+    "IMAGE_FORMAT": "PNG",        // PNG, JPEG or WEBP
+    "PNG_COMPRESS_LEVEL": "1",    // zlib level 0-9, lower is faster
+    "IMAGE_QUALITY": "85",        // JPEG/WebP quality 1-100
+    "MAX_LONG_EDGE": "2048",      // 0 means no limit
+    "MAX_MEGAPIXELS": "4"         // 0 means no limit
+"""
+import base64
+import io
+import math
+import time
+from PIL import Image
+import config
+import tracing
+
+# Supported formats and their mime types
+MIME_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+
+class EncodeStats:
+    """Per request report of the encoding stage."""
+
+    def __init__(self, image_format, mime_type, source_size, encoded_size, num_bytes, encode_ms):
+        self.image_format = image_format
+        self.mime_type = mime_type
+        self.source_size = source_size
+        self.encoded_size = encoded_size
+        self.num_bytes = num_bytes
+        self.encode_ms = encode_ms
+
+    def __str__(self):
+        source = f"{self.source_size[0]}x{self.source_size[1]}"
+        encoded = f"{self.encoded_size[0]}x{self.encoded_size[1]}"
+        return (f"{self.image_format} {source} -> {encoded}, "
+                f"{self.num_bytes / 1024:.1f} KB in {self.encode_ms:.1f} ms")
+
+    def to_timings(self):
+        """The per request timings entries of the encoding stage (see translate.request_timings)."""
+        return {"encode_ms": self.encode_ms, "encode_bytes": self.num_bytes, "image_format": self.image_format}
+
+
+"""
+Reads the encoder settings from the typed API section; the defaults (and the
+allowed ranges) are those of config.SCHEMA.
+"""
+def encoder_settings(api_config):
+    api = config.typed(api_config or {}).api
+    image_format = api.image_format.upper()
+    return {
+        "format": "JPEG" if image_format == "JPG" else image_format,
+        "png_compress_level": api.png_compress_level,
+        "quality": api.image_quality,
+        "max_long_edge": api.max_long_edge,
+        "max_megapixels": api.max_megapixels,
+    }
+
+"""
+Downscales the image so it fits both the long edge and the megapixel caps.
+High quality (Lanczos) resampling keeps small glyphs readable for OCR.
+
+Returns:
+    PIL.Image: The original image if no cap applies, otherwise a resized copy.
+"""
+def limit_resolution(image, max_long_edge=0, max_megapixels=0):
+    width, height = image.size
+    scale = 1.0
+    if max_long_edge > 0 and max(width, height) > max_long_edge:
+        scale = min(scale, max_long_edge / max(width, height))
+    if max_megapixels > 0 and width * height > max_megapixels * 1_000_000:
+        scale = min(scale, math.sqrt(max_megapixels * 1_000_000 / (width * height)))
+    if scale >= 1.0:
+        return image
+    new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return image.resize(new_size, Image.LANCZOS)
+
+"""
+Encodes the image into an in-memory buffer according to the settings.
+
+Returns:
+    tuple: (io.BytesIO buffer, mime type, EncodeStats)
+"""
+def encode_to_buffer(image, settings):
+    start = time.perf_counter()
+    source_size = image.size
+    with tracing.tracer.span("encode"):
+        image = limit_resolution(image, settings["max_long_edge"], settings["max_megapixels"])
+
+        image_format = settings["format"]
+        buffered = io.BytesIO()
+        if image_format == "PNG":
+            image.save(buffered, format="PNG", compress_level=settings["png_compress_level"])
+        elif image_format == "JPEG":
+            # JPEG has no alpha channel
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.save(buffered, format="JPEG", quality=settings["quality"])
+        else:
+            image.save(buffered, format="WEBP", quality=settings["quality"], method=4)
+
+    encode_ms = (time.perf_counter() - start) * 1000
+    stats = EncodeStats(image_format, MIME_TYPES[image_format], source_size,
+                        image.size, buffered.tell(), encode_ms)
+    return buffered, MIME_TYPES[image_format], stats
+
+
+class ImagePayload:
+    """
+    An image encoded once per capture and shared by every provider path.
+
+    The encoded bytes stay in the BytesIO buffer and are exposed as a memoryview,
+    so no intermediate getvalue() copy is made. The base64 and data url forms are
+    only derived when a provider asks for them, and then cached for retries and
+    fallbacks.
+    """
+
+    def __init__(self, buffered, mime_type, stats=None):
+        self._buffered = buffered
+        self.data = buffered.getbuffer()
+        self.mime_type = mime_type
+        self.stats = stats
+        self._bytes = None
+        self._base64 = None
+
+    @classmethod
+    def from_image(cls, image, api_config):
+        buffered, mime_type, stats = encode_to_buffer(image, encoder_settings(api_config))
+        return cls(buffered, mime_type, stats)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def to_bytes(self):
+        """Bytes copy for SDKs that refuse a memoryview (made at most once)."""
+        if self._bytes is None:
+            self._bytes = bytes(self.data)
+        return self._bytes
+
+    def to_base64(self):
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.data).decode("ascii")
+        return self._base64
+
+    def to_data_url(self):
+        return f"data:{self.mime_type};base64,{self.to_base64()}"
+
+
+"""
+Returns the payload as is, or encodes a PIL image into a new payload.
+"""
+def as_payload(image, api_config):
+    if isinstance(image, ImagePayload):
+        return image
+    return ImagePayload.from_image(image, api_config)
@@ -1,26 +1,32 @@
-from google import genai
 from google.genai import types
-import io
-import base64
 import requests
 import json
+import ocr
+import clients
+import config
+import jobs
+import ratelimit
 
 
-# Function to encode image to base64
-def image_to_base64(image):
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+# Function to wrap the encoded image as an inline part for the Google API Client
+def payload_to_part(payload):
+    return types.Part.from_bytes(data=payload.to_bytes(), mime_type=payload.mime_type)
+
+# Google API Client, pooled per (BASE_URL, KEY) in clients.registry and held
+# for the duration of a with block: with create_client(api_config) as client: ...
+# BASE_URL (optional) points it at a proxy or a local stand-in server
+def create_client(api_config):
+    return clients.use("gemini", api_config)
+
+# Request contents: the prompt followed by the image, or by the OCR text (text-only request)
+def build_contents(payload, api_config):
+    if isinstance(payload, ocr.TextPayload):
+        return [ocr.text_prompt(api_config), payload.text]
+    return [api_config["API"]["PROMPT"], payload_to_part(payload)]
 
 # Function to call Gemini API using HTTP requests
-def call_gemini_api_http(image, api_config):
-    # Convert image to base64
-    try:
-        # Convert image to base64
-        image_base64 = image_to_base64(image)
-    except Exception as e:
-        formatted_text = (f"Error preparing image: {e}")
-        return formatted_text
+# payload: encoder.ImagePayload shared by all provider paths, or ocr.TextPayload
+def call_gemini_api_http(payload, api_config):
 
     # Prompt for Gemini: OCR + Translation + Formatting
     model = api_config["API"]["MODEL"]
@@ -35,18 +41,23 @@ def call_gemini_api_http(image, api_config):
     }
 
     # Request body (example prompt)
-    data = {
-        "contents": [{
-            "parts": [{
+    if isinstance(payload, ocr.TextPayload):
+        # OCR already ran locally, only send the text
+        parts = [{"text": ocr.text_prompt(api_config)}, {"text": payload.text}]
+    else:
+        parts = [{
                 "text": prompt
             },
             {
                 "inline_data": {
-                    "mime_type": "image/jpeg",  # Or "image/png", etc.
-                    "data": image_base64
+                    "mime_type": payload.mime_type,
+                    "data": payload.to_base64()
                 }
             }
-            ]
+        ]
+    data = {
+        "contents": [{
+            "parts": parts
         }]
     }
 
@@ -54,7 +65,8 @@ def call_gemini_api_http(image, api_config):
     params = {"key": key}
 
     try:
-        response = requests.post(endpoint, headers=headers, params=params, json=data)
+        with clients.use("gemini-http", api_config) as session:
+            response = session.post(endpoint, headers=headers, params=params, json=data)
         response.raise_for_status()
         
         # Parse the JSON response
@@ -70,10 +82,12 @@ def call_gemini_api_http(image, api_config):
             
         return formatted_text
     except requests.exceptions.HTTPError as e:
+        ratelimit.note_failure(e)
         formatted_text = (f"HTTP Error: {e}")
         formatted_text += (f"Response content: {e.response.text}") # Print error details from the API
         return formatted_text
     except requests.exceptions.RequestException as e:
+        ratelimit.note_failure(e)
         formatted_text = (f"Request Error: {e}")
         return formatted_text
     except json.JSONDecodeError:
@@ -83,27 +97,28 @@ def call_gemini_api_http(image, api_config):
 
 
 # Function to call Gemini API using the Google API Client
-def call_gemini_api_client(image, api_config):
+def call_gemini_api_client(payload, api_config):
     model = api_config["API"]["MODEL"]
     key = api_config["API"]["KEY"]
     endpoint = api_config["API"]["ENDPOINT"]
-    prompt = api_config["API"]["PROMPT"]
     sys_prompt = api_config["API"]["SYS_PROMPT"]
-    temperature = float(api_config["API"]["TEMPERATURE"])
+    temperature = config.typed(api_config).api.temperature
 
     try:
-        client = genai.Client(api_key=key)
-        response = client.models.generate_content(
-            model=model, 
-            config=types.GenerateContentConfig(
-                temperature=temperature,
-                system_instruction=sys_prompt
-            ),
-            contents=[prompt, image]
-        )
+        contents = build_contents(payload, api_config)
+        with create_client(api_config) as client:
+            response = client.models.generate_content(
+                model=model, 
+                config=types.GenerateContentConfig(
+                    temperature=temperature,
+                    system_instruction=sys_prompt
+                ),
+                contents=contents
+            )
         formatted_text = response.text
         return formatted_text
     except Exception as e:
+        ratelimit.note_failure(e)
         formatted_text = (f"Request Error: {e}")
         return formatted_text
 
@@ -111,32 +126,64 @@ def call_gemini_api_client(image, api_config):
 
 # callback function (used for streaming)
 # callback(chunk, over)
-def call_gemini_api_stream(image, api_config, callback):
+def call_gemini_api_stream(payload, api_config, callback):
     model = api_config["API"]["MODEL"]
     key = api_config["API"]["KEY"]
     endpoint = api_config["API"]["ENDPOINT"]
-    prompt = api_config["API"]["PROMPT"]
     sys_prompt = api_config["API"]["SYS_PROMPT"]
-    temperature = float(api_config["API"]["TEMPERATURE"])
+    temperature = config.typed(api_config).api.temperature
 
     try:
-        client = genai.Client(api_key=key)
-        response = client.models.generate_content_stream(
-            model=model, 
-            config=types.GenerateContentConfig(
-                temperature=temperature,
-                system_instruction=sys_prompt
-            ),
-            contents=[prompt, image]
-        )
-        
-        for chunk in response:
-            callback(chunk.text, end=False)
+        contents = build_contents(payload, api_config)
+        # The pooled client is held until the stream is done
+        with create_client(api_config) as client:
+            response = client.models.generate_content_stream(
+                model=model, 
+                config=types.GenerateContentConfig(
+                    temperature=temperature,
+                    system_instruction=sys_prompt
+                ),
+                contents=contents
+            )
+            try:
+                for chunk in response:
+                    callback(chunk.text, end=False)
+            finally:
+                close = getattr(response, "close", None)
+                if close:
+                    close()
         callback("", end=True)
         return ""
+    except jobs.JobCancelled:
+        # Stopped by the consumer (cancelled job, lost hedge), not a provider failure
+        raise
     except Exception as e:
+        ratelimit.note_failure(e)
         callback(f"Request Error: {e}", end=True)
         return ""
-    finally:
-        if 'response' in locals() and response: # Check if 'response' exists and is not None
-            response.close()
\ No newline at end of file
+
+# Async variant (aio event loop): yields the text chunks as they arrive
+# Cancelling the consuming task closes the HTTP response
+async def stream_gemini_async(payload, api_config):
+    model = api_config["API"]["MODEL"]
+    sys_prompt = api_config["API"]["SYS_PROMPT"]
+    temperature = config.typed(api_config).api.temperature
+
+    contents = build_contents(payload, api_config)
+    with create_client(api_config) as client:
+        response = await client.aio.models.generate_content_stream(
+            model=model,
+            config=types.GenerateContentConfig(
+                temperature=temperature,
+                system_instruction=sys_prompt
+            ),
+            contents=contents
+        )
+        try:
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            aclose = getattr(response, "aclose", None)
+            if aclose:
+                await aclose()
@@ -0,0 +1,310 @@
+"""
+Provider health tracking, circuit breakers and failover.
+
+Every request to a provider profile (see providers.py) is recorded: success or
+failure and latency, in a rolling time window. Each profile has a breaker:
+
+    closed     requests flow; too many failures in the window open it
+    open       no requests for COOLDOWN_S seconds
+    half_open  after the cooldown a single probe request is let through;
+               success closes the breaker, failure opens it again
+
+call_with_failover() tries the profiles whose breaker allows a request, in
+order, until one answers, so the user sees a translation instead of
+"Request Error: ...". Failures are detected with translate.is_error_text.
+
+See the FAILOVER section of api.json5. Metrics: registry.metrics().
+"""
+import threading
+import time
+from collections import deque
+import config
+import jobs
+import providers
+import tracing
+import translate
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """Rolling window of request outcomes and latencies of one provider."""
+
+    def __init__(self, window_s=60.0, max_samples=200):
+        self.window_s = window_s
+        self.samples = deque(maxlen=max_samples)  # (time, ok, latency_ms)
+
+    def record(self, ok, latency_ms):
+        self.samples.append((time.monotonic(), ok, latency_ms))
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.window_s
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def requests(self):
+        return len(self._recent())
+
+    def error_rate(self):
+        recent = self._recent()
+        if not recent:
+            return 0.0
+        return sum(1 for _, ok, _ in recent if not ok) / len(recent)
+
+    def latency(self, points=(50, 95)):
+        return tracing.percentiles([ms for _, ok, ms in self._recent() if ok], points)
+
+
+class CircuitBreaker:
+    """Breaker of one provider, driven by its ProviderHealth."""
+
+    def __init__(self, name, health, error_rate=0.5, min_requests=4, consecutive_failures=3, cooldown_s=30.0):
+        self.name = name
+        self.health = health
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.consecutive_failures = consecutive_failures
+        self.cooldown_s = cooldown_s
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.failures_in_row = 0
+        self.probe_in_flight = False
+        self.transitions = deque(maxlen=50)  # (time, from, to, reason)
+        self.counters = {"opened": 0, "half_opened": 0, "closed": 0, "rejected": 0}
+
+    def allow(self):
+        """Whether a request may be sent now; moves open to half_open after the cooldown."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown_s:
+            self._transition(HALF_OPEN, "cooldown over")
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def record_success(self, latency_ms):
+        self.health.record(True, latency_ms)
+        self.failures_in_row = 0
+        self.probe_in_flight = False
+        if self.state != CLOSED:
+            self._transition(CLOSED, "probe succeeded")
+
+    def record_failure(self, latency_ms, reason=""):
+        self.health.record(False, latency_ms)
+        self.failures_in_row += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN:
+            self._open("probe failed: " + reason)
+        elif self.state == CLOSED:
+            if self.failures_in_row >= self.consecutive_failures:
+                self._open(f"{self.failures_in_row} failures in a row: {reason}")
+            elif (self.health.requests() >= self.min_requests and
+                  self.health.error_rate() >= self.error_rate):
+                self._open(f"error rate {self.health.error_rate():.0%}: {reason}")
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a probe through."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.cooldown_s - (time.monotonic() - self.opened_at))
+
+    def _open(self, reason):
+        self.opened_at = time.monotonic()
+        self._transition(OPEN, reason)
+
+    def _transition(self, state, reason):
+        if state == self.state:
+            return
+        print(f"Circuit breaker '{self.name}': {self.state} -> {state} ({reason})")
+        self.transitions.append((time.time(), self.state, state, reason))
+        self.counters[{OPEN: "opened", HALF_OPEN: "half_opened", CLOSED: "closed"}[state]] += 1
+        self.state = state
+
+    def to_dict(self):
+        return {
+            "state": self.state,
+            "requests": self.health.requests(),
+            "error_rate": round(self.health.error_rate(), 3),
+            "latency_ms": self.health.latency(),
+            "retry_in_s": round(self.retry_in(), 1),
+            **self.counters,
+        }
+
+
+class HealthRegistry:
+    """Thread-safe set of breakers, one per provider profile name."""
+
+    def __init__(self):
+        self.breakers = {}
+        self.settings = {}
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "failovers": 0, "exhausted": 0}
+
+    def configure(self, window_s=60.0, **settings):
+        with self.lock:
+            self.settings = dict(settings, window_s=window_s)
+            self.breakers.clear()
+
+    def breaker(self, name):
+        with self.lock:
+            return self._breaker(name)
+
+    def _breaker(self, name):
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            settings = dict(self.settings)
+            health = ProviderHealth(settings.pop("window_s", 60.0))
+            breaker = CircuitBreaker(name, health, **settings)
+            self.breakers[name] = breaker
+        return breaker
+
+    def acquire(self, name):
+        """Whether a request may be sent to the provider now (takes the half-open probe slot)."""
+        with self.lock:
+            return self._breaker(name).allow()
+
+    def closest_to_retry(self, profile_list):
+        """The profile whose open breaker will let a probe through first."""
+        with self.lock:
+            return min(profile_list, key=lambda p: self._breaker(p.name).retry_in())
+
+    def release(self, name):
+        """Give back an acquired request without an outcome (cancelled by the user)."""
+        with self.lock:
+            self._breaker(name).probe_in_flight = False
+
+    def record(self, name, ok, latency_ms, reason=""):
+        with self.lock:
+            breaker = self._breaker(name)
+            if ok:
+                breaker.record_success(latency_ms)
+            else:
+                breaker.record_failure(latency_ms, reason)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "providers": {name: breaker.to_dict() for name, breaker in self.breakers.items()},
+                **self.counters,
+            }
+
+
+# Create single instance
+registry = HealthRegistry()
+
+def is_enabled(api_config):
+    return config.typed(api_config).failover.enable
+
+"""
+Applies the FAILOVER section of api.json5 to the process-wide registry.
+"""
+def configure(api_config):
+    failover_config = config.typed(api_config or {}).failover
+    registry.configure(
+        window_s=failover_config.window_s,
+        error_rate=failover_config.error_rate,
+        min_requests=failover_config.min_requests,
+        consecutive_failures=failover_config.consecutive_failures,
+        cooldown_s=failover_config.cooldown_s)
+
+"""
+Sends the payload to one provider.
+
+Returns:
+    tuple: (finished, result, error). finished is False when the provider
+    failed before any text was delivered, so the next one can take over.
+"""
+def attempt(profile, payload, callback):
+    stream_fn, client_fn = translate.select_backend(profile.api_config)
+    start = time.perf_counter()
+
+    if callback is None:
+        text = client_fn(payload, profile.api_config)
+        failed = translate.is_error_text(text)
+        registry.record(profile.name, not failed, (time.perf_counter() - start) * 1000, text if failed else "")
+        return not failed, text, text if failed else None
+
+    state = {"delivered": False, "error": None, "stopped": False}
+
+    def on_chunk(text, end=False):
+        if state["stopped"]:
+            # Stopped by the consumer (e.g. a cancelled job), not a provider failure
+            return callback(text, end=end)
+        if end and translate.is_error_text(text):
+            state["error"] = text
+            if not state["delivered"]:
+                # Nothing shown yet, the next provider can take over
+                return
+        elif text:
+            state["delivered"] = True
+        try:
+            callback(text, end=end)
+        except Exception:
+            state["stopped"] = True
+            raise
+
+    try:
+        stream_fn(payload, profile.api_config, on_chunk)
+    except jobs.JobCancelled:
+        # The consumer stopped the stream, the provider did nothing wrong
+        registry.release(profile.name)
+        raise
+    latency_ms = (time.perf_counter() - start) * 1000
+    if state["stopped"]:
+        registry.release(profile.name)
+        return True, "", None
+    registry.record(profile.name, state["error"] is None, latency_ms, state["error"] or "")
+    return state["error"] is None or state["delivered"], "", state["error"]
+
+"""
+Sends the payload to the first healthy provider, failing over to the next one
+when a provider fails before delivering any text. A failure after text was
+already streamed can't be undone and is passed on.
+
+Parameters:
+    payload: encoder.ImagePayload or ocr.TextPayload, shared by every attempt.
+    api_config (dict): The app config.
+    callback (callable): callback(chunk, end), None for a non-streaming call.
+    profile_list (list): Profiles in priority order, default providers.profiles(api_config).
+
+Returns:
+    str: "" when streaming, otherwise the translation (or the last error).
+"""
+def call_with_failover(payload, api_config, callback=None, profile_list=None):
+    profile_list = profile_list or providers.profiles(api_config)
+    registry.count("requests")
+    error = "Request Error: no provider available"
+    tried = 0
+    for profile in profile_list:
+        if not registry.acquire(profile.name):
+            continue
+        if tried:
+            registry.count("failovers")
+            print(f"Failing over to '{profile.name}'")
+        tried += 1
+        finished, result, error = attempt(profile, payload, callback)
+        if finished:
+            return result
+
+    if not tried:
+        # Every breaker is open: probe the one closest to the end of its cooldown rather than failing outright
+        profile = registry.closest_to_retry(profile_list)
+        print(f"Every provider is unhealthy, trying '{profile.name}'")
+        finished, result, error = attempt(profile, payload, callback)
+        if finished:
+            return result
+
+    registry.count("exhausted")
+    if callback:
+        callback(error, end=True)
+        return ""
+    return error
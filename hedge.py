@@ -0,0 +1,260 @@
+"""
+Hedged requests across provider profiles.
+
+The job is sent to the primary provider first. If no chunk has arrived after
+the hedge delay (fixed, or the p95 time to first chunk observed for the primary),
+or the primary fails before its first chunk, the same payload is sent to the
+next provider. Whichever streams first wins: its chunks go to the callback and
+every other streaming attempt is cancelled at once (they run on the aio loop).
+
+The time to first chunk of a loser counts too: a stopped loser records the time
+it had been waiting (a lower bound), so the p95 delay of a slow primary grows
+instead of only keeping its fast wins.
+
+See the HEDGE and PROVIDERS sections of api.json5.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+import config
+import jobs
+import providers
+import tracing
+import translate
+
+# Observed time to first chunk (ms) per provider name
+_ttft_history = {}
+_history_lock = threading.Lock()
+
+# Counters of hedged jobs
+stats = {"jobs": 0, "hedged": 0, "primary_wins": 0, "secondary_wins": 0, "failed": 0}
+
+
+class HedgeLost(jobs.JobCancelled):
+    """Raised inside the callback of an attempt that lost the race to stop it (the attempt is cancelled)."""
+
+
+def record_ttft(name, ms):
+    with _history_lock:
+        _ttft_history.setdefault(name, deque(maxlen=200)).append(ms)
+
+def observed_ttft(name, point=95):
+    with _history_lock:
+        values = list(_ttft_history.get(name, ()))
+    return tracing.percentiles(values, (point,)).get(point), len(values)
+
+def is_enabled(api_config):
+    return config.typed(api_config).hedge.enable
+
+"""
+The delay before the next provider is tried, in seconds.
+
+DELAY_MS "auto" uses the p95 time to first chunk of the primary once enough
+samples were seen, DEFAULT_DELAY_MS before that.
+"""
+def hedge_delay(api_config, primary_name):
+    hedge_config = config.typed(api_config).hedge
+    if hedge_config.delay_ms != "auto":
+        return hedge_config.delay_ms / 1000
+    p95, samples = observed_ttft(primary_name)
+    if p95 is None or samples < hedge_config.min_samples:
+        return hedge_config.default_delay_ms / 1000
+    return max(hedge_config.min_delay_ms, p95) / 1000
+
+
+class HedgedRace:
+    """Forwards the chunks of the first attempt that streams, stops the others."""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.winner = None
+        self.running = 0
+        self.errors = []
+        self.attempts = {}  # Running attempt profile -> (start, future or None)
+        self.lock = threading.Lock()
+        self.changed = threading.Event()  # A first chunk or a finished attempt
+        self.done = threading.Event()
+
+    def attempt_callback(self, profile, start):
+        def on_chunk(text, end=False):
+            losers = []
+            with self.lock:
+                if self.winner is not None and self.winner is not profile:
+                    if end:
+                        return
+                    if text and profile in self.attempts:
+                        # A loser that couldn't be stopped: its real time to first chunk
+                        record_ttft(profile.name, (time.perf_counter() - start) * 1000)
+                        del self.attempts[profile]
+                    raise HedgeLost(f"{profile.name} lost the race")
+                if self.winner is None:
+                    if not text and not end:
+                        return
+                    if end and translate.is_error_text(text):
+                        # Failed before its first chunk, another provider may still win
+                        print(f"Hedge: {profile.name} failed: {text}")
+                        self.errors.append(text)
+                        return
+                    self.winner = profile
+                    now = time.perf_counter()
+                    record_ttft(profile.name, (now - start) * 1000)
+                    for other, (other_start, future) in list(self.attempts.items()):
+                        if other is not profile and future is not None:
+                            # Stopped before its first chunk: it would have taken at least this long,
+                            # otherwise a slow provider that keeps losing never raises its p95
+                            record_ttft(other.name, (now - other_start) * 1000)
+                            del self.attempts[other]
+                            losers.append(future)
+                    self.changed.set()
+            for future in losers:
+                # Cancels the task on the aio loop, which closes the loser's HTTP response
+                future.cancel()
+            self.callback(text, end=end)
+            if end:
+                self.done.set()
+        return on_chunk
+
+    def launch(self, target, profile):
+        """Run target(profile, on_chunk) in a thread."""
+        on_chunk = self._start(profile)[1]
+        # Attempts keep the caller's context (rate limit priority)
+        context = contextvars.copy_context()
+
+        def run():
+            try:
+                target(profile, on_chunk)
+            finally:
+                self.finished(profile)
+
+        threading.Thread(target=context.run, args=(run,), daemon=True).start()
+
+    def launch_async(self, target, profile):
+        """Run the coroutine target(profile, on_chunk) on the aio loop, where a loser is cancelled."""
+        import aio
+        start, on_chunk = self._start(profile)
+        future = aio.submit(target(profile, on_chunk), contextvars.copy_context())
+        with self.lock:
+            lost = self.winner is not None and self.winner is not profile
+            if profile in self.attempts and not lost:
+                self.attempts[profile] = (start, future)
+        if lost:
+            future.cancel()
+        # Also runs when the attempt is cancelled before it started
+        future.add_done_callback(lambda _: self.finished(profile))
+
+    def _start(self, profile):
+        start = time.perf_counter()
+        with self.lock:
+            self.running += 1
+            self.attempts[profile] = (start, None)
+        return start, self.attempt_callback(profile, start)
+
+    def finished(self, profile):
+        with self.lock:
+            self.running -= 1
+            self.attempts.pop(profile, None)
+            if self.winner is profile:
+                self.done.set()
+        self.changed.set()
+
+    def state(self):
+        with self.lock:
+            return self.winner, self.running
+
+
+"""
+Streams the payload through the provider profiles with hedging.
+
+Streaming attempts run on the aio event loop so that the losers are cancelled
+(their HTTP responses closed) as soon as another attempt wins; non-streaming
+attempts run in threads and a late loser's answer is discarded.
+
+Parameters:
+    payload: encoder.ImagePayload or ocr.TextPayload, shared by every attempt.
+    api_config (dict): The app config (HEDGE and PROVIDERS sections).
+    callback (callable): callback(chunk, end), None for a non-streaming call.
+    profile_list (list): Profiles to race in order, default providers.profiles(api_config).
+
+Returns:
+    str: "" when streaming, otherwise the translation (or the last error).
+"""
+def call_hedged(payload, api_config, callback=None, profile_list=None):
+    profile_list = list(profile_list or providers.profiles(api_config))
+    chunks = []
+
+    def collect(text, end=False):
+        if text:
+            chunks.append(text)
+
+    race = HedgedRace(callback or collect)
+
+    async def stream_attempt(profile, on_chunk):
+        stream_async = translate.select_async_backend(profile.api_config)
+        try:
+            async for chunk in stream_async(payload, profile.api_config):
+                on_chunk(chunk, end=False)
+            on_chunk("", end=True)
+        except jobs.JobCancelled:
+            # Lost the race (HedgeLost) or the job was cancelled, not a provider failure
+            pass
+        except Exception as e:
+            on_chunk(f"Request Error: {e}", end=True)
+
+    def client_attempt(profile, on_chunk):
+        _, client_fn = translate.select_backend(profile.api_config)
+        try:
+            # Non-streaming: the whole response is the first chunk
+            text = client_fn(payload, profile.api_config)
+            if translate.is_error_text(text):
+                on_chunk(text, end=True)
+            else:
+                on_chunk(text, end=False)
+                on_chunk("", end=True)
+        except jobs.JobCancelled:
+            pass
+        except Exception as e:
+            on_chunk(f"Request Error: {e}", end=True)
+
+    def launch(profile):
+        if callback is None:
+            race.launch(client_attempt, profile)
+        else:
+            race.launch_async(stream_attempt, profile)
+
+    _count("jobs")
+    delay = hedge_delay(api_config, profile_list[0].name)
+    pending = profile_list[1:]
+    launch(profile_list[0])
+    deadline = time.monotonic() + delay
+    while True:
+        winner, running = race.state()
+        if winner is not None or (running == 0 and not pending):
+            break
+        if pending and (running == 0 or time.monotonic() >= deadline):
+            # No first chunk in time (or the attempts failed), try the next provider too
+            profile = pending.pop(0)
+            print(f"Hedge: no first chunk yet, also trying {profile.name}")
+            _count("hedged")
+            launch(profile)
+            deadline = time.monotonic() + delay
+            continue
+        race.changed.wait(max(0.0, deadline - time.monotonic()) if pending else None)
+        race.changed.clear()
+
+    if winner is None:
+        _count("failed")
+        error = race.errors[-1] if race.errors else "Request Error: no provider answered"
+        if callback:
+            callback(error, end=True)
+            return ""
+        return error
+
+    race.done.wait()
+    _count("primary_wins" if winner is profile_list[0] else "secondary_wins")
+    print(f"Hedge: {winner.name} won")
+    return "" if callback else "".join(chunks)
+
+def _count(name):
+    with _history_lock:
+        stats[name] += 1
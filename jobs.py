@@ -0,0 +1,192 @@
+"""
+Hotkey job policy: what happens when a capture is requested while the previous
+translation is still streaming.
+
+    latest  the new capture cancels the in-flight job (stream and pending
+            speech), its late chunks are discarded, the new job starts at once
+    queue   the new capture runs when the current job is done (only the most
+            recent pending capture is kept)
+    drop    the new capture is ignored (the original behaviour)
+
+A request of a more important lane (a hotkey) always preempts a running job of
+a less important one (watch mode), whatever the policy; a less important
+request never disturbs a running job and is dropped.
+
+See the JOBS section of api.json5. Jobs run on scheduler.Scheduler.
+"""
+import itertools
+import threading
+import time
+
+POLICIES = ("latest", "queue", "drop")
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+EXPIRED = "expired"
+
+
+class JobCancelled(Exception):
+    """Raised inside a stream callback of a cancelled job to stop the provider loop."""
+
+
+class Job:
+    """
+    A translation job: its lane priority (lower runs first), an optional
+    deadline (time.monotonic) to start by, its state and its cancel token.
+    """
+
+    def __init__(self, job_id, message, priority=0, deadline=None):
+        self.id = job_id
+        self.message = message
+        self.priority = priority
+        self.deadline = deadline
+        self.state = QUEUED
+        self.created = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.cancelled = threading.Event()
+        self.on_cancel = []  # Called once on cancel, e.g. future.cancel
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        with self.lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            handlers, self.on_cancel = self.on_cancel, []
+        for handler in handlers:
+            try:
+                handler()
+            except Exception as e:
+                print(f"Error cancelling job {self.id}: {e}")
+
+    def is_cancelled(self):
+        return self.cancelled.is_set()
+
+    def is_active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    def wait_ms(self):
+        """Time spent queued, None before the job started."""
+        return None if self.started is None else (self.started - self.created) * 1000
+
+    def run_ms(self):
+        return None if self.finished is None or self.started is None else (self.finished - self.started) * 1000
+
+    def to_dict(self):
+        wait_ms, run_ms = self.wait_ms(), self.run_ms()
+        return {
+            "id": self.id,
+            "message": self.message,
+            "priority": self.priority,
+            "state": self.state,
+            "wait_ms": None if wait_ms is None else round(wait_ms, 1),
+            "run_ms": None if run_ms is None else round(run_ms, 1),
+        }
+
+    def add_cancel_handler(self, handler):
+        """Register a handler, it runs immediately when the job is already cancelled."""
+        with self.lock:
+            if not self.cancelled.is_set():
+                self.on_cancel.append(handler)
+                return
+        handler()
+
+
+class JobController:
+    """Applies the hotkey policy and counts what happened to each request."""
+
+    def __init__(self, policy="latest"):
+        self.policy = policy if policy in POLICIES else "latest"
+        self.current = None
+        self.pending = None
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.counters = {"started": 0, "cancelled": 0, "queued": 0, "dropped": 0, "preempted": 0, "late_chunks": 0}
+
+    def request(self, message, is_busy, priority=0, deadline_s=None):
+        """
+        Decide what to do with a capture request.
+
+        Parameters:
+            priority (int): Lane of the request, see scheduler.INTERACTIVE and friends.
+            deadline_s (float): Drop the job when it couldn't start within this many seconds.
+
+        Returns:
+            Job or None: The job to start now, None when it was queued or dropped.
+        """
+        with self.lock:
+            busy = self.current is not None and is_busy()
+            preempt = busy and priority < self.current.priority
+            if busy and priority > self.current.priority:
+                # Background work never disturbs a more important job
+                self.counters["dropped"] += 1
+                return None
+            if preempt:
+                self.counters["preempted"] += 1
+            elif busy and self.policy == "drop":
+                self.counters["dropped"] += 1
+                return None
+            elif busy and self.policy == "queue":
+                if self.pending is not None:
+                    self.counters["dropped"] += 1
+                self.pending = (message, priority)
+                self.counters["queued"] += 1
+                return None
+            previous = self.current if busy else None
+            if previous is not None:
+                self.counters["cancelled"] += 1
+            job = self._start(message, priority, deadline_s)
+        if previous is not None:
+            print(f"Cancelling job {previous.id}, job {job.id} supersedes it")
+            previous.cancel()
+        return job
+
+    def finish(self, job):
+        """
+        Mark the job done.
+
+        Returns:
+            Job or None: The queued job to start next (queue policy).
+        """
+        with self.lock:
+            if self.current is not job:
+                return None
+            self.current = None
+            if self.pending is None:
+                return None
+            (message, priority), self.pending = self.pending, None
+            return self._start(message, priority)
+
+    def is_current(self, job):
+        return job is not None and self.current is job and not job.is_cancelled()
+
+    def guard(self, job, callback, stop=True):
+        """
+        Wraps a stream callback so that chunks of a cancelled job are discarded.
+        With stop, the first late chunk stops the provider loop by raising JobCancelled.
+        """
+        def guarded(text, end=False):
+            if job.is_cancelled():
+                with self.lock:
+                    self.counters["late_chunks"] += 1
+                if stop and not end:
+                    raise JobCancelled(f"job {job.id} cancelled")
+                return
+            callback(text, end=end)
+        return guarded
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, policy=self.policy)
+
+    def _start(self, message, priority=0, deadline_s=None):
+        deadline = time.monotonic() + deadline_s if deadline_s else None
+        job = Job(next(self._ids), message, priority, deadline)
+        self.current = job
+        self.counters["started"] += 1
+        return job
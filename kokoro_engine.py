@@ -0,0 +1,186 @@
+"""
+Process-wide Kokoro engine for the kokoro-offline speech.
+
+Loading kokoro-onnx means reading the ONNX model (~80 MB quantized) and the
+voices file and building an ONNX Runtime session, which takes seconds. The
+engine is created once, on first use or by warm_up() at app start, and then
+shared by every utterance; it is only rebuilt when the KOKORO section changes.
+
+The ONNX Runtime thread pools are configurable (KOKORO.INTRA_OP_THREADS and
+INTER_OP_THREADS, 0 keeps the runtime's default of one thread per core), so a
+low-end machine can leave cores to the UI and the capture.
+
+stats() reports what is needed to size it: the load time, the resident memory
+before and after loading, and the real-time factor of the syntheses (synthesis
+time / audio duration, below 1 is faster than real time).
+"""
+import os
+import sys
+import threading
+import time
+import config
+
+_engine = None
+_lock = threading.Lock()
+
+
+"""
+Resident memory of the process in MB (psutil when installed, /proc on Linux,
+the peak resident size otherwise).
+
+Returns:
+    float: Resident memory in MB, None when it can't be measured.
+"""
+def rss_mb():
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / 2**20, 1)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, KB on Linux
+        return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        return None
+
+
+class KokoroEngine:
+    """A loaded Kokoro model; create() may be called from any thread."""
+
+    def __init__(self, model_path, voices_path, intra_op_threads=0, inter_op_threads=0):
+        self.model_path = model_path
+        self.voices_path = voices_path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.kokoro = None
+        self.lock = threading.Lock()
+        self.counters = {"load_ms": None, "rss_before_mb": None, "rss_after_mb": None,
+                         "syntheses": 0, "audio_s": 0.0, "synthesis_s": 0.0, "last_rtf": None}
+
+    def settings(self):
+        return (self.model_path, self.voices_path, self.intra_op_threads, self.inter_op_threads)
+
+    def load(self):
+        """Loads the model and voices, once."""
+        with self.lock:
+            if self.kokoro is None:
+                self._load()
+            return self.kokoro
+
+    def _load(self):
+        from kokoro_onnx import Kokoro
+        self.counters["rss_before_mb"] = rss_mb()
+        start = time.perf_counter()
+        if hasattr(Kokoro, "from_session"):
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            if self.intra_op_threads:
+                options.intra_op_num_threads = self.intra_op_threads
+            if self.inter_op_threads:
+                options.inter_op_num_threads = self.inter_op_threads
+            session = onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+            self.kokoro = Kokoro.from_session(session, self.voices_path)
+        else:
+            # Older kokoro-onnx builds its own session
+            if self.intra_op_threads or self.inter_op_threads:
+                print("kokoro-onnx without from_session(), the ONNX Runtime thread settings are ignored")
+            self.kokoro = Kokoro(self.model_path, self.voices_path)
+        self.counters["load_ms"] = round((time.perf_counter() - start) * 1000)
+        self.counters["rss_after_mb"] = rss_mb()
+        print(f"Kokoro loaded in {self.counters['load_ms']} ms, "
+              f"resident memory {self.counters['rss_before_mb']} -> {self.counters['rss_after_mb']} MB")
+
+    def create(self, text, voice, speed=1.0, lang="en-us"):
+        """
+        Synthesizes text.
+
+        Returns:
+            tuple: (float32 samples, sample rate), like Kokoro.create().
+        """
+        kokoro = self.load()
+        with self.lock:
+            # One synthesis at a time, ONNX Runtime already uses its thread pools
+            start = time.perf_counter()
+            samples, sample_rate = kokoro.create(text=text, voice=voice, speed=speed, lang=lang)
+            elapsed = time.perf_counter() - start
+            audio_s = len(samples) / sample_rate if sample_rate else 0.0
+            self.counters["syntheses"] += 1
+            self.counters["synthesis_s"] += elapsed
+            self.counters["audio_s"] += audio_s
+            if audio_s:
+                self.counters["last_rtf"] = round(elapsed / audio_s, 3)
+        return samples, sample_rate
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, loaded=self.kokoro is not None, rss_mb=rss_mb(),
+                         intra_op_threads=self.intra_op_threads, inter_op_threads=self.inter_op_threads)
+        stats["rtf"] = round(stats["synthesis_s"] / stats["audio_s"], 3) if stats["audio_s"] else None
+        stats["audio_s"] = round(stats["audio_s"], 2)
+        stats["synthesis_s"] = round(stats["synthesis_s"], 2)
+        return stats
+
+
+"""
+Returns the process-wide engine for the KOKORO section, created (not loaded)
+on first use and replaced when the model or thread settings change.
+
+Returns:
+    KokoroEngine: The shared engine.
+"""
+def get(api_config):
+    global _engine
+    kokoro_config = config.typed(api_config).kokoro
+    engine = KokoroEngine(config.get_resource_path(kokoro_config.model),
+                          config.get_resource_path(kokoro_config.voices),
+                          kokoro_config.intra_op_threads, kokoro_config.inter_op_threads)
+    with _lock:
+        if _engine is None or _engine.settings() != engine.settings():
+            _engine = engine
+        return _engine
+
+def is_used(api_config):
+    speech_config = config.typed(api_config).speech
+    return speech_config.stream and speech_config.type == "kokoro-offline"
+
+"""
+Loads the engine and runs one short synthesis in a daemon thread, so the first
+translation is spoken without waiting for the model (KOKORO.WARM_UP).
+
+Returns:
+    threading.Thread or None: The warm-up thread, None when kokoro-offline isn't used.
+"""
+def warm_up(api_config):
+    if not (is_used(api_config) and config.typed(api_config).kokoro.warm_up):
+        return None
+    engine = get(api_config)
+    speech_config = config.typed(api_config).speech
+
+    def run():
+        try:
+            engine.create("Hello.", speech_config.model, speech_config.rate, speech_config.lang)
+            stats = engine.stats()
+            print(f"Kokoro warmed up: real-time factor {stats['last_rtf']}, resident memory {stats['rss_mb']} MB")
+        except Exception as e:
+            # Reported again when the first translation is spoken
+            print(f"Kokoro warm-up failed: {e}")
+
+    thread = threading.Thread(target=run, name="kokoro-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+"""
+Returns:
+    dict: Stats of the shared engine, None when it was never used.
+"""
+def stats():
+    with _lock:
+        engine = _engine
+    return engine.stats() if engine else None
@@ -0,0 +1,230 @@
+"""
+Paragraph-level translation memory backed by SQLite.
+
+The prompt makes the model answer with Japanese/English paragraph pairs. Those
+pairs are parsed out of every finished translation, the Japanese side is NFKC
+normalised, and they are stored in a local SQLite database. Text-only flows
+(local OCR) can then serve known paragraphs instantly and only ask the model
+for the unknown ones.
+
+Usage:
+    python memory.py export memory.jsonl
+    python memory.py import memory.jsonl
+    python memory.py stats
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import config
+
+# Hiragana, Katakana, Kanji and half-width Katakana (same ranges as language.keep_japanese_only)
+_japanese_pattern = re.compile(r'[\u3040-\u309f\u30a0-\u30ff\u4e00-\u9faf\uff66-\uff9f]')
+
+
+"""
+Normalises a Japanese paragraph for lookups: NFKC (full/half width forms) and
+no whitespace, so the same line read twice by OCR or the model maps to one key.
+"""
+def normalize(text):
+    return "".join(unicodedata.normalize("NFKC", text).split())
+
+def contains_japanese(text):
+    return _japanese_pattern.search(text) is not None
+
+"""
+Parses the Japanese/English paragraph pairs out of a translation.
+
+A pair is a block separated by blank lines whose leading lines contain Japanese
+and whose following lines don't, as in the example output of the prompt.
+
+Returns:
+    list: [(japanese, english), ...]
+"""
+def parse_pairs(text):
+    pairs = []
+    if not text:
+        return pairs
+    for block in re.split(r'\n\s*\n', text.replace("\r\n", "\n")):
+        lines = [line.strip() for line in block.split("\n") if line.strip()]
+        source_lines = []
+        index = 0
+        while index < len(lines) and contains_japanese(lines[index]):
+            source_lines.append(lines[index])
+            index += 1
+        target_lines = lines[index:]
+        if source_lines and target_lines and not any(contains_japanese(line) for line in target_lines):
+            pairs.append(("\n".join(source_lines), " ".join(target_lines)))
+    return pairs
+
+"""
+Formats pairs the same way the model does, so cached and live output look alike.
+"""
+def format_pairs(pairs):
+    return "".join(f"{source}\n{target}\n\n" for source, target in pairs)
+
+
+class TranslationMemory:
+    """Thread-safe SQLite store of translated paragraphs, evicted by last use."""
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pairs ("
+                " source_key TEXT PRIMARY KEY,"
+                " source TEXT NOT NULL,"
+                " target TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_pairs_last_used ON pairs(last_used)")
+
+    def add_pairs(self, pairs):
+        """Insert or update pairs, then evict the least recently used beyond max_entries."""
+        now = time.time()
+        rows = [(normalize(source), source, target, now, now) for source, target in pairs if normalize(source)]
+        if not rows:
+            return 0
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO pairs (source_key, source, target, created, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(source_key) DO UPDATE SET target = excluded.target, last_used = excluded.last_used",
+                rows)
+            self._evict()
+        return len(rows)
+
+    def record_text(self, text):
+        """Parse a finished translation and remember its paragraph pairs."""
+        return self.add_pairs(parse_pairs(text))
+
+    def lookup(self, source):
+        result = self.lookup_many([source])
+        return result.get(normalize(source))
+
+    def lookup_many(self, sources):
+        """
+        Look up many Japanese paragraphs at once.
+
+        Returns:
+            dict: {normalized source: english} for the known paragraphs only.
+        """
+        keys = list({normalize(source) for source in sources if normalize(source)})
+        if not keys:
+            return {}
+        found = {}
+        with self.lock, self.connection:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, target in self.connection.execute(
+                        f"SELECT source_key, target FROM pairs WHERE source_key IN ({placeholders})", batch):
+                    found[key] = target
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE pairs SET last_used = ?, hits = hits + 1 WHERE source_key = ?",
+                    [(now, key) for key in found])
+        return found
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+
+    def export_jsonl(self, path):
+        """Write every pair as one JSON object per line."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT source, target, created, last_used, hits FROM pairs ORDER BY created").fetchall()
+        with open(path, "w", encoding="utf-8") as f:
+            for source, target, created, last_used, hits in rows:
+                f.write(json.dumps({"source": source, "target": target, "created": created,
+                                    "last_used": last_used, "hits": hits}, ensure_ascii=False) + "\n")
+        return len(rows)
+
+    def import_jsonl(self, path):
+        """Read pairs exported by export_jsonl (only source/target are required)."""
+        pairs = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                pairs.append((entry["source"], entry["target"]))
+        return self.add_pairs(pairs)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _evict(self):
+        overflow = self.connection.execute("SELECT COUNT(*) FROM pairs").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.connection.execute(
+                "DELETE FROM pairs WHERE source_key IN "
+                "(SELECT source_key FROM pairs ORDER BY last_used ASC LIMIT ?)", (overflow,))
+
+
+# Create single instance (lazily, it depends on api.json5)
+_translation_memory = None
+_memory_lock = threading.Lock()
+
+"""
+Opens the translation memory file configured in the MEMORY section, whether or
+not the app uses it (MEMORY.ENABLE), e.g. for the export/import command line.
+
+Raises:
+    sqlite3.Error: The file can't be opened.
+"""
+def open_memory(api_config):
+    memory_config = config.typed(api_config).memory
+    path = config.get_resource_path(memory_config.path, external=True)
+    return TranslationMemory(path, memory_config.max_entries)
+
+"""
+Returns the process-wide translation memory, or None when the MEMORY section is
+missing or disabled in api.json5.
+"""
+def get_memory(api_config):
+    global _translation_memory
+    memory_config = config.typed(api_config).memory if api_config else None
+    if not memory_config or not memory_config.enable:
+        return None
+
+    with _memory_lock:
+        if _translation_memory is None:
+            try:
+                _translation_memory = open_memory(api_config)
+            except sqlite3.Error as e:
+                print(f"Error opening translation memory '{memory_config.path}': {e}")
+                return None
+        return _translation_memory
+
+
+# Import/export from the command line
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Sakana Lens translation memory")
+    parser.add_argument("command", choices=["export", "import", "stats"])
+    parser.add_argument("file", nargs="?", help="JSONL file for export/import")
+    args = parser.parse_args()
+
+    try:
+        tm = open_memory(config.read_config('api.json5') or {})
+    except sqlite3.Error as e:
+        print(f"Error opening translation memory: {e}")
+        raise SystemExit(1)
+    if args.command == "export":
+        print(f"Exported {tm.export_jsonl(args.file)} pairs to {args.file}")
+    elif args.command == "import":
+        print(f"Imported {tm.import_jsonl(args.file)} pairs from {args.file}")
+    else:
+        print(f"{tm.count()} pairs in {tm.path}")
@@ -0,0 +1,170 @@
+"""
+Optional local OCR stage.
+
+When enabled in the OCR section of api.json5, the capture is recognised
+locally before translate.call_real_api talks to the provider. If the OCR is
+confident, the provider only receives the extracted Japanese text with a
+text-only prompt (much smaller requests than an image), otherwise the normal
+image path is used automatically.
+
+Backends:
+    tesseract: pytesseract + the Tesseract binary with the jpn traineddata
+               brew install tesseract tesseract-lang && pip install pytesseract
+    onnx:      RapidOCR on ONNX Runtime
+               pip install rapidocr_onnxruntime
+    fake:      Deterministic backend for tests and benchmarks
+"""
+import threading
+import time
+import config
+
+DEFAULT_TEXT_PROMPT = (
+    "You are an expert in translation. The following Japanese text was extracted from a screenshot by OCR.\n"
+    "1. Translate it into English.\n"
+    "2. Format the output as pairs of paragraphs: each Japanese paragraph followed by its English translation, "
+    "with a blank line between pairs.\n"
+    "3. Don't include any explanations or additional text.\n\n"
+    "Japanese text:"
+)
+
+
+class TextPayload:
+    """Text sent to a provider instead of an image (the OCR path)."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class OcrResult:
+    def __init__(self, text, confidence, elapsed_ms=0.0):
+        self.text = text
+        self.confidence = confidence  # 0.0 - 1.0
+        self.elapsed_ms = elapsed_ms
+
+
+class OcrBackend:
+    """Base class of the OCR backends, subclasses implement _recognize(image)."""
+    name = "base"
+
+    def recognize(self, image):
+        start = time.perf_counter()
+        text, confidence = self._recognize(image)
+        return OcrResult(text.strip(), confidence, (time.perf_counter() - start) * 1000)
+
+    def _recognize(self, image):
+        raise NotImplementedError
+
+
+class TesseractOcr(OcrBackend):
+    name = "tesseract"
+
+    def __init__(self, lang="jpn"):
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.lang = lang
+
+    def _recognize(self, image):
+        data = self.pytesseract.image_to_data(image, lang=self.lang, output_type=self.pytesseract.Output.DICT)
+        lines = {}
+        confidences = []
+        for i, word in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not word.strip():
+                continue
+            confidences.append(conf)
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+
+        # Lines of the same paragraph are joined (Japanese has no spaces between words)
+        paragraphs = {}
+        for (block, par, _), words in sorted(lines.items()):
+            paragraphs.setdefault((block, par), []).append("".join(words))
+        text = "\n".join("".join(line for line in par_lines) for par_lines in paragraphs.values())
+        confidence = sum(confidences) / len(confidences) / 100 if confidences else 0.0
+        return text, confidence
+
+
+class OnnxOcr(OcrBackend):
+    name = "onnx"
+
+    def __init__(self):
+        from rapidocr_onnxruntime import RapidOCR
+        self.engine = RapidOCR()
+
+    def _recognize(self, image):
+        import numpy as np
+        result, _ = self.engine(np.asarray(image.convert("RGB")))
+        if not result:
+            return "", 0.0
+        # result: [[box, text, score], ...], sorted top to bottom then left to right
+        result.sort(key=lambda item: (item[0][0][1], item[0][0][0]))
+        text = "\n".join(item[1] for item in result)
+        confidence = sum(float(item[2]) for item in result) / len(result)
+        return text, confidence
+
+
+class FakeOcr(OcrBackend):
+    """Returns a fixed text and confidence, no matter the image."""
+    name = "fake"
+
+    def __init__(self, text="", confidence=1.0):
+        self.text = text
+        self.confidence = confidence
+
+    def _recognize(self, image):
+        return self.text, self.confidence
+
+
+"""
+The prompt used for text-only requests (OCR path).
+"""
+def text_prompt(api_config):
+    return config.typed(api_config).ocr.text_prompt or DEFAULT_TEXT_PROMPT
+
+def min_confidence(api_config):
+    return config.typed(api_config).ocr.min_confidence
+
+
+# Create single instance (lazily, the engines are slow to load)
+_backend = None
+_backend_settings = None  # What _backend was built from, None for a backend given to set_backend()
+_backend_lock = threading.Lock()
+
+"""
+Returns the configured OCR backend, or None when OCR is disabled or the engine
+cannot be loaded. The engine is rebuilt when its settings change (a reloaded
+api.json5).
+"""
+def get_backend(api_config):
+    global _backend, _backend_settings
+    ocr_config = config.typed(api_config).ocr if api_config else None
+    if not ocr_config or not ocr_config.enable:
+        return None
+
+    settings = (ocr_config.engine.lower(), ocr_config.lang, ocr_config.fake_text, ocr_config.fake_confidence)
+    with _backend_lock:
+        if _backend is None or _backend_settings is not None and _backend_settings != settings:
+            _backend = None
+            _backend_settings = settings
+            engine = ocr_config.engine.lower()
+            try:
+                if engine == "tesseract":
+                    _backend = TesseractOcr(ocr_config.lang)
+                elif engine == "onnx":
+                    _backend = OnnxOcr()
+                elif engine == "fake":
+                    _backend = FakeOcr(ocr_config.fake_text, ocr_config.fake_confidence)
+                else:
+                    print(f"Unknown OCR engine '{engine}', OCR disabled")
+                    return None
+            except Exception as e:
+                print(f"Error loading OCR engine '{engine}': {e}")
+                return None
+        return _backend
+
+def set_backend(backend):
+    """Replace the OCR backend, e.g. with a FakeOcr in tests; it stays until set_backend(None)."""
+    global _backend, _backend_settings
+    with _backend_lock:
+        _backend = backend
+        _backend_settings = None
@@ -1,114 +1,129 @@
-import io
-from openai import OpenAI
-import base64
+import ocr
+import clients
+import config
+import jobs
+import ratelimit
 
-def image_to_base64(image):
-    buffered = io.BytesIO()
-    image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
-
-def call_openai_api_client(image, api_config):
-    # Convert image to base64
-    try:
-        # Convert image to base64
-        image_base64 = image_to_base64(image)
-        image_url = "data:image/png;base64," + image_base64
-    except Exception as e:
-        formatted_text = (f"Error preparing image: {e}")
-        return formatted_text
+# User message: the prompt followed by the image, or by the OCR text (text-only request)
+def build_user_content(payload, api_config):
+    if isinstance(payload, ocr.TextPayload):
+        return [
+            {
+                "type": "text",
+                "text": ocr.text_prompt(api_config)
+            },
+            {
+                "type": "text",
+                "text": payload.text
+            }
+        ]
+    return [
+        {
+            "type": "text",
+            "text": api_config["API"]["PROMPT"]
+        },
+        {
+            "type": "image_url",
+            "image_url": {
+                "url": payload.to_data_url()
+            }
+        }
+    ]
 
+# payload: encoder.ImagePayload shared by all provider paths, or ocr.TextPayload
+def call_openai_api_client(payload, api_config):
     # Prompt for: OCR + Translation + Formatting
     model = api_config["API"]["MODEL"]
     key = api_config["API"]["KEY"]
     endpoint = api_config["API"]["ENDPOINT"]
-    prompt = api_config["API"]["PROMPT"]
     sys_prompt = api_config["API"]["SYS_PROMPT"]
-    temperature = float(api_config["API"]["TEMPERATURE"])
+    temperature = config.typed(api_config).api.temperature
 
     # Invoke the OpenAI compatible API
     try:
-        client = OpenAI(base_url=endpoint, api_key=key)
-        response = client.chat.completions.create(
-            model=model,
-            temperature=temperature,
-            messages=[
-                {'role': 'system', 'content': sys_prompt},
-                {'role': 'user',
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": image_url
-                        }
-                    }
-                ]}
-            ]
-        )
+        with clients.use("openai", api_config) as client:
+            response = client.chat.completions.create(
+                model=model,
+                temperature=temperature,
+                messages=[
+                    {'role': 'system', 'content': sys_prompt},
+                    {'role': 'user', "content": build_user_content(payload, api_config)}
+                ]
+            )
 
         formatted_text = (response.choices[0].message.content)
         return formatted_text
     except Exception as e:
+        ratelimit.note_failure(e)
         formatted_text = (f"Request Error: {e}")
         return formatted_text
 
 
-def call_openai_api_stream(image, api_config, callback):
-    # Convert image to base64
-    try:
-        image_base64 = image_to_base64(image)
-        image_url = "data:image/png;base64," + image_base64
-    except Exception as e:
-        callback(f"Error preparing image: {e}", end=True)
-        return ""
-
+def call_openai_api_stream(payload, api_config, callback):
     # Extract configuration
     model = api_config["API"]["MODEL"]
     key = api_config["API"]["KEY"]
     endpoint = api_config["API"]["ENDPOINT"]
-    prompt = api_config["API"]["PROMPT"]
     sys_prompt = api_config["API"]["SYS_PROMPT"]
-    temperature = float(api_config["API"]["TEMPERATURE"])
+    temperature = config.typed(api_config).api.temperature
 
     try:
-        # Initialize the client
-        client = OpenAI(base_url=endpoint, api_key=key)
+        # Pooled client (keep-alive connections are reused between requests),
+        # held until the stream is done
+        with clients.use("openai", api_config) as client:
+            # Call the API in streaming mode by adding stream=True
+            response_stream = client.chat.completions.create(
+                model=model,
+                temperature=temperature,
+                stream=True,
+                messages=[
+                    {'role': 'system', 'content': sys_prompt},
+                    {'role': 'user', "content": build_user_content(payload, api_config)}
+                ]
+            )
+
+            # Accumulate the streamed output
+            try:
+                for chunk in response_stream:
+                    # Check if the chunk contains content in the delta field
+                    delta = chunk.choices[0].delta
+                    chunk_text = delta.content
+                    callback(chunk_text, end=False)
+            finally:
+                # Release the connection, also when the stream was stopped early
+                response_stream.close()
+        callback("", end=True)
+        return ""
+    
+    except jobs.JobCancelled:
+        # Stopped by the consumer (cancelled job, lost hedge), not a provider failure
+        raise
+    except Exception as e:
+        ratelimit.note_failure(e)
+        callback(f"Request Error: {e}", end=True)
+        return ""
+
+
+# Async variant (aio event loop): yields the text chunks as they arrive
+# Cancelling the consuming task closes the HTTP response
+async def stream_openai_async(payload, api_config):
+    model = api_config["API"]["MODEL"]
+    sys_prompt = api_config["API"]["SYS_PROMPT"]
+    temperature = config.typed(api_config).api.temperature
 
-        # Call the API in streaming mode by adding stream=True
-        response_stream = client.chat.completions.create(
+    with clients.use("openai-async", api_config) as client:
+        response_stream = await client.chat.completions.create(
             model=model,
             temperature=temperature,
             stream=True,
             messages=[
                 {'role': 'system', 'content': sys_prompt},
-                {'role': 'user',
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": image_url
-                        }
-                    }
-                ]}
+                {'role': 'user', "content": build_user_content(payload, api_config)}
             ]
         )
-
-        # Accumulate the streamed output
-        for chunk in response_stream:
-            # Check if the chunk contains content in the delta field
-            delta = chunk.choices[0].delta
-            chunk_text = delta.content
-            callback(chunk_text, end=False)
-        callback("", end=True)
-        return ""
-    
-    except Exception as e:
-        callback(f"Request Error: {e}", end=True)
-        return ""
+        try:
+            async for chunk in response_stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response_stream.close()
@@ -0,0 +1,208 @@
+"""
+Headless translation pipeline: image in, streamed text out, optional speech.
+
+Nothing here imports Cocoa, Quartz, pyautogui or tkinter, so the pipeline runs
+on any platform (a Linux server, a benchmark process, a test). The macOS app
+(sakana.py) is one frontend on top of it: it captures the screen and renders
+the chunks, everything from the translation cache to the provider call happens
+here.
+
+    import pipeline
+    api_config = pipeline.load_config("api.json5")
+    text = pipeline.translate_image(pipeline.load_image("page.png"), api_config)
+
+Usage:
+    python -m pipeline page.png other.jpg
+    cat page.png | python -m pipeline
+    python -m pipeline page.png --speak
+"""
+import argparse
+import io
+import sys
+from concurrent.futures import CancelledError
+import config
+import tracing
+import translate
+
+__all__ = ["load_config", "configure", "load_image", "request", "translate_image", "speak", "main"]
+
+
+"""
+Reads the config file and applies it to the process-wide registries.
+
+Returns:
+    dict: The app config, None when the file can't be read.
+"""
+def load_config(path="api.json5"):
+    api_config = config.read_config(path)
+    if api_config is not None:
+        configure(api_config)
+    return api_config
+
+"""
+Applies a config to the shared state: tracing, pooled clients, provider health
+and rate limits.
+
+With the previous config (a hot reload) only the parts whose sections changed
+are reset, so warm clients, breaker history and rate budgets survive an edit
+of, say, the prompt.
+"""
+def configure(api_config, previous=None):
+    import clients
+    import health
+    import ratelimit
+
+    def changed(*sections):
+        return previous is None or any(api_config.get(name) != previous.get(name) for name in sections)
+
+    if changed("TRACE"):
+        tracing.configure(api_config)
+    # Compares its own digest, clients are only rebuilt for a new endpoint or key
+    clients.configure(api_config)
+    if changed("FAILOVER", "PROVIDERS"):
+        health.configure(api_config)
+    limiter_keys = ("NAME", "ENDPOINT", "MODEL", "RPM", "TPM", "MAX_CONCURRENCY")
+    if changed("RATE_LIMIT", "PROVIDERS") or any(
+            api_config["API"].get(key) != previous["API"].get(key) for key in limiter_keys):
+        ratelimit.configure(api_config)
+
+"""
+Opens an image from a path, raw bytes or a binary file object.
+
+Returns:
+    PIL.Image.Image: The decoded image, loaded and in a mode the encoder accepts.
+"""
+def load_image(source):
+    from PIL import Image
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image.load()
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGB")
+        return image.copy()
+
+"""
+Sends one image to the provider(s).
+
+With API.ASYNC the request runs on the shared aio loop and a cancelled job
+(jobs.Job) stops it mid-stream; otherwise it runs in the calling thread, where
+a cancelled job stops the bands of a tall capture that weren't sent yet.
+
+Returns:
+    str: The translation ("" when streaming), None when the job was cancelled.
+"""
+def request(image, api_config, callback=None, job=None):
+    if config.typed(api_config).api.async_:
+        future = translate.submit_real_api(image, api_config, callback)
+        if job:
+            # A superseding job cancels the request mid-stream
+            job.add_cancel_handler(future.cancel)
+        try:
+            return future.result()
+        except CancelledError:
+            return None
+    return translate.call_real_api(image, api_config, callback, job)
+
+"""
+Translates one image: translation cache first, then the provider.
+
+Parameters:
+    image (PIL.Image.Image): The image to translate.
+    api_config (dict): The app config.
+    callback (callable): callback(chunk, end) to stream the text, None to get it returned.
+    job (jobs.Job): Optional job, its cancellation stops the request.
+    translate_fn (callable): Optional translate_fn(image, api_config) -> text used
+        instead of a provider request (e.g. dirty tiles); its text is replayed
+        through the callback, None means it was cancelled.
+
+Returns:
+    str: The translation ("" when streaming), None when the job was cancelled.
+"""
+def translate_image(image, api_config, callback=None, job=None, translate_fn=None):
+    import cache
+    # Consult the translation cache before any encoding happens
+    translation_cache = cache.get_cache(api_config)
+    if translation_cache:
+        key = translation_cache.make_key(image, api_config)
+        cached_text = translation_cache.lookup(key)
+        if cached_text is not None:
+            # Replay through the same callback, the UI and speech can't tell the difference
+            return translate.replay_text(cached_text, callback)
+        if callback:
+            callback = cache.recording_callback(translation_cache, key, callback)
+
+    if translate_fn:
+        formatted_text = translate_fn(image, api_config)
+        if formatted_text is not None:
+            formatted_text = translate.replay_text(formatted_text, callback)
+    else:
+        formatted_text = request(image, api_config, callback, job)
+    if translation_cache and not callback and formatted_text is not None and not (job and job.is_cancelled()):
+        translation_cache.store(key, formatted_text)
+    return formatted_text
+
+"""
+Speaks a translation with the configured SPEECH engine.
+
+Returns:
+    threading.Thread or None: The speech thread, None when speech is off.
+"""
+def speak(text, api_config):
+    return translate.call_speech(text, api_config)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pipeline", description="Sakana Lens headless translation")
+    parser.add_argument("inputs", nargs="*", help="Image files, '-' or nothing reads one image from stdin")
+    parser.add_argument("--config", default="api.json5", help="Config file")
+    parser.add_argument("--no-stream", action="store_true", help="Print each translation when it is complete")
+    parser.add_argument("--speak", action="store_true", help="Speak each translation (SPEECH section)")
+    args = parser.parse_args(argv)
+
+    api_config = load_config(args.config)
+    if api_config is None:
+        return 1
+
+    inputs = args.inputs or ["-"]
+    failed = 0
+    for source in inputs:
+        if len(inputs) > 1:
+            print(f"==> {source} <==", flush=True)
+        try:
+            image = load_image(sys.stdin.buffer.read() if source == "-" else source)
+        except Exception as e:
+            print(f"Error reading image '{source}': {e}", file=sys.stderr)
+            failed += 1
+            continue
+
+        job = tracing.tracer.begin_job("cli")
+        chunks = []
+
+        def write(text, end=False):
+            chunks.append(text)
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        if args.no_stream:
+            text = translate_image(image, api_config)
+            write(text)
+        else:
+            translate_image(image, api_config, write)
+            text = "".join(chunks)
+        print(flush=True)
+
+        if translate.is_error_text(text):
+            failed += 1
+        else:
+            translate.remember_translation(text, api_config)
+            if args.speak:
+                thread = speak(text, api_config)
+                if thread:
+                    thread.join()
+        tracing.tracer.finish(job)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+"""
+Provider profiles.
+
+The API section of api.json5 describes one provider. An optional PROVIDERS list
+adds named profiles; each profile only lists the keys that differ and is merged
+over the API section, e.g.
+
+    "PROVIDERS": [
+        {"NAME": "qwen", "OPENAI_COMPATIBLE": "True", "MODEL": "...", "KEY": "...", "ENDPOINT": "..."},
+        {"NAME": "gemini", "OPENAI_COMPATIBLE": "False", "MODEL": "gemini-2.0-flash", "KEY": "..."}
+    ]
+
+The first profile is the primary one. Without PROVIDERS the API section is the
+only profile. Hedging (hedge.py) and failover use the profiles in this order.
+"""
+import config
+
+
+class Profile:
+    """A named provider: the full app config with its API section merged in."""
+
+    def __init__(self, name, api_config):
+        self.name = name
+        self.api_config = api_config
+
+    def __repr__(self):
+        return f"Profile({self.name})"
+
+
+"""
+Builds the provider profiles of the app config, in order. Profiles with
+"ENABLE": "False" are skipped.
+
+Returns:
+    list: [Profile, ...], never empty.
+"""
+def profiles(api_config):
+    # Built (and parsed) once per loaded config, every request asks for them
+    cached = getattr(api_config, "_profiles", None)
+    if cached is not None:
+        return cached
+    base = api_config["API"]
+    result = []
+    for index, entry in enumerate(api_config.get("PROVIDERS") or []):
+        if not config.is_enabled(entry.get("ENABLE", "True")):
+            continue
+        if isinstance(api_config, config.AppConfig):
+            merged = api_config.with_api(entry)
+        else:
+            merged = dict(api_config)
+            merged["API"] = {**base, **entry}
+        result.append(Profile(entry.get("NAME") or f"provider{index + 1}", merged))
+    if not result:
+        result.append(Profile(base.get("NAME") or "primary", api_config))
+    if isinstance(api_config, config.AppConfig):
+        api_config.__dict__["_profiles"] = result
+    return result
+
+def primary(api_config):
+    return profiles(api_config)[0]
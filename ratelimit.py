@@ -0,0 +1,330 @@
+"""
+Per-provider rate limiting and adaptive concurrency.
+
+Every provider call (interactive hotkeys, watch mode, bands, batch, hedges)
+goes through the limiter of its provider, so they all share one budget:
+
+    requests/min  token bucket (RPM)
+    tokens/min    token bucket (TPM), charged with an estimate per request
+    concurrency   AIMD: halved on 429/5xx, +1/limit per healthy response
+    Retry-After   a throttled provider is paused for the time it asked for
+
+Waiting requests are served by priority: interactive jobs jump ahead of
+background work such as batch pages (see background()).
+
+See the RATE_LIMIT section of api.json5; a PROVIDERS profile can override
+RPM, TPM and MAX_CONCURRENCY for itself.
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+import config
+import jobs
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_priority = contextvars.ContextVar("ratelimit_priority", default=INTERACTIVE)
+_last_failure = threading.local()
+
+# Status codes that mean "slow down"
+THROTTLE_STATUS = (429, 500, 502, 503, 504)
+
+
+@contextmanager
+def background():
+    """Requests made inside this block yield to interactive ones."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Refills rate_per_min tokens per minute up to capacity."""
+
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity or rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount tokens are available (0 when they are)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    """Token buckets and an AIMD concurrency limit of one provider."""
+
+    def __init__(self, name, rpm=0, tpm=0, max_concurrency=4, min_concurrency=1, target_latency_ms=0):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.target_latency_ms = target_latency_ms
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.waiters = []  # heap of (priority, sequence)
+        self.condition = threading.Condition()
+        self._sequence = itertools.count()
+        self.counters = {"requests": 0, "throttled": 0, "waited": 0, "wait_ms": 0.0}
+
+    def acquire(self, tokens=0, priority=None):
+        """Block until the request may be sent; higher priority (lower number) goes first."""
+        priority = _priority.get() if priority is None else priority
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.waiters, ticket)
+            try:
+                while True:
+                    if self.waiters[0] == ticket and self.in_flight < int(self.limit):
+                        wait = max(self.paused_until - time.monotonic(),
+                                   self.requests.wait_time(1),
+                                   self.tokens.wait_time(tokens))
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+            finally:
+                self.waiters.remove(ticket)
+                heapq.heapify(self.waiters)
+                self.condition.notify_all()
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            self.counters["requests"] += 1
+            waited_ms = (time.monotonic() - start) * 1000
+            if waited_ms > 1:
+                self.counters["waited"] += 1
+                self.counters["wait_ms"] += waited_ms
+
+    def release(self, latency_ms, status=None, retry_after=None):
+        """Report the outcome: a throttling status shrinks the limit, a healthy response grows it."""
+        with self.condition:
+            self.in_flight -= 1
+            if status in THROTTLE_STATUS:
+                self.counters["throttled"] += 1
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                pause = retry_after if retry_after is not None else (2.0 if status == 429 else 0.0)
+                if pause:
+                    self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                print(f"Rate limit '{self.name}': status {status}, concurrency {self.limit:.1f}, pause {pause:.1f} s")
+            elif status is None and (not self.target_latency_ms or latency_ms <= self.target_latency_ms):
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return dict(self.counters, limit=round(self.limit, 2), in_flight=self.in_flight,
+                        waiting=len(self.waiters), paused_s=round(max(0.0, self.paused_until - time.monotonic()), 1))
+
+
+class LimiterRegistry:
+    """One limiter per provider, created from its (merged) API section."""
+
+    def __init__(self):
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def get(self, api_config):
+        typed_config = config.typed(api_config)
+        api = typed_config.api
+        limits = typed_config.rate_limit
+        name = api.name or f"{api.endpoint}|{api.model}"
+        with self.lock:
+            limiter = self.limiters.get(name)
+            if limiter is None:
+                # A profile's own RPM/TPM/MAX_CONCURRENCY override the RATE_LIMIT section
+                limiter = ProviderLimiter(
+                    name,
+                    rpm=limits.rpm if api.rpm is None else api.rpm,
+                    tpm=limits.tpm if api.tpm is None else api.tpm,
+                    max_concurrency=limits.max_concurrency if api.max_concurrency is None else api.max_concurrency,
+                    min_concurrency=limits.min_concurrency,
+                    target_latency_ms=limits.target_latency_ms)
+                self.limiters[name] = limiter
+            return limiter
+
+    def clear(self):
+        with self.lock:
+            self.limiters.clear()
+
+    def stats(self):
+        with self.lock:
+            return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+# Create single instance
+registry = LimiterRegistry()
+
+def is_enabled(api_config):
+    return config.typed(api_config).rate_limit.enable
+
+"""
+Applies a (new) config: limiters are recreated from it on their next request.
+"""
+def configure(api_config):
+    registry.clear()
+
+
+"""
+Remembers the exception of a failed provider call (called from the providers'
+except blocks), so the limiter can read its status code and Retry-After header.
+"""
+def note_failure(error):
+    _last_failure.error = error
+
+def _take_failure():
+    error = getattr(_last_failure, "error", None)
+    _last_failure.error = None
+    return error
+
+"""
+Extracts (HTTP status code, Retry-After seconds) from a provider exception.
+Either may be None; only a real status of the error or its response counts,
+numbers in the message (e.g. a job id) never do.
+"""
+def classify(error=None):
+    status, retry_after = None, None
+    if error is not None:
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        response = getattr(error, "response", None)
+        if status is None and response is not None:
+            status = getattr(response, "status_code", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+            retry_after = float(value) if value is not None else None
+        except (TypeError, ValueError):
+            retry_after = None
+    if not isinstance(status, int) or isinstance(status, bool) or not 100 <= status <= 599:
+        status = None
+    return status, retry_after
+
+"""
+Rough request size for the tokens/min bucket: image tiles (512 px, 170 tokens
+each) or one token per character of OCR text, plus the expected answer.
+"""
+def estimate_tokens(payload, api_config):
+    output_tokens = config.typed(api_config).rate_limit.output_tokens
+    text = getattr(payload, "text", None)
+    if text is not None:
+        return len(text) + output_tokens
+    stats = getattr(payload, "stats", None)
+    width, height = stats.encoded_size if stats else (1024, 1024)
+    tiles = -(-width // 512) * -(-height // 512)
+    return 85 + 170 * tiles + output_tokens
+
+
+"""
+Wraps the (stream, non-stream) provider functions so that every call waits for
+its provider's limiter and reports the outcome back to it.
+"""
+def wrap_backend(stream_fn, client_fn, api_config):
+    limiter = registry.get(api_config)
+    import translate
+
+    def finish(start, text, cancelled=False):
+        failure = _take_failure()
+        status, retry_after = (None, None)
+        if cancelled:
+            # Stopped by the consumer: neither a success nor a failure of the provider
+            status = 0
+        elif failure is not None or translate.is_error_text(text):
+            status, retry_after = classify(failure)
+            # Failures that aren't throttling neither grow nor shrink the limit
+            status = status or 0
+        limiter.release((time.perf_counter() - start) * 1000, status, retry_after)
+
+    def limited_stream(payload, cfg, callback):
+        limiter.acquire(estimate_tokens(payload, cfg))
+        start = time.perf_counter()
+        _take_failure()
+        outcome = {"text": "", "cancelled": False}
+
+        def on_chunk(text, end=False):
+            if end:
+                outcome["text"] = text
+            callback(text, end=end)
+
+        try:
+            return stream_fn(payload, cfg, on_chunk)
+        except jobs.JobCancelled:
+            outcome["cancelled"] = True
+            raise
+        finally:
+            finish(start, outcome["text"], outcome["cancelled"])
+
+    def limited_client(payload, cfg):
+        limiter.acquire(estimate_tokens(payload, cfg))
+        start = time.perf_counter()
+        _take_failure()
+        text = ""
+        try:
+            text = client_fn(payload, cfg)
+            return text
+        finally:
+            finish(start, text)
+
+    return limited_stream, limited_client
+
+"""
+Async counterpart of wrap_backend for the aio stream functions.
+"""
+def wrap_async(stream_async, api_config):
+    limiter = registry.get(api_config)
+
+    def _release_unused(acquired):
+        if not acquired.cancelled() and acquired.exception() is None:
+            limiter.release(0, 0)
+
+    async def limited(payload, cfg):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        acquired = loop.run_in_executor(None, limiter.acquire, estimate_tokens(payload, cfg), _priority.get())
+        try:
+            # Shielded: a cancelled wait must not lose track of the acquire still running in the executor
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The slot is taken once that acquire returns; give it straight back
+            acquired.add_done_callback(_release_unused)
+            raise
+        start = time.perf_counter()
+        # Cancelled or failed streams neither grow nor shrink the limit
+        status, retry_after = 0, None
+        try:
+            async for chunk in stream_async(payload, cfg):
+                yield chunk
+            status = None
+        except Exception as e:
+            status, retry_after = classify(e)
+            status = status or 0
+            raise
+        finally:
+            limiter.release((time.perf_counter() - start) * 1000, status, retry_after)
+
+    return limited
@@ -0,0 +1,89 @@
+"""
+Frame-coalesced rendering of streamed text into a Tk text widget.
+
+Tk widgets may only be touched from the main thread, while chunks arrive on
+worker threads or the aio loop. TextRenderer is called from any thread: it
+buffers the operations and a single root.after() callback applies them on the
+main thread, at most FPS times per second. All chunks that arrived within one
+frame become a single insert, followed by a single see(END), so a 20 KB stream
+costs a few dozen widget updates instead of thousands.
+"""
+import threading
+import time
+from collections import deque
+
+CLEAR = "clear"
+TEXT = "text"
+CALL = "call"
+
+
+class TextRenderer:
+    """Thread-safe, rate-limited writer of one text widget."""
+
+    def __init__(self, root, text_box, fps=30):
+        self.root = root
+        self.text_box = text_box
+        self.frame_s = 1.0 / max(1, fps)
+        self.pending = deque()  # (op, value) in call order
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.last_flush = 0.0
+        self.counters = {"chunks": 0, "frames": 0, "inserts": 0}
+
+    def clear(self):
+        self._push(CLEAR, None)
+
+    def append(self, text):
+        if text:
+            self._push(TEXT, text)
+
+    def call(self, func):
+        """Runs func on the main thread, in order with the text (e.g. spinner_bar.stop)."""
+        self._push(CALL, func)
+
+    def _push(self, op, value):
+        with self.lock:
+            self.pending.append((op, value))
+            if op == TEXT:
+                self.counters["chunks"] += 1
+            if self.scheduled:
+                return
+            self.scheduled = True
+            delay_s = max(0.0, self.frame_s - (time.monotonic() - self.last_flush))
+        self.root.after(int(delay_s * 1000), self.flush)
+
+    def flush(self):
+        """Applies the buffered operations (main thread only)."""
+        with self.lock:
+            ops = list(self.pending)
+            self.pending.clear()
+            self.scheduled = False
+            self.last_flush = time.monotonic()
+        if not ops:
+            return
+        self.counters["frames"] += 1
+        buffer = []
+        for op, value in ops:
+            if op == TEXT:
+                buffer.append(value)
+            elif op == CLEAR:
+                # Text cleared within the same frame is never drawn
+                buffer.clear()
+                self.text_box.delete("1.0", "end")
+            else:
+                self._insert(buffer)
+                value()
+        self._insert(buffer)
+
+    def _insert(self, buffer):
+        if not buffer:
+            return
+        text = "".join(buffer)
+        buffer.clear()
+        self.text_box.insert("end", text)
+        self.text_box.see("end")
+        self.counters["inserts"] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, pending=len(self.pending))
@@ -1,3 +1,4 @@
+import startup
 import tkinter as tk
 from tkinter import ttk
 from tkinter import scrolledtext
@@ -7,16 +8,27 @@ from PIL import Image
 import Quartz
 import threading
 import Foundation
-import queue
 import subprocess
 import os
 import sys
 import tempfile
-import pyautogui
 import winutil
 import tooltip
 import translate
+import pipeline
 import config
+import tracing
+import health
+import ratelimit
+import jobs
+import speech
+import render
+import scheduler
+import backends
+import clients
+import kokoro_engine
+
+startup.mark("imports")
 
 """
 Custom handler for unraisable exceptions.
@@ -53,11 +65,14 @@ APP_TITLE = "Sakana Lens 日本語の自動翻訳"
 APP_EVENT_CT = "app.shortcut.ctrl_t.task"  # Event for Ctrl+T
 APP_EVENT_CMT = "app.shortcut.ctrl_cmd_t.special"  # Event for Ctrl+Cmd+T
 APP_EVENT_CMR = "app.shortcut.ctrl_cmd_r.special"  # Event for Ctrl+Cmd+R
+APP_EVENT_CMW = "app.shortcut.ctrl_cmd_w.special"  # Event for Ctrl+Cmd+W
 
 # PyObjC approach: Python script to capture the active window screenshot
 def capture_window(api_config, message):
+    # Imported on first use (warmed up in the background), it is slow to load
+    import pyautogui
 
-    temp_file = api_config["DEBUG"]["SCREENSHOT"]
+    temp_file = config.typed(api_config).debug.screenshot
     try:
         # Get front window info
         front_app = NSWorkspace.sharedWorkspace().frontmostApplication()
@@ -131,7 +146,7 @@ def capture_window(api_config, message):
         elif message == APP_EVENT_CMR:
             
             # Capture the selection region
-            region_color = api_config["WIN"]["REGION"]
+            region_color = config.typed(api_config).win.region
             scw = winutil.ScreenCaptureWindow(region_color)
             # Block until the overlay window is destroyed
             scw.wait()
@@ -163,11 +178,9 @@ def capture_window(api_config, message):
         print(f"Error capturing window: {e}")
         return None
 
-# Simulated AI API function (replace with real API later)
-def simulate_ai_api(image, api_config, stream_call=None):
-    # Placeholder: Pretend this processes the image and returns Japanese + English text
-    english_text = translate.call_real_api(image, api_config, stream_call)
-    return english_text
+# AI API function, the headless pipeline sends the image to the provider(s)
+def simulate_ai_api(image, api_config, stream_call=None, job=None):
+    return pipeline.request(image, api_config, stream_call, job)
 
 # Function to simulate speech
 def simulate_speech(api_config):
@@ -181,12 +194,19 @@ def simulate_speech(api_config):
     '''
 
 # Function to process screenshot and update UI
-def process_capture_window_text(api_config, message, stream_call=None):
-    screenshot = capture_window(api_config, message)
+def process_capture_window_text(api_config, message, stream_call=None, job=None):
+    with tracing.tracer.span("capture"):
+        screenshot = capture_window(api_config, message)
     if screenshot:
-        # Call Gemini API
-        formatted_text = simulate_ai_api(screenshot, api_config, stream_call)
-        return formatted_text
+        translate_fn = None
+        tile_tracker = winutil.region_manager.get_tile_tracker() if message == APP_EVENT_CT else None
+        if tile_tracker:
+            # Only the changed tiles of the locked region are translated
+            import tiles
+            translate_fn = lambda image, cfg: tiles.translate_changed_tiles(
+                tile_tracker, image, cfg, lambda tile, tile_cfg: simulate_ai_api(tile, tile_cfg, job=job), job)
+        # Translation cache, then Gemini/OpenAI API
+        return pipeline.translate_image(screenshot, api_config, stream_call, job, translate_fn)
     else:
         return None
 
@@ -218,14 +238,25 @@ class CocoaAppThread(threading.Thread):
 class TkinterApp:
     def __init__(self, root):
         # Read api.json
-        self.api_config = config.read_config('api.json5')
+        self.api_config = pipeline.load_config('api.json5')
+        startup.mark("config")
+        # Import the configured provider SDKs off the UI thread
+        backends.warm_up(self.api_config)
+        # Load the local speech model before the first translation needs it
+        kokoro_engine.warm_up(self.api_config)
+        # Edits of api.json5 apply to the next capture, no restart needed
+        self.config_watcher = None
+        if self.api_config.config.hot_reload and self.api_config.path:
+            self.config_watcher = config.ConfigWatcher(self.api_config, self.on_config_reload,
+                                                       self.api_config.config.poll_s)
+            self.config_watcher.start()
 
         self.root = root
         root.title(APP_TITLE)
         root.withdraw()  # Hide window initially
 
         # Create a text widget to display key events
-        text_font = self.api_config['WIN']['TEXT_FONT']
+        text_font = self.api_config.win.text_font
         self.text_box = scrolledtext.ScrolledText(root, wrap=tk.WORD, width=40, height=30, 
                                                   font=tuple(text_font),  # Font family and size
                                                   padx=5,               # Horizontal padding inside the text area
@@ -258,8 +289,13 @@ class TkinterApp:
         def on_text_modified(event):
             widget = event.widget            
             # Check content whenever a modification occurs
-            content = widget.get("1.0", "end-1c")
-            if len(content) == 0:                
+            # O(1): compare indexes instead of reading the whole text, and only restack on a change
+            empty = widget.compare("end-1c", "==", "1.0")
+            if empty == self._text_empty:
+                widget.edit_modified(False)
+                return
+            self._text_empty = empty
+            if empty:                
                 # Hide button momentarily
                 #self.tips_btn.place_forget()
                 # Force display update
@@ -284,11 +320,15 @@ class TkinterApp:
             # Now reset the modified flag at the end
             widget.edit_modified(False) 
                 
+        self._text_empty = True
         self.text_box.bind("<<Modified>>", on_text_modified)
 
+        # Chunks from worker threads are drawn by the Tk thread, coalesced per frame
+        self.renderer = render.TextRenderer(root, self.text_box, self.api_config.win.render_fps)
+
 
         # bind the tooltip to the info button
-        info_text = self.api_config["WIN"]["INFO"]
+        info_text = self.api_config.win.info
         self.dync_info = tooltip.DynamicTooltip(
             self.info_btn, 
             text=tk.StringVar(value=info_text),
@@ -299,7 +339,7 @@ class TkinterApp:
         )
 
         # bind the tooltip to the tips button
-        tooltip_text = self.api_config["WIN"]["HOWTO"]
+        tooltip_text = self.api_config.win.howto
         self.dync_tooltip = tooltip.DynamicTooltip(
             self.tips_btn, 
             text=tk.StringVar(value=tooltip_text),
@@ -313,27 +353,63 @@ class TkinterApp:
         self.spinner_bar = ttk.Progressbar(root, mode="indeterminate", length=200)
         self.spinner_bar.pack(pady=(0,0))        
         
-        # Create a queue for thread communication
-        self.event_queue = queue.Queue()
-        self.result_queue = queue.Queue()  # Queue for results from the worker thread
-        self.worker_thread = None
+        # Hotkey policy while a translation is in flight: latest (cancel it), queue or drop
+        self.jobs = jobs.JobController(self.api_config.jobs.policy)
+        # Translation jobs run on a bounded worker pool, hotkeys ahead of watch mode
+        self.scheduler = scheduler.Scheduler(self.api_config.jobs.workers)
         
         # Create a key listener
         def on_key_press(event):
             if event == winutil.NSKeyCTRLTMask:
-                self.event_queue.put(APP_EVENT_CT)
+                self.dispatch(APP_EVENT_CT)
             elif event == winutil.NSKeyCTRLCMDTMask:
-                self.event_queue.put(APP_EVENT_CMT)
+                self.dispatch(APP_EVENT_CMT)
             elif event == winutil.NSKeyCTRLCMDRMask:
-                self.event_queue.put(APP_EVENT_CMR)
+                self.dispatch(APP_EVENT_CMR)
+            elif event == winutil.NSKeyCTRLCMDWMask:
+                self.dispatch(APP_EVENT_CMW)
             
         self.key_listener = winutil.KeyListener(on_key_press)
+
+        # Dirty-tile mode for the locked region (opt-in)
+        tiles_config = self.api_config.tiles
+        if tiles_config.enable:
+            winutil.region_manager.enable_dirty_tiles(
+                rows=tiles_config.rows,
+                cols=tiles_config.cols,
+                max_dirty_ratio=tiles_config.max_dirty_ratio,
+                tolerance=tiles_config.tolerance)
+        
+        # Watch mode over the locked region, toggled with Ctrl+Cmd+W
+        self.watcher = None
         
-        # Start the Cocoa app and queue checking (time consuming tasks) in a separate thread
+        # Start the Cocoa app (key listener) in a separate thread
         self.start_thread(self.start_async_task)
+        startup.mark("ui")
 
-        # Show the window with animation
+        # Show the window with animation, it runs on the event loop
         self.show_window(root)
+        root.after_idle(self.on_first_idle)
+
+    """
+    Switches to a reloaded api.json5 (called by the config watcher thread).
+
+    Jobs in flight finish with the config they started with, the next capture
+    uses the new one. Window layout, tiles and watch settings apply on restart
+    (watch mode: when it is toggled again).
+    """
+    def on_config_reload(self, new_config, old_config):
+        pipeline.configure(new_config, old_config)
+        backends.warm_up(new_config)
+        kokoro_engine.warm_up(new_config)
+        self.jobs.policy = new_config.jobs.policy
+        self.api_config = new_config
+
+    # The event loop is running: the app is usable
+    def on_first_idle(self):
+        startup.mark("first_idle")
+        if self.api_config.debug.startup_report:
+            startup.report()
             
     # Show the window with animation
     def show_window(self, root):
@@ -342,9 +418,9 @@ class TkinterApp:
         screen_height = root.winfo_screenheight()
 
         # Set window size and position
-        window_width = int(self.api_config['WIN']['WIDTH'])
-        window_height = int(self.api_config['WIN']['HEIGHT'])
-        window_pos = self.api_config['WIN']['POSITION']
+        window_width = self.api_config.win.width
+        window_height = self.api_config.win.height
+        window_pos = self.api_config.win.position
         if window_pos == "left":
             final_x = 0 # Leftcorner            
             y = (screen_height - window_height) // 2
@@ -368,11 +444,10 @@ class TkinterApp:
 
 
     """
-    Starts the Cocoa application and schedules queue checking tasks in separate threads.
+    Starts the Cocoa application in a separate thread.
 
     This method initializes and starts a Cocoa application in a separate thread using
-    the CocoaAppThread class. It also schedules the polling of event and result queues
-    by starting separate threads for each using the start_thread method.
+    the CocoaAppThread class. Key events are dispatched to the job scheduler from there.
     """
     def start_async_task(self):
         
@@ -380,10 +455,9 @@ class TkinterApp:
         # monitor the key events
         self.app_key_thread = CocoaAppThread(self.key_listener)
         self.app_key_thread.start()
-        
-        # Schedule the queue checking function
-        self.start_thread(self.poll_event_queue)
-        self.start_thread(self.poll_result_queue)
+
+        # Load the screenshot module before the first hotkey needs it
+        import pyautogui
 
 
     def start_thread(self, func, args=()):
@@ -392,42 +466,121 @@ class TkinterApp:
         thread.start()
         return thread
     
-    # Function to check the queues
-    # Two queues: event_queue and result_queue
-    # event_queue: for key events
-    # result_queue: for results from the worker thread
-    def poll_event_queue(self):
-        # Process event queue
-        while True:
-            message = self.event_queue.get()
-            if message == APP_EVENT_CT or message == APP_EVENT_CMT or message == APP_EVENT_CMR:
-                # Show the spinner and update status
-                self.spinner_bar.start()  # Start the indeterminate animation                
-                if self.worker_thread and self.worker_thread.is_alive():
-                    #self.text_box.insert(tk.END, "Processing in progress. Please wait.\n")
-                    #self.text_box.see(tk.END)
-                    continue
-                else:
-                    # Create and start the worker thread
-                    self.worker_thread = self.start_thread(self.run_process_and_get_response, (message,))                    
+    """
+    Handles a key event (or a watch mode trigger) without blocking the caller.
+
+    Parameters:
+        message (str): One of the APP_EVENT_* constants.
+        priority (int): scheduler.INTERACTIVE for hotkeys, scheduler.WATCH for watch mode.
 
+    Returns:
+        bool: False when a capture request was queued or dropped instead of started.
     """
-    Continuously processes items from the result queue and updates the text box.
+    # trace: name of a job trace to begin once the request actually becomes a job
+    def dispatch(self, message, priority=scheduler.INTERACTIVE, trace=None):
+        if message == APP_EVENT_CMW:
+            self.toggle_watch_mode()
+        elif message == APP_EVENT_CT or message == APP_EVENT_CMT or message == APP_EVENT_CMR:
+            # Latest wins by default: a new capture cancels the one in flight
+            # Watch captures that can't start in time are stale, the screen has moved on
+            deadline_s = self.api_config.jobs.watch_deadline_s if priority == scheduler.WATCH else None
+            job = self.jobs.request(message, self.is_busy, priority, deadline_s)
+            if job is None:
+                # Queued or dropped (JOBS.POLICY)
+                return False
+            if trace:
+                tracing.tracer.begin_job(trace)
+            self.start_job(job)
+        return True
+
+    def is_busy(self):
+        job = self.jobs.current
+        return job is not None and job.is_active()
 
-    Retrieves formatted text from the result queue and inserts it into the text box
-    widget. Ensures the text box view is updated to show the latest inserted text.
-    This method runs indefinitely in a separate thread.
     """
-    def poll_result_queue(self):
-        # Process result queue
-        while True:
-            formatted_text = self.result_queue.get()
-            if formatted_text:                    
-                self.text_box.insert(tk.END, formatted_text)
-                self.text_box.see(tk.END)
-            
+    Starts a translation job on the scheduler.
+
+    Speech of earlier translations is cancelled first, the page it belongs to
+    is being replaced.
+    """
+    def start_job(self, job):
+        # Show the spinner and update status
+        self.renderer.call(self.spinner_bar.start)  # Start the indeterminate animation
+        speech.cancel_pending()
+        self.scheduler.submit(job, self.run_job, job)
+
+    # Worker entry point, starts the queued job (queue policy) when done
+    def run_job(self, job):
+        try:
+            self.run_process_and_get_response(job.message, job)
+        except jobs.JobCancelled:
+            pass
+        except Exception as e:
+            print(f"Error in job {job.id}: {e}")
+        finally:
+            next_job = self.jobs.finish(job)
+        if next_job:
+            self.start_job(next_job)
+
+    """
+    Starts or stops watch mode over the locked region.
+
+    While watching, the region is sampled at a low frame rate and a normal Ctrl+T
+    translation is queued once the content has changed and settled.
+    """
+    def toggle_watch_mode(self):
+        if self.watcher and self.watcher.is_running():
+            self.watcher.stop()
+            print(f"Watch mode stopped: {self.watcher.stats()}")
+            return
+
+        if winutil.region_manager.get_last_region() is None:
+            print("Watch mode needs a locked region, press Ctrl+Cmd+R first")
+            return
+
+        import watch
+        watch_config = self.api_config.watch
+
+        import pyautogui
+
+        def grab():
+            region = winutil.region_manager.get_last_region()
+            if region is None:
+                return None
+            return pyautogui.screenshot(region=region)
+
+        self.watcher = watch.RegionWatcher(
+            grab=grab,
+            trigger=self.trigger_watch_translation,
+            is_busy=self.is_busy,
+            fps=watch_config.fps,
+            threshold=watch_config.threshold,
+            settle_ms=watch_config.settle_ms,
+            cpu_target=watch_config.cpu_target)
+        self.watcher.start()
+        print("Watch mode started")
+
+    # Watch mode queues a normal Ctrl+T, traced as its own job (unless it is dropped)
+    def trigger_watch_translation(self):
+        return self.dispatch(APP_EVENT_CT, scheduler.WATCH, trace="watch")
 
     def stop_monitoring(self):
+        print(f"Jobs: {self.jobs.stats()}")
+        print(f"Scheduler: {self.scheduler.metrics()}")
+        print(f"Rendering: {self.renderer.stats()}")
+        print(f"Rate limits: {ratelimit.registry.stats()}")
+        print(f"Provider health: {health.registry.metrics()}")
+        print(f"Provider clients: {clients.registry.stats()}")
+        if kokoro_engine.stats():
+            print(f"Kokoro: {kokoro_engine.stats()}")
+        if self.config_watcher:
+            self.config_watcher.stop()
+        # Stop watch mode
+        if self.watcher:
+            self.watcher.stop()
+        # Cancel the job in flight (and its speech) and stop the workers
+        self.scheduler.shutdown()
+        speech.cancel_pending()
         # Stop the listener
         if hasattr(self, 'listener'):            
             if self.key_listener:
@@ -435,32 +588,48 @@ class TkinterApp:
             AppHelper.stopEventLoop()
             
     
-    def run_process_and_get_response(self, message):
+    def run_process_and_get_response(self, message, job=None):
         # This runs in the worker thread
-        stream = self.api_config['API']['STREAM']
-        stream = stream.lower()
-        stream_result = True if stream == "true" or stream == "yes" else False
-        # If not stream mode, put the result into the result queue
+        stream_result = self.api_config.api.stream
+        # If not stream mode, render the whole result at once
         if not stream_result:
             # time-consuming function, no streaming
-            formatted_text = process_capture_window_text(self.api_config, message)  
-            # Clear the text box
-            self.text_box.delete(1.0, tk.END)
-            # Directly put the result into the result queue
-            self.result_queue.put(formatted_text)  
+            formatted_text = process_capture_window_text(self.api_config, message, job=job)
+            if job and not self.jobs.is_current(job):
+                # Superseded by a newer capture, discard the late result
+                return
+            # Clear the text box and show the result
+            self.renderer.clear()
+            self.renderer.append(formatted_text)
             # Reset spinner
-            self.spinner_bar.stop()
+            self.renderer.call(self.spinner_bar.stop)
             # Simulate speech
             translate.streamed_text.clear()
+            # Sentences are synthesized one after the other, the first one plays right away
+            speaker = translate.speak_stream(self.api_config)
             translate.streamed_text.append(formatted_text)
-            simulate_speech(self.api_config)
+            translate.streamed_text.finish()
+            translate.remember_translation(formatted_text, self.api_config)
+            if not speaker:
+                simulate_speech(self.api_config)
         else:
-            # time-consuming function, with streaming            
-            formatted_text = process_capture_window_text(self.api_config, message, self.stream_response_call)
+            # time-consuming function, with streaming
+            # A new job always starts with an empty text box
+            self.__dict__.pop('_stream_response_call_count', None)
+            stream_call = self.stream_response_call
+            if self.api_config.api.async_:
+                # Chunks arrive on the aio loop thread, the renderer draws them on the Tk thread
+                # Late chunks are dropped, the cancelled future stops the request
+                if job:
+                    stream_call = self.jobs.guard(job, stream_call, stop=False)
+            elif job:
+                # Late chunks of a cancelled job are dropped and stop the provider loop
+                stream_call = self.jobs.guard(job, stream_call)
+            formatted_text = process_capture_window_text(self.api_config, message, stream_call, job)
             if formatted_text is None:
                 # Nothing to translate (either user cancelled the capture or no text was detected)
                 # Reset spinner
-                self.spinner_bar.stop()
+                self.renderer.call(self.spinner_bar.stop)
     
     # Stream response callback, give some time for mainloop response4
     '''
@@ -474,28 +643,33 @@ class TkinterApp:
         if not hasattr(self, '_stream_response_call_count'):
             # Initialize counter if it doesn't exist
             self._stream_response_call_count = 0
-            self.text_box.delete(1.0, tk.END)
+            self.renderer.clear()
             # Clear the streamed text
             translate.streamed_text.clear()
+            # Speak each sentence as soon as it is complete (SPEECH.INCREMENTAL)
+            self._stream_speaker = translate.speak_stream(self.api_config)
+            # Paragraph pairs go to the translation memory as they close
+            translate.remember_stream(self.api_config)
             
         if not end:
-            # If it’s not the end state, place the text into the result queue and increment the counter
+            # If it’s not the end state, hand the text to the renderer and increment the counter
             translate.streamed_text.append(text)
-            self.result_queue.put(text)
+            self.renderer.append(text)
             self._stream_response_call_count += 1
         else:
             # If it’s the end state, insert the text into the text box, update the prompt message, and delete the counter.
             translate.streamed_text.append(text)
-            self.text_box.insert(tk.END, text + "\n")
-            self.text_box.see(tk.END)
+            translate.streamed_text.finish()
+            self.renderer.append(text + "\n")
             # Reset spinner
-            self.spinner_bar.stop()
+            self.renderer.call(self.spinner_bar.stop)
             # Remove the counter attribute when done
             del self._stream_response_call_count
             # Call speech
             # Don't use this method, because the text_box is not updated yet, you 
             # content = self.text_box.get("1.0", tk.END)
-            simulate_speech(self.api_config)
+            if not self.__dict__.pop('_stream_speaker', None):
+                simulate_speech(self.api_config)
 
 
 
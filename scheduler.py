@@ -0,0 +1,161 @@
+"""
+Job scheduler: a bounded pool of worker threads running jobs.Job objects.
+
+Jobs wait in priority lanes; a free worker always takes the oldest job of the
+most important lane:
+
+    INTERACTIVE  hotkey captures
+    WATCH        captures triggered by watch mode
+    BACKGROUND   anything that can wait (warm-ups, bulk work)
+
+Jobs outside the interactive lane also run at background priority in the
+provider rate limiter (ratelimit.py), so a hotkey overtakes them there too.
+A job that is cancelled while queued, or whose deadline passed before a worker
+was free, never runs. shutdown() cancels what is queued and running and joins
+the workers.
+
+metrics() exports the queue depth per lane, the job counters and the wait and
+run time percentiles per lane.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+import jobs
+import ratelimit
+import tracing
+
+INTERACTIVE = 0
+WATCH = 1
+BACKGROUND = 2
+LANES = {INTERACTIVE: "interactive", WATCH: "watch", BACKGROUND: "background"}
+
+
+class Scheduler:
+    """Runs submitted jobs on a fixed number of worker threads, most important lane first."""
+
+    def __init__(self, workers=2, name="job", keep=200):
+        self.name = name
+        self.queue = []  # heap of (priority, sequence, job, func, args)
+        self.running = set()
+        self.condition = threading.Condition()
+        self.closed = False
+        self._sequence = itertools.count()
+        self.history = deque(maxlen=keep)  # Finished jobs as dicts, newest last
+        self.counters = {"submitted": 0, "done": 0, "cancelled": 0, "failed": 0, "expired": 0}
+        self.workers = [threading.Thread(target=self._work, name=f"{name}-worker-{index + 1}", daemon=True)
+                        for index in range(max(1, workers))]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, job, func, *args):
+        """Queues func(*args) as the work of job; returns the job."""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError(f"Scheduler '{self.name}' is shut down")
+            job.state = jobs.QUEUED
+            heapq.heappush(self.queue, (job.priority, next(self._sequence), job, func, args))
+            self.counters["submitted"] += 1
+            self.condition.notify()
+        return job
+
+    def _next(self):
+        with self.condition:
+            while not self.queue and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return None
+            entry = heapq.heappop(self.queue)
+            job = entry[2]
+            if job.is_cancelled():
+                self._finish(job, jobs.CANCELLED)
+                return False
+            if job.deadline is not None and time.monotonic() > job.deadline:
+                # Too late to be useful (e.g. a watch capture of a screen that moved on)
+                job.cancel()
+                self._finish(job, jobs.EXPIRED)
+                return False
+            job.state = jobs.RUNNING
+            job.started = time.monotonic()
+            self.running.add(job)
+            return entry
+
+    def _work(self):
+        while True:
+            entry = self._next()
+            if entry is None:
+                return
+            if entry is False:
+                continue
+            _, _, job, func, args = entry
+            state = jobs.DONE
+            try:
+                if job.priority > INTERACTIVE:
+                    with ratelimit.background():
+                        func(*args)
+                else:
+                    func(*args)
+            except jobs.JobCancelled:
+                pass
+            except Exception as e:
+                state = jobs.FAILED
+                print(f"Error in {self.name} {job.id}: {e}")
+            if state == jobs.DONE and job.is_cancelled():
+                state = jobs.CANCELLED
+            with self.condition:
+                self.running.discard(job)
+                self._finish(job, state)
+
+    def _finish(self, job, state):
+        # Called with the condition held
+        job.state = state
+        job.finished = time.monotonic()
+        self.counters[state] += 1
+        self.history.append(dict(job.to_dict(), lane=LANES.get(job.priority, str(job.priority))))
+
+    def depth(self):
+        """Queued jobs per lane."""
+        with self.condition:
+            counts = {name: 0 for name in LANES.values()}
+            for priority, _, job, _, _ in self.queue:
+                lane = LANES.get(priority, str(priority))
+                counts[lane] = counts.get(lane, 0) + 1
+            return counts
+
+    def shutdown(self, cancel_running=True, timeout=2.0):
+        """Cancels queued (and running) jobs, stops the workers and waits for them up to timeout."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            queued = [entry[2] for entry in self.queue]
+            self.queue.clear()
+            for job in queued:
+                self._finish(job, jobs.CANCELLED)
+            running = list(self.running) if cancel_running else []
+            self.condition.notify_all()
+        for job in queued + running:
+            job.cancel()
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+    def metrics(self):
+        with self.condition:
+            history = list(self.history)
+            running = [job.to_dict() for job in self.running]
+        lanes = {}
+        for lane in dict.fromkeys(record["lane"] for record in history):
+            records = [record for record in history if record["lane"] == lane]
+            lanes[lane] = {
+                "jobs": len(records),
+                "wait_ms": tracing.percentiles([r["wait_ms"] for r in records if r["wait_ms"] is not None]),
+                "run_ms": tracing.percentiles([r["run_ms"] for r in records if r["run_ms"] is not None]),
+            }
+        return dict(self.counters, depth=self.depth(), running=running, lanes=lanes)
+
+    def recent(self, n=20):
+        """The last n finished jobs, newest last."""
+        with self.condition:
+            return list(self.history)[-n:]
@@ -0,0 +1,129 @@
+"""
+Incremental sentence and paragraph segmentation of a streamed translation.
+
+Chunks are fed as they arrive; every sentence is emitted as soon as it is
+closed, without waiting for the end of the stream:
+
+    Japanese   。！？ (and their half-width forms), with closing brackets 」』）】
+    English    . ! ? followed by a space, a line break or a closing quote,
+               except after common abbreviations (Mr., e.g., ...) and in numbers
+    lines      a line break always ends a sentence (the model answers in lines)
+
+A blank line ends a paragraph, i.e. one Japanese/English pair of the prompt's
+output format; it is emitted as its text, line breaks included. Each character
+is scanned once, however the text is chunked.
+
+    segmenter = SentenceSegmenter(on_sentence=print, on_paragraph=print)
+    translate.streamed_text.subscribe(on_chunk=segmenter.feed, on_clear=segmenter.reset, on_end=segmenter.flush)
+"""
+
+JAPANESE_TERMINATORS = "。！？｡"
+LATIN_TERMINATORS = ".!?"
+CLOSERS = "」』）】〕〉》)]\"'”’"
+# 「...！」と言った: a quote followed by a quotative particle goes on
+QUOTATIVES = "とっ"
+ABBREVIATIONS = ("mr", "mrs", "ms", "dr", "st", "vs", "etc", "e.g", "i.e", "no", "jr", "sr", "p")
+
+
+class SentenceSegmenter:
+    """Splits fed text into sentences and paragraphs as soon as they close."""
+
+    def __init__(self, on_sentence=None, on_paragraph=None):
+        self.on_sentence = on_sentence
+        self.on_paragraph = on_paragraph
+        self.reset()
+
+    def reset(self):
+        self.buffer = ""  # Text not emitted yet
+        self.pos = 0  # Scan position in buffer
+        self.paragraph = []  # Text of the open paragraph, as consumed
+        self.blank_line = False  # Only whitespace since the last line break
+        self.sentences = 0
+        self.paragraphs = 0
+
+    def feed(self, text):
+        """Adds a chunk; returns the sentences it completed."""
+        if not text:
+            return []
+        self.buffer += text
+        return self._scan(final=False)
+
+    def flush(self):
+        """End of the stream: emits what is left; returns the sentences it completed."""
+        done = self._scan(final=True)
+        self._emit(len(self.buffer), len(self.buffer), done)
+        self._close_paragraph()
+        return done
+
+    def _scan(self, final):
+        done = []
+        buffer = self.buffer
+        i = self.pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if ch == "\n":
+                if self.blank_line and not buffer[:i].strip():
+                    # Second line break with nothing in between: the paragraph is over
+                    self._close_paragraph()
+                self._emit(i, i + 1, done)
+                buffer = self.buffer
+                self.blank_line = True
+                i = 0
+                continue
+            if not ch.isspace():
+                self.blank_line = False
+            if ch in JAPANESE_TERMINATORS or ch in LATIN_TERMINATORS:
+                end = i + 1
+                while end < len(buffer) and (buffer[end] in CLOSERS or buffer[end] in JAPANESE_TERMINATORS
+                                             or buffer[end] in LATIN_TERMINATORS):
+                    end += 1
+                if end == len(buffer) and not final:
+                    # More closers or the next character may still arrive
+                    break
+                if ch in JAPANESE_TERMINATORS:
+                    closes = not (buffer[end - 1] in CLOSERS and end < len(buffer) and buffer[end] in QUOTATIVES)
+                else:
+                    closes = self._ends_latin_sentence(buffer, i, end)
+                if closes:
+                    self._emit(end, end, done)
+                    buffer = self.buffer
+                    i = 0
+                    continue
+                i = end
+                continue
+            i += 1
+        self.pos = i
+        return done
+
+    @staticmethod
+    def _ends_latin_sentence(buffer, index, end):
+        if end < len(buffer) and not buffer[end].isspace():
+            # 3.14, example.com, "Hi!"she said; but すごい!次の... is Japanese
+            return ord(buffer[end]) >= 0x3000
+        if buffer[index] == ".":
+            words = buffer[:index].split()
+            word = words[-1].lower() if words else ""
+            if word.lstrip("(\"'“‘") in ABBREVIATIONS:
+                return False
+        return True
+
+    def _emit(self, end, consumed, done):
+        sentence = self.buffer[:end].strip()
+        self.paragraph.append(self.buffer[:consumed])
+        self.buffer = self.buffer[consumed:]
+        self.pos = 0
+        if not sentence:
+            return
+        self.sentences += 1
+        done.append(sentence)
+        if self.on_sentence:
+            self.on_sentence(sentence)
+
+    def _close_paragraph(self):
+        paragraph = "".join(self.paragraph).strip()
+        self.paragraph = []
+        if not paragraph:
+            return
+        self.paragraphs += 1
+        if self.on_paragraph:
+            self.on_paragraph(paragraph)
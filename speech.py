@@ -21,8 +21,38 @@
 #
 #
 
+import queue
+import sys
+import threading
 import config
+import kokoro_engine
 import language
+import tracing
+
+# Speech generation: cancel_pending() bumps it, and any synthesis started for an
+# older generation stops playing (a newer translation superseded it)
+_generation = 0
+_generation_lock = threading.Lock()
+
+def current_generation():
+    return _generation
+
+def is_current(generation):
+    return generation is None or generation == _generation
+
+"""
+Cancels speech that is pending or playing for earlier translations.
+"""
+def cancel_pending():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    try:
+        # kokoro-offline plays through sounddevice, stop it right away
+        if "sounddevice" in sys.modules:
+            sys.modules["sounddevice"].stop()
+    except Exception as e:
+        print(f"Error stopping playback: {e}")
 
 """
 Calls the Sambert client to synthesize speech from text using the specified API configuration.
@@ -34,11 +64,13 @@ is streamed using a specified sample rate and format, with playback managed by a
 Args:
     text (str): The text to be converted into speech.
     api_config (dict): Configuration dictionary containing the speech model and API key.
+    generation (int): Speech generation of the request, frames of a cancelled one are dropped.
+    job (tracing.JobTrace): Trace of the translation, gets the first_audio mark.
 
 Returns:
     SpeechSynthesisResult: The result of the speech synthesis process.
 """
-def call_sambert_client(text, api_config):
+def call_sambert_client(text, api_config, generation=None, job=None):
     import dashscope
     import pyaudio
     from dashscope.api_entities.dashscope_response import SpeechSynthesisResponse
@@ -93,6 +125,9 @@ def call_sambert_client(text, api_config):
 
         def on_event(self, result: SpeechSynthesisResult):
             if result.get_audio_frame() is not None:
+                if not is_current(generation):
+                    return
+                tracing.tracer.mark("first_audio", job)
                 #print('audio result length:', sys.getsizeof(result.get_audio_frame()))
                 self._stream.write(result.get_audio_frame())
 
@@ -135,11 +170,13 @@ Args:
     text (str): The text to be synthesized into speech.
     api_config (dict): Configuration dictionary containing API details such
                        as model, key, endpoint, language, and rate.
+    generation (int): Speech generation of the request, nothing is played once it is cancelled.
+    job (tracing.JobTrace): Trace of the translation, gets the first_audio mark.
 
 Returns:
     None
 """
-def call_kokoro_online(text, api_config):
+def call_kokoro_online(text, api_config, generation=None, job=None):
     import io
     import requests
     from pydub import AudioSegment
@@ -179,7 +216,10 @@ def call_kokoro_online(text, api_config):
         # Create AudioSegment object from memory - use from_mp3 instead of from_file
         audio = AudioSegment.from_mp3(audio_data)
 
-        # Auto-play the audio
+        # Auto-play the audio (unless a newer translation cancelled it meanwhile)
+        if not is_current(generation):
+            return
+        tracing.tracer.mark("first_audio", job)
         play(audio)
     except Exception as e:
         return
@@ -192,9 +232,8 @@ Fast performance near real-time on macOS M1
 Offer multiple voices
 Lightweight: ~300MB (quantized: ~80MB)
 '''
-def call_kokoro_offline(text, api_config):
+def call_kokoro_offline(text, api_config, generation=None, job=None):
     import sounddevice as sd
-    from kokoro_onnx import Kokoro
 
     model = api_config["SPEECH"]["MODEL"]
     lang = api_config["SPEECH"]["LANG"]
@@ -207,18 +246,231 @@ def call_kokoro_offline(text, api_config):
     print(text)
 
     try:
-        model_path = config.get_resource_path("kokoro/kokoro-v1.0.int8.onnx")
-        voice_path = config.get_resource_path("kokoro/voices-v1.0.bin")
-        kokoro = Kokoro(model_path, voice_path)
-        samples, sample_rate = kokoro.create(
+        # The model is loaded once per process, not per utterance
+        samples, sample_rate = kokoro_engine.get(api_config).create(
             text=text, voice=model, speed=rate, lang=lang
         )
+        if not is_current(generation):
+            return
+        tracing.tracer.mark("first_audio", job)
         sd.play(samples, sample_rate)
         sd.wait()
     except Exception as e:
         print(e)
         return
 
+"""
+Incremental speech: sentences are synthesized and played while the translation
+is still streaming.
+
+A synthesis thread turns the sentences into PCM clips in arrival order, a
+playback thread writes the clips, in the same order, to one output stream that
+stays open for the whole translation. The next sentence is synthesized while
+the current one plays, so there are neither gaps (beyond synthesis being slower
+than speaking) nor overlaps between sentences.
+"""
+class Clip:
+    """PCM audio of one sentence; frames are added while it is synthesized."""
+
+    def __init__(self, text):
+        self.text = text
+        self.rate = None
+        self.channels = 1
+        self.frames = queue.Queue()  # bytes of int16 samples, None once complete
+
+    def add(self, frame, rate, channels=1):
+        self.rate = rate
+        self.channels = channels
+        if frame:
+            self.frames.put(frame)
+
+    def close(self):
+        self.frames.put(None)
+
+
+class PcmOutput:
+    """One open int16 output stream through pyaudio or sounddevice, reopened only when the format changes."""
+
+    def __init__(self, library):
+        self.library = library
+        self.format = None
+        self.stream = None
+        self.player = None
+
+    def write(self, frame, rate, channels):
+        if self.format != (rate, channels):
+            self.close()
+            self._open(rate, channels)
+        self.stream.write(frame)
+
+    def _open(self, rate, channels):
+        if self.library == "sounddevice":
+            import sounddevice as sd
+            self.stream = sd.RawOutputStream(samplerate=rate, channels=channels, dtype="int16")
+            self.stream.start()
+        else:
+            import pyaudio
+            self.player = pyaudio.PyAudio()
+            self.stream = self.player.open(format=pyaudio.paInt16, channels=channels, rate=rate, output=True)
+        self.format = (rate, channels)
+
+    def close(self):
+        try:
+            if self.library == "sounddevice" and self.stream:
+                self.stream.stop()
+                self.stream.close()
+            elif self.stream:
+                self.stream.stop_stream()
+                self.stream.close()
+                self.player.terminate()
+        except Exception as e:
+            print(f"Error closing audio output: {e}")
+        self.stream = self.player = self.format = None
+
+
+"""
+Synthesizers of the incremental speech: each one fills the clip with the audio
+of clip.text.
+"""
+def synthesize_sambert(clip, api_config):
+    import dashscope
+    from dashscope.audio.tts import ResultCallback, SpeechSynthesizer
+
+    class collect(ResultCallback):
+        def on_event(self, result):
+            # Frames are played while the rest of the sentence is synthesized
+            clip.add(result.get_audio_frame(), 48000)
+
+    dashscope.api_key = api_config["SPEECH"]["KEY"]
+    SpeechSynthesizer.call(model=api_config["SPEECH"]["MODEL"],
+                           text=clip.text,
+                           rate=float(api_config["SPEECH"]["RATE"]),
+                           sample_rate=48000,
+                           format='pcm',
+                           callback=collect())
+
+def synthesize_kokoro_online(clip, api_config):
+    import io
+    import requests
+    from pydub import AudioSegment
+
+    response = requests.post(
+        api_config["SPEECH"]["ENDPOINT"],
+        headers={'Authorization': f"Bearer {api_config['SPEECH']['KEY']}"},
+        json={
+            'Text': clip.text,
+            'VoiceId': api_config["SPEECH"]["MODEL"],
+            'Bitrate': '48k',
+            'Speed': float(api_config["SPEECH"]["RATE"]) - 1,
+            'Pitch': '1',
+            'Codec': 'libmp3lame',
+        }
+    )
+    audio = AudioSegment.from_mp3(io.BytesIO(response.content)).set_sample_width(2)
+    clip.add(audio.raw_data, audio.frame_rate, audio.channels)
+
+def synthesize_kokoro_offline(clip, api_config):
+    import numpy as np
+
+    samples, sample_rate = kokoro_engine.get(api_config).create(
+        text=clip.text, voice=api_config["SPEECH"]["MODEL"], speed=float(api_config["SPEECH"]["RATE"]),
+        lang=api_config["SPEECH"]["LANG"]
+    )
+    clip.add((np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes(), sample_rate)
+
+# Speech type -> (synthesis function, output library)
+SYNTHESIZERS = {
+    "sambert": (synthesize_sambert, "pyaudio"),
+    "kokoro-online": (synthesize_kokoro_online, "pyaudio"),
+    "kokoro-offline": (synthesize_kokoro_offline, "sounddevice"),
+}
+
+# Frames are written in blocks of about this length, a cancel stops within one block
+BLOCK_S = 0.1
+
+
+class IncrementalSpeech:
+    """Speaks the sentences of one translation in order, as they are added."""
+
+    def __init__(self, api_config, job=None):
+        self.api_config = api_config
+        self.job = job
+        self.lang = api_config["SPEECH"]["LANG"]
+        self.synthesize, library = SYNTHESIZERS[config.typed(api_config).speech.type]
+        self.output = PcmOutput(library)
+        self.generation = current_generation()
+        self.sentences = queue.Queue()
+        self.clips = queue.Queue()
+        self.counters = {"sentences": 0, "spoken": 0, "skipped": 0}
+        self.synthesis_thread = threading.Thread(target=self._synthesize_all, name="speech-synthesis", daemon=True)
+        self.playback_thread = threading.Thread(target=self._play_all, name="speech-playback", daemon=True)
+        self.synthesis_thread.start()
+        self.playback_thread.start()
+
+    def say(self, sentence):
+        """Queues a sentence; the parts not in SPEECH.LANG are left out."""
+        text = language.filter_target_lang(sentence, self.lang)
+        if not text or not any(ch.isalnum() for ch in text):
+            self.counters["skipped"] += 1
+            return
+        self.counters["sentences"] += 1
+        self.sentences.put(text)
+
+    def close(self):
+        """No more sentences, the queued ones are still spoken."""
+        self.sentences.put(None)
+
+    def _synthesize_all(self):
+        while True:
+            text = self.sentences.get()
+            if text is None or not is_current(self.generation):
+                self.clips.put(None)
+                return
+            clip = Clip(text)
+            # Playback starts as soon as the first frames exist
+            self.clips.put(clip)
+            try:
+                self.synthesize(clip, self.api_config)
+            except Exception as e:
+                print(f"Error synthesizing speech: {e}")
+            finally:
+                clip.close()
+
+    def _play_all(self):
+        tracing.tracer.mark("speech_start", self.job)
+        first = True
+        try:
+            while True:
+                clip = self.clips.get()
+                if clip is None:
+                    return
+                while True:
+                    frame = clip.frames.get()
+                    if frame is None:
+                        break
+                    if not is_current(self.generation):
+                        # A newer translation: drain the synthesis without playing it
+                        continue
+                    if first:
+                        tracing.tracer.mark("first_audio", self.job)
+                        first = False
+                    self._write(frame, clip.rate, clip.channels)
+                if is_current(self.generation):
+                    self.counters["spoken"] += 1
+        except Exception as e:
+            print(f"Error playing speech: {e}")
+        finally:
+            self.output.close()
+            tracing.tracer.finish(self.job)
+
+    def _write(self, frame, rate, channels):
+        block = max(2 * channels, int(rate * BLOCK_S) * 2 * channels)
+        for start in range(0, len(frame), block):
+            if not is_current(self.generation):
+                return
+            self.output.write(frame[start:start + block], rate, channels)
+
+
 # Testing
 if __name__ == "__main__":
     # Call the Sambert client with the specified text and API configuration
@@ -0,0 +1,73 @@
+"""
+Startup timing.
+
+sakana.py imports this module first and marks the phases of a cold start:
+
+    imports     app modules imported
+    config      api.json5 read and applied
+    ui          Tk widgets built
+    first_idle  the Tk event loop is running, the window is usable
+
+report() prints them once the window is up (DEBUG.STARTUP_REPORT). For a per
+module breakdown, record Python's import timings and summarize them:
+
+    python -X importtime sakana.py 2> importtime.log
+    python startup.py importtime.log --top 20
+"""
+import argparse
+import re
+import time
+
+# Reference point: the moment this module was imported (the start of sakana.py)
+_start = time.perf_counter()
+_marks = {}
+
+
+def mark(name):
+    """Record a phase as milliseconds since the start, the first time it is reached."""
+    _marks.setdefault(name, (time.perf_counter() - _start) * 1000)
+
+def marks():
+    return dict(_marks)
+
+def report():
+    phases, previous = [], 0.0
+    for name, ms in sorted(_marks.items(), key=lambda item: item[1]):
+        phases.append(f"{name} {ms - previous:.0f} ms")
+        previous = ms
+    print(f"Startup: {previous:.0f} ms ({', '.join(phases)})")
+
+
+_importtime_line = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+"""
+Parses the stderr of python -X importtime.
+
+Returns:
+    list: [(cumulative_us, self_us, module, depth), ...] in import order.
+"""
+def parse_importtime(lines):
+    entries = []
+    for line in lines:
+        match = _importtime_line.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((int(cumulative_us), int(self_us), module, (len(indent) - 1) // 2))
+    return entries
+
+def print_importtime(entries, top=20):
+    total_us = sum(cumulative for cumulative, _, _, depth in entries if depth == 0)
+    print(f"Total import time: {total_us / 1000:.0f} ms in {len(entries)} modules")
+    print(f"{'cumulative':>12} {'self':>10}  module (top-level imports)")
+    top_level = sorted((entry for entry in entries if entry[3] == 0), reverse=True)
+    for cumulative, self_us, module, _ in top_level[:top]:
+        print(f"{cumulative / 1000:>9.1f} ms {self_us / 1000:>7.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize python -X importtime output")
+    parser.add_argument("log", help="stderr of python -X importtime sakana.py")
+    parser.add_argument("--top", type=int, default=20, help="Number of top-level imports shown")
+    args = parser.parse_args()
+    with open(args.log, "r", encoding="utf-8", errors="replace") as f:
+        print_importtime(parse_importtime(f), args.top)
@@ -0,0 +1,42 @@
+import asyncio
+import contextvars
+import threading
+
+import aio
+
+request_lane = contextvars.ContextVar("request_lane", default="interactive")
+
+
+def test_submit_runs_on_the_shared_loop():
+    async def where():
+        return threading.current_thread().name
+
+    assert aio.submit(where()).result(2) == "aio-loop"
+
+
+def test_caller_context_is_carried_to_the_task_only():
+    async def lane():
+        return request_lane.get()
+
+    token = request_lane.set("background")
+    try:
+        assert aio.submit(lane(), contextvars.copy_context()).result(2) == "background"
+    finally:
+        request_lane.reset(token)
+    assert aio.submit(lane()).result(2) == "interactive"
+
+
+def test_cancelling_the_future_cancels_the_task():
+    started, stopped = threading.Event(), threading.Event()
+
+    async def stream():
+        started.set()
+        try:
+            await asyncio.sleep(5)
+        finally:
+            stopped.set()
+
+    future = aio.submit(stream())
+    assert started.wait(2)
+    future.cancel()
+    assert stopped.wait(2)
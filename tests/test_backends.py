@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import backends
+import startup
+
+
+def test_backend_follows_openai_compatible():
+    assert backends.backend_name({"API": {"OPENAI_COMPATIBLE": "True"}}) == "openai"
+    assert backends.backend_name({"API": {"OPENAI_COMPATIBLE": "False"}}) == "gemini"
+    assert backends.backend_name({}) == "gemini"
+
+
+def test_only_the_used_backend_is_imported():
+    code = ("import sys, backends\n"
+            "backends.warm_up({'API': {'OPENAI_COMPATIBLE': 'False'}}).join(30)\n"
+            "print('gemini' in sys.modules, 'openchat' in sys.modules, 'openai' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(backends.__file__))).stdout
+    assert output.split()[-3:] == ["True", "False", "False"]
+
+
+def test_parse_importtime_keeps_order_and_depth():
+    lines = ["import time: self [us] | cumulative | imported package",
+             "import time:       120 |        120 |   _io",
+             "import time:       300 |        900 | json",
+             "something else"]
+    assert startup.parse_importtime(lines) == [(120, 120, "_io", 1), (900, 300, "json", 0)]
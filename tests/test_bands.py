@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+from PIL import Image
+
+import bands
+import jobs
+
+
+def bands_config(concurrency=1):
+    return {"API": {}, "BANDS": {"ENABLE": "True", "MIN_HEIGHT": "100", "BAND_HEIGHT": "100",
+                                 "OVERLAP": "10", "CONCURRENCY": str(concurrency)}}
+
+
+def test_split_bands_overlap_and_cover_the_height():
+    assert bands.split_bands(250, 100, 20) == [(0, 100), (80, 180), (160, 250)]
+    assert bands.split_bands(50, 100, 20) == [(0, 50)]
+
+
+def test_merger_emits_in_order_and_drops_repeated_paragraphs():
+    emitted = []
+    merger = bands.OrderedBandMerger(3, lambda text, end=False: emitted.append(text))
+    merger.complete(1, "Ｂ  one\n\nC")
+    assert emitted == []
+    merger.complete(0, "A\n\nB one")
+    merger.complete(2, "C\n\nD")
+    assert emitted == ["A\n\nB one\n\n", "C\n\n", "D\n\n"]
+
+
+def test_failed_band_is_shown_in_place():
+    emitted = []
+    merger = bands.OrderedBandMerger(2, lambda text, end=False: emitted.append(text))
+    merger.complete(0, "Request Error: boom")
+    merger.complete(1, "A")
+    assert emitted == ["Request Error: boom\n\n", "A\n\n"]
+
+
+def test_cancelled_job_stops_sending_bands():
+    image = Image.new("RGB", (50, 700), "white")
+    job = jobs.Job(1, "capture")
+    sent = []
+    emitted = []
+
+    def stream_fn(payload, cfg, callback):
+        sent.append(payload)
+        if len(sent) == 2:
+            job.cancel()
+        callback(f"band {len(sent)}", end=False)
+        callback("", end=True)
+
+    with pytest.raises(jobs.JobCancelled):
+        bands.translate_in_bands(image, bands_config(), lambda text, end=False: emitted.append(text), stream_fn, job)
+    assert len(sent) == 2
+    assert emitted == ["band 1\n\n"]
+
+
+def test_cancelling_callback_is_not_turned_into_a_band_error():
+    image = Image.new("RGB", (50, 300), "white")
+    sent = []
+    lock = threading.Lock()
+
+    def stream_fn(payload, cfg, callback):
+        with lock:
+            sent.append(payload)
+        callback("text", end=False)
+
+    def callback(text, end=False):
+        raise jobs.JobCancelled("job 1 cancelled")
+
+    with pytest.raises(jobs.JobCancelled):
+        bands.translate_in_bands(image, bands_config(), callback, stream_fn)
+    assert len(sent) == 1
@@ -0,0 +1,55 @@
+import json
+import os
+
+from PIL import Image
+
+import batch
+
+
+def test_collect_images_filters_and_sorts(tmp_path):
+    for name in ("b.png", "a.jpg", "notes.txt"):
+        (tmp_path / name).write_bytes(b"x")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.png").write_bytes(b"x")
+    names = [os.path.relpath(path, tmp_path) for path in batch.collect_images([str(tmp_path)])]
+    assert names == ["a.jpg", "b.png"]
+    recursive = batch.collect_images([str(tmp_path), str(tmp_path / "b.png")], recursive=True)
+    assert [os.path.relpath(path, tmp_path) for path in recursive] == ["a.jpg", "b.png", os.path.join("sub", "c.png")]
+
+
+def test_checkpoint_survives_a_restart_until_the_page_changes(tmp_path):
+    page = tmp_path / "page.png"
+    Image.new("RGB", (8, 8)).save(page)
+    checkpoint_path = str(tmp_path / "run.checkpoint.json")
+    batch.Checkpoint(checkpoint_path).mark_done(str(page))
+    resumed = batch.Checkpoint(checkpoint_path)
+    assert resumed.is_done(str(page))
+    Image.new("RGB", (16, 16), "white").save(page)
+    os.utime(page, (0, 0))
+    assert not resumed.is_done(str(page))
+
+
+def test_unreadable_checkpoint_starts_over(tmp_path):
+    path = tmp_path / "run.checkpoint.json"
+    path.write_text("{broken", encoding="utf-8")
+    assert batch.Checkpoint(str(path)).done == {}
+
+
+def test_markdown_lists_the_last_result_of_each_page_in_order(tmp_path):
+    jsonl = tmp_path / "out.jsonl"
+    records = [{"file": "/p/2.png", "text": "old", "error": None},
+               {"file": "/p/1.png", "text": "", "error": "Request Error: 503"},
+               {"file": "/p/2.png", "text": "second page", "error": None}]
+    jsonl.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+    markdown = tmp_path / "out.md"
+    batch.write_markdown(str(jsonl), str(markdown), ["/p/1.png", "/p/2.png"])
+    assert markdown.read_text(encoding="utf-8") == (
+        "## 1.png\n\n> Request Error: 503\n\n## 2.png\n\nsecond page\n\n")
+
+
+def test_encode_page_reports_errors_instead_of_raising(tmp_path):
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    path, data, error, stats = batch.encode_page(str(broken), {})
+    assert data is None and stats is None
+    assert error.startswith("Error preparing image")
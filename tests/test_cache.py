@@ -0,0 +1,62 @@
+import pytest
+from PIL import Image, ImageDraw
+
+import cache
+import config
+
+
+def cache_config(**values):
+    section = {"ENABLE": "True", "DISK_DIR": ""}
+    section.update({key: str(value) for key, value in values.items()})
+    return config.AppConfig({"API": {"MODEL": "m"}, "CACHE": section})
+
+
+def page(text):
+    image = Image.new("RGB", (320, 240), "white")
+    ImageDraw.Draw(image).text((20, 20), text, fill="black")
+    return image
+
+
+@pytest.fixture(autouse=True)
+def fresh_singleton(monkeypatch):
+    monkeypatch.setattr(cache, "_translation_cache", None)
+    monkeypatch.setattr(cache, "_cache_settings", None)
+
+
+def test_near_identical_capture_hits_and_other_page_misses():
+    api_config = cache_config()
+    translation_cache = cache.get_cache(api_config)
+    translation_cache.store(translation_cache.make_key(page("Chapter one"), api_config), "text")
+    assert translation_cache.lookup(translation_cache.make_key(page("Chapter one"), api_config)) == "text"
+    assert translation_cache.lookup(translation_cache.make_key(page("Something else entirely"), api_config)) is None
+
+
+def test_failed_translations_are_not_stored():
+    api_config = cache_config()
+    translation_cache = cache.get_cache(api_config)
+    key = translation_cache.make_key(page("Chapter one"), api_config)
+    translation_cache.store(key, "猫\nCat\n\nRequest Error: 503")
+    assert translation_cache.lookup(key) is None
+
+
+def test_digest_follows_request_settings_not_their_spelling():
+    assert cache.config_digest(cache_config()) == cache.config_digest(
+        config.AppConfig({"API": {"MODEL": "m", "TEMPERATURE": "0.80"}, "CACHE": {"ENABLE": "True"}}))
+    assert cache.config_digest(cache_config()) != cache.config_digest(
+        config.AppConfig({"API": {"MODEL": "m", "TEMPERATURE": "0.2"}}))
+
+
+def test_reloaded_cache_section_rebuilds_the_cache(tmp_path):
+    first = cache.get_cache(cache_config())
+    assert cache.get_cache(cache_config()) is first
+    second = cache.get_cache(cache_config(TOLERANCE=2, DISK_DIR=tmp_path))
+    assert second is not first
+    assert second.tolerance == 2 and second.disk_dir == str(tmp_path)
+    assert cache.get_cache(cache_config(ENABLE="False")) is None
+
+
+def test_template_leaves_the_cache_off():
+    import json5
+    with open(config.get_resource_path("api_template.json5"), encoding="utf-8") as f:
+        template = json5.load(f)
+    assert not config.typed(template).cache.enable
@@ -0,0 +1,39 @@
+import clients
+
+API = {"API": {"ENDPOINT": "https://example.invalid/v1", "KEY": "k"}}
+
+
+def closing_registry(monkeypatch):
+    closed = []
+    monkeypatch.setattr(clients.ClientEntry, "close", lambda entry: closed.append(entry))
+    return clients.ClientRegistry(), closed
+
+
+def test_client_is_reused_between_requests(monkeypatch):
+    registry, closed = closing_registry(monkeypatch)
+    with registry.use("gemini-http", API) as first:
+        pass
+    with registry.use("gemini-http", API) as second:
+        assert second is first
+    assert registry.stats()["clients"][0]["reuses"] == 1
+
+
+def test_reload_closes_a_client_only_after_its_last_user(monkeypatch):
+    registry, closed = closing_registry(monkeypatch)
+    with registry.use("gemini-http", API) as session:
+        registry.invalidate()
+        assert closed == []
+        assert registry.stats()["retired_in_use"] == 1
+        # New requests already get a new client
+        with registry.use("gemini-http", API) as fresh:
+            assert fresh is not session
+    assert len(closed) == 1 and closed[0].client is session
+    assert registry.stats()["retired_in_use"] == 0
+
+
+def test_idle_clients_are_closed_at_once(monkeypatch):
+    registry, closed = closing_registry(monkeypatch)
+    with registry.use("gemini-http", API):
+        pass
+    registry.configure(config_digest="new")
+    assert len(closed) == 1
@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+import config
+
+
+def test_values_are_typed_and_defaulted():
+    api_config = config.AppConfig({"API": {"STREAM": "yes", "TEMPERATURE": "0.3", "ASYNC": "False"}})
+    assert api_config.api.stream is True
+    assert api_config.api.async_ is False
+    assert api_config.api.temperature == 0.3
+    assert api_config.api.png_compress_level == 6
+    assert api_config["API"]["TEMPERATURE"] == "0.3"
+
+
+def test_keyword_choices_and_ranges():
+    assert config.AppConfig({"HEDGE": {"DELAY_MS": "Auto"}}).hedge.delay_ms == "auto"
+    assert config.AppConfig({"HEDGE": {"DELAY_MS": "250"}}).hedge.delay_ms == 250.0
+
+
+def test_every_invalid_value_is_reported():
+    with pytest.raises(config.ConfigError) as error:
+        config.AppConfig({"API": {"TEMPERATURE": "hot"}, "JOBS": {"WORKERS": "99"},
+                          "PROVIDERS": [{"NAME": "x", "STREAM": "maybe"}]})
+    message = str(error.value)
+    assert "API.TEMPERATURE" in message and "JOBS.WORKERS" in message and "PROVIDERS[0].STREAM" in message
+
+
+def test_profiles_are_merged_over_the_api_section():
+    merged = config.AppConfig({"API": {"MODEL": "a", "KEY": "k"}}).with_api({"MODEL": "b"})
+    assert merged.api.model == "b" and merged.api.key == "k"
+
+
+def test_watcher_without_a_file_does_not_start():
+    watcher = config.ConfigWatcher(config.AppConfig({}), lambda new, old: None, interval=0.01)
+    assert watcher.start() is False
+    assert watcher.thread is None
+
+
+def test_watcher_reloads_valid_edits_only(tmp_path):
+    path = tmp_path / "api.json5"
+    path.write_text('{"API": {"MODEL": "a"}}', encoding="utf-8")
+    current = config.AppConfig({"API": {"MODEL": "a"}}, str(path), os.stat(path).st_mtime_ns)
+    reloads = []
+    watcher = config.ConfigWatcher(current, lambda new, old: reloads.append(new.api.model), interval=0.01)
+    assert watcher.start()
+    try:
+        path.write_text('{"API": {"TEMPERATURE": "hot"}}', encoding="utf-8")
+        time.sleep(0.1)
+        path.write_text('{"API": {"MODEL": "bb"}}', encoding="utf-8")
+        deadline = time.monotonic() + 2
+        while not reloads and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+    assert reloads == ["bb"]
+    assert watcher.current.api.model == "bb"
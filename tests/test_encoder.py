@@ -0,0 +1,49 @@
+import threading
+
+from PIL import Image
+
+import encoder
+import translate
+
+
+def api(**values):
+    return {"API": {key: str(value) for key, value in values.items()}, "TRACE": {"ENABLE": "False"}}
+
+
+def test_resolution_cap_keeps_the_aspect_ratio():
+    image = Image.new("RGB", (4000, 1000))
+    assert encoder.limit_resolution(image, max_long_edge=2000).size == (2000, 500)
+    assert encoder.limit_resolution(image, max_megapixels=1).size == (2000, 500)
+    assert encoder.limit_resolution(image) is image
+
+
+def test_payload_carries_its_own_stats():
+    image = Image.new("RGBA", (300, 200), "white")
+    payload = encoder.ImagePayload.from_image(image, api(IMAGE_FORMAT="jpg", MAX_LONG_EDGE=150))
+    assert payload.mime_type == "image/jpeg"
+    assert payload.stats.encoded_size == (150, 100)
+    assert payload.stats.num_bytes == payload.nbytes
+    assert payload.to_data_url().startswith("data:image/jpeg;base64,")
+
+
+def test_request_timings_report_bytes_and_format(monkeypatch):
+    def client_fn(payload, cfg):
+        return "text"
+
+    monkeypatch.setattr(translate, "select_backend", lambda cfg: (None, client_fn))
+    results = {}
+
+    def request(name, size):
+        translate.call_real_api(Image.new("RGB", size, "white"), api(IMAGE_FORMAT="webp"))
+        results[name] = translate.last_timings()
+
+    threads = [threading.Thread(target=request, args=(name, size))
+               for name, size in (("small", (10, 10)), ("large", (800, 800)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name, size in (("small", (10, 10)), ("large", (800, 800))):
+        assert results[name]["image_format"] == "WEBP"
+        assert results[name]["encode_bytes"] > 0
+    assert results["small"]["encode_bytes"] != results["large"]["encode_bytes"]
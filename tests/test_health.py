@@ -0,0 +1,102 @@
+import pytest
+
+import health
+import providers
+import translate
+
+
+def breaker(**settings):
+    return health.CircuitBreaker("p", health.ProviderHealth(60.0), **settings)
+
+
+def test_consecutive_failures_open_the_breaker():
+    b = breaker(consecutive_failures=3, min_requests=100)
+    for _ in range(2):
+        b.record_failure(10, "boom")
+    assert b.state == health.CLOSED and b.allow()
+    b.record_failure(10, "boom")
+    assert b.state == health.OPEN
+    assert not b.allow()
+    assert 0 < b.retry_in() <= 30
+
+
+def test_error_rate_opens_the_breaker_once_there_are_enough_requests():
+    b = breaker(error_rate=0.5, min_requests=4, consecutive_failures=100)
+    b.record_success(10)
+    b.record_failure(10)
+    b.record_success(10)
+    assert b.state == health.CLOSED
+    b.record_failure(10)
+    assert b.state == health.OPEN
+
+
+def test_half_open_lets_one_probe_through(monkeypatch):
+    b = breaker(consecutive_failures=1, cooldown_s=30)
+    b.record_failure(10)
+    b.opened_at -= 31
+    assert b.allow()
+    assert b.state == health.HALF_OPEN
+    assert not b.allow()
+    b.record_failure(10, "still down")
+    assert b.state == health.OPEN
+
+    b.opened_at -= 31
+    assert b.allow()
+    b.record_success(10)
+    assert b.state == health.CLOSED
+    assert b.counters["opened"] == 2 and b.counters["closed"] == 1
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    fresh = health.HealthRegistry()
+    fresh.configure(consecutive_failures=1, cooldown_s=30)
+    monkeypatch.setattr(health, "registry", fresh)
+    return fresh
+
+
+def fake_backends(monkeypatch, answers, calls):
+    def select_backend(api_config):
+        name = api_config["API"]["NAME"]
+
+        def stream(payload, cfg, callback):
+            calls.append(name)
+            callback(answers[name], end=True)
+            return ""
+
+        def client(payload, cfg):
+            calls.append(name)
+            return answers[name]
+
+        return stream, client
+
+    monkeypatch.setattr(translate, "select_backend", select_backend)
+
+
+def profile_list(*names):
+    return [providers.Profile(name, {"API": {"NAME": name}}) for name in names]
+
+
+def test_failover_skips_a_failing_provider(monkeypatch, registry):
+    calls = []
+    fake_backends(monkeypatch, {"a": "Request Error: 503", "b": "translated"}, calls)
+    assert health.call_with_failover(None, {}, profile_list=profile_list("a", "b")) == "translated"
+    assert calls == ["a", "b"]
+    # a's breaker is open now, the next request goes straight to b
+    chunks = []
+    health.call_with_failover(None, {}, lambda text, end=False: chunks.append((text, end)),
+                              profile_list=profile_list("a", "b"))
+    assert calls == ["a", "b", "b"]
+    assert chunks == [("translated", True)]
+    assert registry.metrics()["failovers"] == 1
+
+
+def test_every_breaker_open_probes_the_closest_one(monkeypatch, registry):
+    calls = []
+    fake_backends(monkeypatch, {"a": "Request Error: 1", "b": "Request Error: 2"}, calls)
+    profiles = profile_list("a", "b")
+    assert health.call_with_failover(None, {}, profile_list=profiles) == "Request Error: 2"
+    registry.breaker("a").opened_at -= 10
+    assert health.call_with_failover(None, {}, profile_list=profiles) == "Request Error: 1"
+    assert calls == ["a", "b", "a"]
+    assert registry.metrics()["exhausted"] == 2
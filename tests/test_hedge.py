@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+import hedge
+import translate
+
+
+def hedge_config(delay_ms="50"):
+    return {"API": {"NAME": "base"}, "TRACE": {"ENABLE": "False"},
+            "HEDGE": {"ENABLE": "True", "DELAY_MS": delay_ms, "MIN_SAMPLES": "2", "MIN_DELAY_MS": "10"},
+            "PROVIDERS": [{"NAME": "slow"}, {"NAME": "fast"}]}
+
+
+@pytest.fixture(autouse=True)
+def clear_history(monkeypatch):
+    monkeypatch.setattr(hedge, "_ttft_history", {})
+
+
+def test_auto_delay_uses_the_p95_once_there_are_enough_samples():
+    api_config = hedge_config("auto")
+    assert hedge.hedge_delay(api_config, "slow") == 1.5
+    for ms in (100, 200, 300):
+        hedge.record_ttft("slow", ms)
+    assert 0.2 < hedge.hedge_delay(api_config, "slow") <= 0.3
+
+
+def test_losing_stream_is_cancelled_and_its_wait_recorded(monkeypatch):
+    closed = threading.Event()
+
+    def backend(cfg):
+        name = cfg["API"]["NAME"]
+
+        async def stream(payload, api_config):
+            try:
+                if name == "slow":
+                    await asyncio.sleep(5)
+                yield f"from {name}"
+                yield " done"
+            finally:
+                if name == "slow":
+                    closed.set()
+        return stream
+
+    monkeypatch.setattr(translate, "select_async_backend", backend)
+    api_config = hedge_config()
+    chunks = []
+    hedge.call_hedged(object(), api_config, lambda text, end=False: chunks.append(text))
+    assert "".join(chunks) == "from fast done"
+    # Closed right away, not at its next chunk 5 s later
+    assert closed.wait(1)
+    slow_ttft, samples = hedge.observed_ttft("slow")
+    assert samples == 1 and slow_ttft >= 50
+
+
+def test_non_streaming_loser_records_its_real_first_chunk(monkeypatch):
+    release = threading.Event()
+    finished = threading.Event()
+
+    def backend(cfg):
+        name = cfg["API"]["NAME"]
+
+        def client_fn(payload, api_config):
+            if name == "slow":
+                release.wait(5)
+                finished.set()
+            return f"from {name}"
+        return None, client_fn
+
+    monkeypatch.setattr(translate, "select_backend", backend)
+    assert hedge.call_hedged(object(), hedge_config()) == "from fast"
+    release.set()
+    assert finished.wait(1)
+    for _ in range(100):
+        if hedge.observed_ttft("slow")[1]:
+            break
+        threading.Event().wait(0.01)
+    assert hedge.observed_ttft("slow")[1] == 1
+
+
+def test_every_failure_reports_the_last_error(monkeypatch):
+    def backend(cfg):
+        async def stream(payload, api_config):
+            raise RuntimeError(cfg["API"]["NAME"] + " down")
+            yield
+        return stream
+
+    monkeypatch.setattr(translate, "select_async_backend", backend)
+    chunks = []
+    hedge.call_hedged(object(), hedge_config(), lambda text, end=False: chunks.append((text, end)))
+    assert chunks == [("Request Error: fast down", True)]
@@ -0,0 +1,67 @@
+import pytest
+
+import jobs
+
+
+def busy(controller):
+    return lambda: controller.current is not None
+
+
+def test_latest_cancels_the_job_in_flight():
+    controller = jobs.JobController("latest")
+    first = controller.request("ct", busy(controller))
+    second = controller.request("ct", busy(controller))
+    assert first.is_cancelled() and not second.is_cancelled()
+    assert controller.current is second
+    assert controller.stats()["cancelled"] == 1
+
+
+def test_queue_keeps_only_the_newest_pending_capture():
+    controller = jobs.JobController("queue")
+    first = controller.request("ct", busy(controller))
+    assert controller.request("a", busy(controller)) is None
+    assert controller.request("b", busy(controller)) is None
+    following = controller.finish(first)
+    assert following.message == "b"
+    assert controller.stats()["dropped"] == 1
+    assert controller.finish(following) is None
+
+
+def test_drop_ignores_new_captures_while_busy():
+    controller = jobs.JobController("drop")
+    first = controller.request("ct", busy(controller))
+    assert controller.request("ct", busy(controller)) is None
+    assert not first.is_cancelled()
+
+
+def test_lanes_preempt_downwards_only():
+    controller = jobs.JobController("drop")
+    watch_job = controller.request("ct", busy(controller), priority=1)
+    hotkey = controller.request("ct", busy(controller), priority=0)
+    assert watch_job.is_cancelled() and controller.current is hotkey
+    assert controller.request("ct", busy(controller), priority=1) is None
+    assert controller.stats()["preempted"] == 1
+
+
+def test_guard_stops_the_stream_of_a_cancelled_job():
+    controller = jobs.JobController()
+    job = controller.request("ct", busy(controller))
+    chunks = []
+    guarded = controller.guard(job, lambda text, end=False: chunks.append(text))
+    guarded("a")
+    job.cancel()
+    with pytest.raises(jobs.JobCancelled):
+        guarded("b")
+    guarded("", end=True)
+    assert chunks == ["a"]
+    assert controller.stats()["late_chunks"] == 2
+
+
+def test_cancel_handlers_run_once_even_when_added_late():
+    job = jobs.Job(1, "ct")
+    calls = []
+    job.add_cancel_handler(lambda: calls.append("early"))
+    job.cancel()
+    job.cancel()
+    job.add_cancel_handler(lambda: calls.append("late"))
+    assert calls == ["early", "late"]
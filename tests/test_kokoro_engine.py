@@ -0,0 +1,51 @@
+import sys
+import types
+
+import pytest
+
+import kokoro_engine
+
+
+class FakeKokoro:
+    loads = 0
+
+    def __init__(self, model_path, voices_path):
+        FakeKokoro.loads += 1
+
+    def create(self, text, voice, speed, lang):
+        return [0.0] * 2400, 24000
+
+
+@pytest.fixture(autouse=True)
+def fake_kokoro(monkeypatch):
+    FakeKokoro.loads = 0
+    monkeypatch.setitem(sys.modules, "kokoro_onnx", types.SimpleNamespace(Kokoro=FakeKokoro))
+    monkeypatch.setattr(kokoro_engine, "_engine", None)
+
+
+def kokoro_config(threads="0"):
+    return {"SPEECH": {"STREAM": "True", "TYPE": "kokoro-offline", "MODEL": "af_heart", "LANG": "en-us"},
+            "KOKORO": {"WARM_UP": "True", "INTRA_OP_THREADS": threads}}
+
+
+def test_model_is_loaded_once_and_reused():
+    engine = kokoro_engine.get(kokoro_config())
+    for _ in range(3):
+        samples, rate = engine.create("Hello.", "af_heart")
+    assert FakeKokoro.loads == 1
+    assert kokoro_engine.get(kokoro_config()) is engine
+    stats = kokoro_engine.stats()
+    assert stats["loaded"] and stats["syntheses"] == 3
+    assert stats["audio_s"] == 0.3 and stats["last_rtf"] is not None
+
+
+def test_changed_settings_replace_the_engine():
+    first = kokoro_engine.get(kokoro_config())
+    assert kokoro_engine.get(kokoro_config("2")) is not first
+
+
+def test_warm_up_only_for_streamed_kokoro_offline():
+    assert kokoro_engine.warm_up({"SPEECH": {"STREAM": "True", "TYPE": "sambert"}}) is None
+    thread = kokoro_engine.warm_up(kokoro_config())
+    thread.join(2)
+    assert kokoro_engine.stats()["syntheses"] == 1
@@ -0,0 +1,42 @@
+import memory
+
+
+def memory_config(tmp_path, enable="False"):
+    return {"MEMORY": {"ENABLE": enable, "PATH": str(tmp_path / "memory.sqlite3"), "MAX_ENTRIES": "2"}}
+
+
+def test_parse_pairs_keeps_japanese_english_blocks():
+    text = "こんにちは\nHello\n\nさようなら\nGood bye\n\nNo source here\n"
+    assert memory.parse_pairs(text) == [("こんにちは", "Hello"), ("さようなら", "Good bye")]
+
+
+def test_lookup_normalises_width_and_spacing(tmp_path):
+    tm = memory.open_memory(memory_config(tmp_path))
+    tm.add_pairs([("ﾃｽﾄ です", "It's a test")])
+    assert tm.lookup("テスト です") == "It's a test"
+    assert tm.lookup("テストです") == "It's a test"
+    tm.close()
+
+
+def test_oldest_pairs_are_evicted(tmp_path):
+    tm = memory.open_memory(memory_config(tmp_path))
+    for index, source in enumerate(["一", "二", "三"]):
+        tm.add_pairs([(source, str(index))])
+    assert tm.count() == 2
+    tm.close()
+
+
+def test_export_import_work_with_memory_disabled(tmp_path):
+    # The command line opens the configured file even when the app doesn't use it
+    api_config = memory_config(tmp_path)
+    assert memory.get_memory(api_config) is None
+    tm = memory.open_memory(api_config)
+    tm.add_pairs([("猫", "Cat")])
+    exported = tmp_path / "pairs.jsonl"
+    assert tm.export_jsonl(exported) == 1
+    tm.close()
+
+    other = memory.open_memory({"MEMORY": {"PATH": str(tmp_path / "other.sqlite3")}})
+    assert other.import_jsonl(exported) == 1
+    assert other.lookup("猫") == "Cat"
+    other.close()
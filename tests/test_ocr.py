@@ -0,0 +1,42 @@
+import pytest
+from PIL import Image
+
+import ocr
+import translate
+
+
+@pytest.fixture(autouse=True)
+def fresh_backend(monkeypatch):
+    monkeypatch.setattr(ocr, "_backend", None)
+    monkeypatch.setattr(ocr, "_backend_settings", None)
+
+
+def ocr_config(confidence, text="日本語のテキスト", min_confidence="0.8"):
+    return {"OCR": {"ENABLE": "True", "ENGINE": "fake", "FAKE_TEXT": text, "FAKE_CONFIDENCE": confidence,
+                    "MIN_CONFIDENCE": min_confidence}}
+
+
+def test_confident_ocr_sends_text_only():
+    payload, timings = translate.run_ocr(Image.new("RGB", (32, 32)), ocr_config("0.9"))
+    assert isinstance(payload, ocr.TextPayload)
+    assert payload.text == "日本語のテキスト"
+    assert timings["path"] == "text" and timings["ocr_confidence"] == 0.9
+
+
+@pytest.mark.parametrize("confidence, text", [("0.5", "日本語"), ("0.9", "  ")])
+def test_unsure_or_empty_ocr_falls_back_to_the_image(confidence, text):
+    payload, timings = translate.run_ocr(Image.new("RGB", (32, 32)), ocr_config(confidence, text))
+    assert payload is None
+    assert timings["path"] == "image"
+
+
+def test_disabled_ocr_is_never_loaded():
+    assert ocr.get_backend({"OCR": {"ENABLE": "False", "ENGINE": "fake"}}) is None
+    assert translate.run_ocr(Image.new("RGB", (32, 32)), {})[0] is None
+
+
+def test_backend_is_rebuilt_when_its_settings_change():
+    first = ocr.get_backend(ocr_config("0.9"))
+    assert ocr.get_backend(ocr_config("0.9")) is first
+    second = ocr.get_backend(ocr_config("0.9", text="別"))
+    assert second is not first and second.text == "別"
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+from PIL import Image
+
+import cache
+import pipeline
+
+
+def test_pipeline_imports_no_gui_or_provider_sdk():
+    code = ("import sys, pipeline\n"
+            "print(sorted(m for m in ('tkinter', 'Quartz', 'AppKit', 'pyautogui', 'openai', 'google.genai')"
+            " if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(pipeline.__file__))).stdout
+    assert output.strip() == "[]"
+
+
+def test_load_image_accepts_bytes_and_converts_the_mode(tmp_path):
+    path = tmp_path / "page.png"
+    Image.new("P", (4, 3)).save(path)
+    image = pipeline.load_image(path.read_bytes())
+    assert image.size == (4, 3) and image.mode == "RGB"
+
+
+def test_cached_translation_is_replayed_without_a_request(monkeypatch):
+    monkeypatch.setattr(cache, "_translation_cache", None)
+    api_config = {"CACHE": {"ENABLE": "True", "DISK_DIR": ""}}
+    image = Image.new("RGB", (64, 64), "white")
+    calls = []
+
+    def translate_fn(image, api_config):
+        calls.append(image.size)
+        return "日本語\nJapanese\n\n"
+
+    chunks = []
+    callback = lambda text, end=False: chunks.append((text, end))
+    pipeline.translate_image(image, api_config, callback, translate_fn=translate_fn)
+    assert pipeline.translate_image(image, api_config, translate_fn=translate_fn) == "日本語\nJapanese\n\n"
+    assert calls == [(64, 64)]
+    assert "".join(text for text, _ in chunks) == "日本語\nJapanese\n\n" and chunks[-1][1]
+
+
+def test_cancelled_translate_fn_is_not_cached(monkeypatch):
+    monkeypatch.setattr(cache, "_translation_cache", None)
+    api_config = {"CACHE": {"ENABLE": "True", "DISK_DIR": ""}}
+    image = Image.new("RGB", (64, 64))
+    assert pipeline.translate_image(image, api_config, translate_fn=lambda image, cfg: None) is None
+    assert cache.get_cache(api_config).lookup(cache.get_cache(api_config).make_key(image, api_config)) is None
@@ -0,0 +1,27 @@
+import config
+import providers
+
+
+def test_without_profiles_the_api_section_is_the_only_one():
+    api_config = config.AppConfig({"API": {"NAME": "main", "MODEL": "m"}})
+    assert [p.name for p in providers.profiles(api_config)] == ["main"]
+    assert providers.primary(api_config).api_config is api_config
+
+
+def test_profiles_are_merged_over_the_api_section_in_order():
+    api_config = config.AppConfig({"API": {"MODEL": "base", "KEY": "k", "TEMPERATURE": "0.5"},
+                                   "PROVIDERS": [{"NAME": "fast", "MODEL": "small"},
+                                                 {"NAME": "off", "ENABLE": "False"},
+                                                 {"MODEL": "large", "TEMPERATURE": "0.1"}]})
+    profile_list = providers.profiles(api_config)
+    assert [p.name for p in profile_list] == ["fast", "provider3"]
+    assert profile_list[0].api_config.api.model == "small"
+    assert profile_list[0].api_config.api.key == "k"
+    assert profile_list[1].api_config.api.temperature == 0.1
+    # Parsed once per loaded config
+    assert providers.profiles(api_config) is profile_list
+
+
+def test_plain_dict_configs_are_merged_too():
+    profile_list = providers.profiles({"API": {"MODEL": "base", "KEY": "k"}, "PROVIDERS": [{"NAME": "a", "MODEL": "x"}]})
+    assert profile_list[0].api_config["API"] == {"MODEL": "x", "KEY": "k", "NAME": "a"}
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import ratelimit
+
+
+class Failure(Exception):
+    def __init__(self, message, status_code=None, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        if headers is not None:
+            self.response = type("Response", (), {"headers": headers, "status_code": status_code})()
+
+
+def rate_config(max_concurrency=1):
+    return {"API": {"NAME": "test"}, "RATE_LIMIT": {"ENABLE": "True", "MAX_CONCURRENCY": str(max_concurrency)}}
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    ratelimit.registry.clear()
+    yield
+    ratelimit.registry.clear()
+
+
+def test_classify_reads_only_real_statuses():
+    assert ratelimit.classify(Failure("slow down", 429, {"Retry-After": "3"})) == (429, 3.0)
+    assert ratelimit.classify(Failure("job 503 cancelled")) == (None, None)
+    assert ratelimit.classify(Failure("odd", 7)) == (None, None)
+    assert ratelimit.classify() == (None, None)
+
+
+def test_throttling_halves_the_limit_and_success_grows_it():
+    limiter = ratelimit.ProviderLimiter("p", max_concurrency=4)
+    limiter.acquire()
+    limiter.release(10, 503)
+    assert limiter.limit == 2.0
+    limiter.acquire()
+    limiter.release(10)
+    assert limiter.limit == 2.5
+    assert limiter.in_flight == 0
+
+
+def test_interactive_waiters_go_before_background_ones():
+    limiter = ratelimit.ProviderLimiter("p", max_concurrency=1)
+    limiter.acquire()
+    order = []
+
+    def wait(priority):
+        limiter.acquire(priority=priority)
+        order.append(priority)
+        limiter.release(0)
+
+    threads = [threading.Thread(target=wait, args=(ratelimit.BACKGROUND,))]
+    threads[0].start()
+    while not limiter.waiters:
+        time.sleep(0.01)
+    threads.append(threading.Thread(target=wait, args=(ratelimit.INTERACTIVE,)))
+    threads[1].start()
+    while len(limiter.waiters) < 2:
+        time.sleep(0.01)
+    limiter.release(0)
+    for thread in threads:
+        thread.join(5)
+    assert order == [ratelimit.INTERACTIVE, ratelimit.BACKGROUND]
+
+
+def test_cancelled_queued_async_request_gives_its_slot_back():
+    api_config = rate_config(max_concurrency=1)
+    limiter = ratelimit.registry.get(api_config)
+
+    async def stream(payload, cfg):
+        yield "hello"
+
+    limited = ratelimit.wrap_async(stream, api_config)
+
+    async def collect():
+        return [chunk async for chunk in limited(None, api_config)]
+
+    async def scenario():
+        # Another request holds the only slot, this one queues behind it
+        limiter.acquire()
+        queued = asyncio.ensure_future(collect())
+        while not limiter.waiters:
+            await asyncio.sleep(0.01)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        limiter.release(0)
+        # The cancelled acquire gets the slot, then hands it back
+        deadline = time.monotonic() + 5
+        while (limiter.waiters or limiter.in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert limiter.in_flight == 0
+        return await asyncio.wait_for(collect(), 5)
+
+    assert asyncio.run(scenario()) == ["hello"]
+    assert limiter.in_flight == 0
@@ -0,0 +1,58 @@
+import render
+
+
+class FakeRoot:
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay_ms, func):
+        self.callbacks.append(func)
+
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for func in callbacks:
+            func()
+
+
+class FakeTextBox:
+    def __init__(self):
+        self.text = ""
+        self.calls = []
+
+    def insert(self, index, text):
+        self.text += text
+        self.calls.append("insert")
+
+    def delete(self, start, end):
+        self.text = ""
+        self.calls.append("delete")
+
+    def see(self, index):
+        self.calls.append("see")
+
+
+def test_chunks_of_one_frame_become_one_insert():
+    root, box = FakeRoot(), FakeTextBox()
+    renderer = render.TextRenderer(root, box)
+    for chunk in ("Hel", "lo", " world"):
+        renderer.append(chunk)
+    renderer.append("")
+    assert len(root.callbacks) == 1 and box.text == ""
+    root.run()
+    assert box.text == "Hello world"
+    assert box.calls == ["insert", "see"]
+    assert renderer.stats() == {"chunks": 3, "frames": 1, "inserts": 1, "pending": 0}
+
+
+def test_clear_and_calls_keep_their_order():
+    root, box = FakeRoot(), FakeTextBox()
+    renderer = render.TextRenderer(root, box)
+    renderer.append("stale")
+    renderer.clear()
+    renderer.append("new")
+    renderer.call(lambda: box.calls.append(f"call after {box.text!r}"))
+    renderer.append(" text")
+    root.run()
+    assert box.text == "new text"
+    # The cleared text is never drawn
+    assert box.calls == ["delete", "insert", "see", "call after 'new'", "insert", "see"]
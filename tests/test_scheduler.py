@@ -0,0 +1,71 @@
+import threading
+import time
+
+import jobs
+import ratelimit
+import scheduler
+
+
+def test_free_worker_takes_the_most_important_lane_first():
+    pool = scheduler.Scheduler(workers=1)
+    gate = threading.Event()
+    order = []
+
+    def work(name):
+        gate.wait(2)
+        order.append((name, ratelimit._priority.get()))
+
+    try:
+        pool.submit(jobs.Job(1, "first", scheduler.INTERACTIVE), work, "first")
+        time.sleep(0.05)
+        for job_id, (name, lane) in enumerate([("bulk", scheduler.BACKGROUND), ("watch", scheduler.WATCH),
+                                               ("hotkey", scheduler.INTERACTIVE)], start=2):
+            pool.submit(jobs.Job(job_id, name, lane), work, name)
+        assert pool.depth() == {"interactive": 1, "watch": 1, "background": 1}
+        gate.set()
+        deadline = time.monotonic() + 2
+        while len(order) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        pool.shutdown()
+    # Lanes below interactive also wait behind hotkeys in the rate limiter
+    assert order == [("first", ratelimit.INTERACTIVE), ("hotkey", ratelimit.INTERACTIVE),
+                     ("watch", ratelimit.BACKGROUND), ("bulk", ratelimit.BACKGROUND)]
+    assert pool.counters["done"] == 4
+    assert set(pool.metrics()["lanes"]) == {"interactive", "watch", "background"}
+
+
+def test_cancelled_and_expired_jobs_never_run():
+    pool = scheduler.Scheduler(workers=1)
+    gate = threading.Event()
+    ran = []
+    try:
+        pool.submit(jobs.Job(1, "blocker"), lambda: gate.wait(2))
+        time.sleep(0.05)
+        cancelled = jobs.Job(2, "cancelled")
+        expired = jobs.Job(3, "expired", scheduler.WATCH, deadline=time.monotonic() + 0.01)
+        pool.submit(cancelled, ran.append, "cancelled")
+        pool.submit(expired, ran.append, "expired")
+        cancelled.cancel()
+        time.sleep(0.05)
+        gate.set()
+        deadline = time.monotonic() + 2
+        while pool.counters["expired"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        pool.shutdown()
+    assert ran == []
+    assert cancelled.state == jobs.CANCELLED
+    assert expired.state == jobs.EXPIRED and expired.is_cancelled()
+
+
+def test_shutdown_cancels_queued_and_running_jobs():
+    pool = scheduler.Scheduler(workers=1)
+    running = jobs.Job(1, "running")
+    queued = jobs.Job(2, "queued")
+    pool.submit(running, lambda: running.cancelled.wait(2))
+    time.sleep(0.05)
+    pool.submit(queued, lambda: None)
+    pool.shutdown()
+    assert running.is_cancelled() and queued.is_cancelled()
+    assert running.state == jobs.CANCELLED and queued.state == jobs.CANCELLED
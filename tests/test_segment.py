@@ -0,0 +1,50 @@
+import pytest
+
+import segment
+
+
+def split(text, step=None):
+    segmenter = segment.SentenceSegmenter()
+    sentences = []
+    for start in range(0, len(text), step or len(text) or 1):
+        sentences += segmenter.feed(text[start:start + (step or len(text))])
+    return sentences + segmenter.flush()
+
+
+@pytest.mark.parametrize("step", [None, 1, 2, 5])
+def test_sentences_do_not_depend_on_chunking(step):
+    text = "こんにちは。「元気！」と言った。Mr. Smith paid 3.14 dollars. Really?! Yes\n次の行"
+    assert split(text, step) == ["こんにちは。", "「元気！」と言った。", "Mr. Smith paid 3.14 dollars.",
+                                 "Really?!", "Yes", "次の行"]
+
+
+def test_latin_terminator_before_japanese_closes_the_sentence():
+    assert split("すごい!次の話") == ["すごい!", "次の話"]
+
+
+def test_sentence_is_held_until_the_next_character_arrives():
+    segmenter = segment.SentenceSegmenter()
+    assert segmenter.feed("Done.") == []
+    assert segmenter.feed(" Next") == ["Done."]
+    assert segmenter.flush() == ["Next"]
+
+
+def test_paragraphs_close_on_blank_lines():
+    paragraphs = []
+    segmenter = segment.SentenceSegmenter(on_paragraph=paragraphs.append)
+    text = "猫です。\nIt's a cat.\n\n \n犬\nDog"
+    for ch in text:
+        segmenter.feed(ch)
+    assert paragraphs == ["猫です。\nIt's a cat."]
+    segmenter.flush()
+    assert paragraphs == ["猫です。\nIt's a cat.", "犬\nDog"]
+    assert segmenter.paragraphs == 2
+
+
+def test_reset_drops_the_open_paragraph():
+    paragraphs = []
+    segmenter = segment.SentenceSegmenter(on_paragraph=paragraphs.append)
+    segmenter.feed("猫\nCat")
+    segmenter.reset()
+    segmenter.feed("犬\nDog\n\n")
+    assert paragraphs == ["犬\nDog"]
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+import speech
+
+
+class FakeOutput:
+    def __init__(self, library):
+        self.written = []
+        self.closed = threading.Event()
+
+    def write(self, frame, rate, channels):
+        self.written.append(frame)
+
+    def close(self):
+        self.closed.set()
+
+
+@pytest.fixture
+def synthesized(monkeypatch):
+    texts = []
+    release = threading.Event()
+    release.set()
+
+    def synthesize(clip, api_config):
+        release.wait(2)
+        texts.append(clip.text)
+        clip.add(clip.text.encode("utf-8"), 8000)
+
+    monkeypatch.setitem(speech.SYNTHESIZERS, "sambert", (synthesize, "pyaudio"))
+    monkeypatch.setattr(speech, "PcmOutput", FakeOutput)
+    return texts, release
+
+
+def speaker():
+    return speech.IncrementalSpeech({"SPEECH": {"TYPE": "sambert", "LANG": "en"}})
+
+
+def test_sentences_are_spoken_in_order_without_the_source_text(synthesized):
+    texts, _ = synthesized
+    speaker_ = speaker()
+    speaker_.say("Hello there.")
+    speaker_.say("日本語の文です。")
+    speaker_.say("Second sentence!")
+    speaker_.close()
+    assert speaker_.output.closed.wait(2)
+    assert texts == ["Hello there.", "Second sentence!"]
+    assert b"".join(speaker_.output.written) == b"Hello there.Second sentence!"
+    assert speaker_.counters == {"sentences": 2, "spoken": 2, "skipped": 1}
+
+
+def test_cancel_pending_stops_an_older_translation(synthesized):
+    texts, release = synthesized
+    release.clear()
+    speaker_ = speaker()
+    speaker_.say("First sentence.")
+    speaker_.say("Never spoken.")
+    speaker_.close()
+    speech.cancel_pending()
+    release.set()
+    assert speaker_.output.closed.wait(2)
+    assert speaker_.output.written == []
+    assert speaker_.counters["spoken"] == 0
+    assert "Never spoken." not in texts
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import jobs
+import tiles
+
+
+def page(lines, caret=False, noise=0):
+    image = Image.new("L", (400, 400), 255)
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((10, 10 + index * 100), line, fill=0)
+    if caret:
+        draw.rectangle((300, 10, 300, 25), fill=0)
+    if noise:
+        pixels = np.asarray(image, dtype=np.int16) + np.random.default_rng(1).integers(-noise, noise + 1, (400, 400))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+
+# One line every other tile row, the blank rows separate the bands
+LINES = [f"Line {index} of the page" for index in range(4)]
+TILES_CONFIG = {"TILES": {"CONCURRENCY": "4"}}
+
+
+def test_merge_dirty_tiles_groups_neighbours():
+    tracker = tiles.TileTracker(4, 4)
+    dirty = np.zeros((4, 4), dtype=bool)
+    dirty[0, 0] = dirty[1, 1] = dirty[3, 3] = True
+    assert sorted(tracker.merge_dirty_tiles(dirty)) == [(0, 0, 2, 2), (3, 3, 4, 4)]
+
+
+def test_noise_and_a_thin_caret_are_not_changes():
+    tracker = tiles.TileTracker(8, 8)
+    with tracker.lock:
+        rects, kept, pixels, blank = tracker.plan(page(LINES))
+        tracker.commit([(rect, "x") for rect in rects], pixels, (400, 400), tracker.version)
+    for image in (page(LINES, noise=6), page(LINES, caret=True)):
+        assert tracker.plan(image)[0] == []
+    changed = list(LINES)
+    changed[1] = "Line 1 of the book"
+    assert tracker.plan(page(changed))[0] == [(2, 0, 3, 8)]
+
+
+def test_first_frame_bands_are_requested_concurrently():
+    tracker = tiles.TileTracker(8, 8)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def translate_fn(image, cfg):
+        with lock:
+            running.append(image)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        return f"band {image.size[1]}"
+
+    text = tiles.translate_changed_tiles(tracker, page(LINES), TILES_CONFIG, translate_fn)
+    assert len(tracker.segments) == 4
+    assert max(peak) > 1
+    assert text.split("\n\n") == ["band 50"] * 4
+
+
+def test_only_changed_regions_are_resent_and_spliced():
+    tracker = tiles.TileTracker(8, 8)
+    tiles.translate_changed_tiles(tracker, page(LINES), TILES_CONFIG, lambda image, cfg: "old")
+    changed = list(LINES)
+    changed[1] = "Line 1 of the book"
+    sent = []
+
+    def translate_fn(image, cfg):
+        sent.append(image)
+        return "new"
+
+    text = tiles.translate_changed_tiles(tracker, page(changed), TILES_CONFIG, translate_fn)
+    assert len(sent) == 1
+    assert text.split("\n\n") == ["old", "new", "old", "old"]
+
+
+def test_cancelled_capture_commits_nothing():
+    tracker = tiles.TileTracker(8, 8)
+    job = jobs.Job(1, "capture")
+
+    def translate_fn(image, cfg):
+        job.cancel()
+        return "text"
+
+    assert tiles.translate_changed_tiles(tracker, page(LINES), TILES_CONFIG, translate_fn, job) is None
+    assert tracker.last_pixels is None and tracker.segments == []
+
+
+def test_error_resets_the_tracker():
+    tracker = tiles.TileTracker(8, 8)
+    text = tiles.translate_changed_tiles(tracker, page(LINES), TILES_CONFIG, lambda image, cfg: "Request Error: 500")
+    assert text == "Request Error: 500"
+    assert tracker.last_pixels is None
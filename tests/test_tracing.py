@@ -0,0 +1,45 @@
+import json
+
+import tracing
+
+
+def test_percentiles_use_the_nearest_rank():
+    assert tracing.percentiles([]) == {}
+    assert tracing.percentiles(list(range(1, 101))) == {50: 50, 95: 95, 99: 99}
+    assert tracing.percentiles([3.0, 1.0, 2.0], points=(50,)) == {50: 2.0}
+
+
+def test_marks_keep_their_first_occurrence_and_stop_at_finish(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer = tracing.Tracer(file_path=str(path))
+    job = tracer.begin_job("translate")
+    tracer.mark("request_start")
+    first = job.marks["request_start"]
+    tracer.mark("request_start")
+    with tracer.span("encode"):
+        pass
+    tracer.finish()
+    tracer.mark("first_chunk", job)
+    assert job.marks == {"request_start": first}
+    assert set(job.spans) == {"encode"}
+    assert tracer.current is None
+    record = json.loads(path.read_text(encoding="utf-8"))
+    assert record["name"] == "translate" and "request_start" in record["marks"]
+
+
+def test_a_new_job_closes_the_unfinished_one():
+    tracer = tracing.Tracer(keep=2)
+    first = tracer.begin_job()
+    tracer.begin_job()
+    tracer.begin_job()
+    assert first.finished
+    assert [job["id"] for job in tracer.recent()] == [2, 3]
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = tracing.Tracer(enabled=False)
+    assert tracer.begin_job() is None
+    tracer.mark("request_start")
+    with tracer.span("encode"):
+        pass
+    assert tracer.recent() == [] and tracer.summary() == {}
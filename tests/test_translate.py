@@ -0,0 +1,65 @@
+import pytest
+
+import memory
+import translate
+
+
+@pytest.fixture
+def translation_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "_translation_memory", None)
+    api_config = {"MEMORY": {"ENABLE": "True", "PATH": str(tmp_path / "memory.sqlite3")}}
+    yield api_config, memory.get_memory(api_config)
+    memory.get_memory(api_config).close()
+
+
+def test_stream_memory_joins_chunks_and_notifies_subscribers():
+    stream = translate.TextStreamMemory()
+    seen = []
+    token = stream.subscribe(on_chunk=seen.append, on_clear=lambda: seen.append("<clear>"),
+                             on_end=lambda: seen.append("<end>"))
+    stream.append("Hel")
+    assert stream.get_text() == "Hel"
+    stream.append("lo")
+    stream.finish()
+    stream.finish()
+    assert stream.get_text() == "Hello"
+    stream.unsubscribe(token)
+    stream.clear()
+    assert seen == ["Hel", "lo", "<end>"]
+    assert stream.get_text() == ""
+
+
+def test_error_text_anywhere_marks_a_partial_translation():
+    assert translate.is_error_text("  Request Error: 500")
+    assert not translate.is_error_text("猫\nCat\n\nRequest Error: 500")
+    assert translate.contains_error_text("猫\nCat\n\nRequest Error: 500")
+
+
+def test_streamed_pairs_are_remembered_as_paragraphs_close(translation_memory):
+    api_config, tm = translation_memory
+    stream = translate.TextStreamMemory()
+    assert translate.remember_stream(api_config, stream)
+    for chunk in ["猫です。\nIt's", " a cat.\n\n犬", "\nDog"]:
+        stream.append(chunk)
+    stream.finish()
+    assert tm.lookup("猫です。") == "It's a cat."
+    assert tm.lookup("犬") == "Dog"
+
+
+def test_stream_with_a_failed_band_is_not_remembered(translation_memory):
+    api_config, tm = translation_memory
+    stream = translate.TextStreamMemory()
+    translate.remember_stream(api_config, stream)
+    stream.append("猫\nCat\n\nRequest Error: 503\n\n")
+    stream.finish()
+    assert tm.count() == 0
+
+
+def test_new_stream_drops_the_previous_one(translation_memory):
+    api_config, tm = translation_memory
+    stream = translate.TextStreamMemory()
+    translate.remember_stream(api_config, stream)
+    stream.append("猫\nCat")
+    stream.clear()
+    stream.finish()
+    assert tm.count() == 0
@@ -0,0 +1,54 @@
+import time
+
+from PIL import Image
+
+import watch
+
+
+def run_watcher(frames, trigger, settle_ms=0):
+    frames = list(frames)
+    grabbed = []
+
+    def grab():
+        image = frames[min(len(grabbed), len(frames) - 1)]
+        grabbed.append(image)
+        return image
+
+    watcher = watch.RegionWatcher(grab, trigger, is_busy=lambda: False, fps=200, settle_ms=settle_ms, cpu_target=1.0)
+    watcher.start()
+    deadline = time.monotonic() + 2
+    while len(grabbed) < len(frames) + 3 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    watcher.stop()
+    return watcher
+
+
+def test_thumbnail_diff_detects_changes():
+    black, white = Image.new("RGB", (200, 100)), Image.new("RGB", (200, 100), "white")
+    a, b = watch.luminance_thumbnail(black), watch.luminance_thumbnail(white)
+    assert a.size == (96, 48)
+    assert watch.thumbnail_diff(a, a) == 0
+    assert watch.thumbnail_diff(a, b) == 255
+
+
+def test_unchanged_screen_is_translated_once():
+    calls = []
+    watcher = run_watcher([Image.new("RGB", (64, 64))], lambda: calls.append(1))
+    assert len(calls) == 1
+    assert watcher.stats()["skipped_unchanged"] > 0
+
+
+def test_dropped_trigger_keeps_the_change_pending():
+    black, white = Image.new("RGB", (64, 64)), Image.new("RGB", (64, 64), "white")
+    answers = [True, False, True]
+    calls = []
+
+    def trigger():
+        calls.append(len(calls))
+        return answers[min(len(calls) - 1, len(answers) - 1)]
+
+    watcher = run_watcher([black, white, white, white, white], trigger)
+    # The dropped change is retried until it is accepted, then the screen is settled
+    assert len(calls) == 3
+    assert watcher.stats()["hits"] == 2
+    assert watcher.stats()["rejected"] == 1
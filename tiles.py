@@ -0,0 +1,274 @@
+"""
+Dirty-tile change detection for repeated captures of the locked region.
+
+The region is split into a grid of tiles. Each capture is compared tile by tile
+against the previous frame; only the changed tiles, merged into minimal
+bounding rectangles, are sent for translation. The translation of every
+rectangle (a segment) is kept, so the new text is spliced into the previous
+result in reading order.
+
+A tile only counts as changed when more than TOLERANCE of its pixels changed by
+more than PIXEL_DELTA grey levels: anti-aliasing and compression noise, or a thin
+blinking caret, don't trigger a request (raise TILES.TOLERANCE for a thicker caret).
+
+The first frame is seeded by horizontal bands separated by blank tile rows
+(the gaps between paragraphs or chat messages), so later changes only touch
+the bands they overlap. The rectangles of a frame are requested concurrently
+(TILES.CONCURRENCY at a time), so seeding costs about one round trip.
+
+Captures of the same region may run on two workers at once (a new capture
+while the previous one is still translating): the tracker is locked while it is
+read or updated, and a capture only commits its segments when no other capture
+committed since it planned.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import config
+import translate
+
+# Grey level difference below which a pixel counts as unchanged (anti-aliasing, compression)
+PIXEL_DELTA = 48
+
+
+class TileTracker:
+    """Keeps the last frame and the per-segment translations."""
+
+    def __init__(self, rows=8, cols=8, max_dirty_ratio=0.6, tolerance=24, blank_threshold=2.0):
+        self.rows = rows
+        self.cols = cols
+        # Above this fraction of changed tiles the whole frame is retranslated
+        self.max_dirty_ratio = max_dirty_ratio
+        # Changed pixels a tile may have and still count as unchanged
+        self.tolerance = tolerance
+        # Tiles whose pixel standard deviation is below this contain no text
+        self.blank_threshold = blank_threshold
+        self.lock = threading.RLock()
+        self.version = 0  # Bumped by every commit and reset
+        self.reset()
+
+    def reset(self):
+        """Forget the previous frame, e.g. after a new region is selected."""
+        with self.lock:
+            self.last_size = None
+            self.last_pixels = None  # Grey levels of the last committed frame
+            self.segments = []  # [(rect, text)], rect = (row0, col0, row1, col1) exclusive ends
+            self.version += 1
+
+    # Grid helpers
+
+    def _edges(self, size):
+        width, height = size
+        xs = np.linspace(0, width, self.cols + 1).astype(int)
+        ys = np.linspace(0, height, self.rows + 1).astype(int)
+        return xs, ys
+
+    def pixel_box(self, rect, size):
+        """Convert a rect in tile units to a PIL crop box."""
+        xs, ys = self._edges(size)
+        row0, col0, row1, col1 = rect
+        return (int(xs[col0]), int(ys[row0]), int(xs[col1]), int(ys[row1]))
+
+    def scan(self, image):
+        """
+        Read the grey levels of the frame and find its blank tiles.
+
+        Returns:
+            tuple: (height x width int16 array of grey levels, rows x cols boolean array of blank tiles)
+        """
+        pixels = np.asarray(image.convert("L"), dtype=np.int16)
+        xs, ys = self._edges(image.size)
+        blank = np.zeros((self.rows, self.cols), dtype=bool)
+        for row in range(self.rows):
+            for col in range(self.cols):
+                tile = pixels[ys[row]:ys[row + 1], xs[col]:xs[col + 1]]
+                blank[row, col] = tile.size == 0 or float(tile.std()) < self.blank_threshold
+        return pixels, blank
+
+    def dirty_tiles(self, pixels):
+        """
+        Compare a frame of the same size with the last one.
+
+        Returns:
+            numpy.ndarray: rows x cols boolean array, True for the tiles with more
+            than tolerance pixels changed by more than PIXEL_DELTA.
+        """
+        changed = np.abs(pixels - self.last_pixels) > PIXEL_DELTA
+        xs, ys = self._edges((pixels.shape[1], pixels.shape[0]))
+        dirty = np.zeros((self.rows, self.cols), dtype=bool)
+        for row in range(self.rows):
+            for col in range(self.cols):
+                dirty[row, col] = np.count_nonzero(changed[ys[row]:ys[row + 1], xs[col]:xs[col + 1]]) > self.tolerance
+        return dirty
+
+    # Rectangle helpers
+
+    def merge_dirty_tiles(self, dirty):
+        """Group changed tiles into connected clusters and return their bounding rectangles."""
+        seen = np.zeros_like(dirty, dtype=bool)
+        rects = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if not dirty[row, col] or seen[row, col]:
+                    continue
+                # Flood fill the cluster (8-connected)
+                stack = [(row, col)]
+                seen[row, col] = True
+                row0, col0, row1, col1 = row, col, row + 1, col + 1
+                while stack:
+                    r, c = stack.pop()
+                    row0, col0 = min(row0, r), min(col0, c)
+                    row1, col1 = max(row1, r + 1), max(col1, c + 1)
+                    for nr in range(max(0, r - 1), min(self.rows, r + 2)):
+                        for nc in range(max(0, c - 1), min(self.cols, c + 2)):
+                            if dirty[nr, nc] and not seen[nr, nc]:
+                                seen[nr, nc] = True
+                                stack.append((nr, nc))
+                rects.append((row0, col0, row1, col1))
+        return merge_overlapping(rects)
+
+    def seed_bands(self, blank):
+        """Split the frame into full width bands of non-blank tile rows."""
+        bands = []
+        start = None
+        for row in range(self.rows):
+            if not blank[row].all():
+                if start is None:
+                    start = row
+            elif start is not None:
+                bands.append((start, 0, row, self.cols))
+                start = None
+        if start is not None:
+            bands.append((start, 0, self.rows, self.cols))
+        return bands
+
+    def plan(self, image):
+        """
+        Decide which rectangles of the frame have to be translated.
+
+        Returns:
+            tuple: (rects to translate, kept segments, new frame pixels, blank tile mask)
+        """
+        pixels, blank = self.scan(image)
+        if self.last_pixels is None or self.last_size != image.size:
+            return self.seed_bands(blank), [], pixels, blank
+
+        dirty = self.dirty_tiles(pixels)
+        if not dirty.any():
+            return [], list(self.segments), pixels, blank
+        if dirty.mean() > self.max_dirty_ratio:
+            return self.seed_bands(blank), [], pixels, blank
+
+        # Grow the dirty rectangles over the segments they touch, their text must be redone
+        rects = self.merge_dirty_tiles(dirty)
+        kept = list(self.segments)
+        grown = True
+        while grown:
+            grown = False
+            for segment in kept:
+                if any(intersects(segment[0], rect) for rect in rects):
+                    rects = merge_overlapping(rects + [segment[0]])
+                    kept.remove(segment)
+                    grown = True
+                    break
+        return rects, kept, pixels, blank
+
+    def commit(self, segments, pixels, size, version):
+        """
+        Make a translated frame the new previous frame.
+
+        Returns:
+            bool: False when another capture committed (or a reset happened) since
+            the frame was planned at version; the tracker is left unchanged then.
+        """
+        with self.lock:
+            if self.version != version:
+                return False
+            self.segments = segments
+            self.last_pixels = pixels
+            self.last_size = size
+            self.version += 1
+            return True
+
+    def splice(self, segments=None):
+        """Join the segment translations in reading order (top to bottom, left to right)."""
+        segments = self.segments if segments is None else segments
+        texts = [text.strip() for _, text in sorted(segments, key=lambda seg: (seg[0][0], seg[0][1]))]
+        return "\n\n".join(text for text in texts if text)
+
+
+"""
+Merges rectangles until none of them overlap.
+"""
+def merge_overlapping(rects):
+    rects = list(rects)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                if intersects(rects[i], rects[j]):
+                    a, b = rects[i], rects[j]
+                    rects[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+def intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+"""
+Translates only the changed part of the frame and splices it into the previous result.
+
+The changed rectangles are requested concurrently, TILES.CONCURRENCY at a time.
+
+Parameters:
+    tracker (TileTracker): The tracker of the locked region.
+    image (PIL.Image): The new capture.
+    api_config (dict): The app config.
+    translate_fn (callable): translate_fn(image, api_config) -> text, e.g. translate.call_real_api;
+        called from worker threads, None means the request was cancelled.
+    job (jobs.Job): Optional job; once it is cancelled no new request is sent and nothing is committed.
+
+Returns:
+    str: The full translation of the frame, None when the job was cancelled.
+"""
+def translate_changed_tiles(tracker, image, api_config, translate_fn, job=None):
+    with tracker.lock:
+        rects, kept, pixels, blank = tracker.plan(image)
+        version = tracker.version
+    # Nothing but background, no need to ask the model
+    rects = [rect for rect in rects if not blank[rect[0]:rect[2], rect[1]:rect[3]].all()]
+    if rects:
+        print(f"Dirty tiles: translating {len(rects)} region(s), reusing {len(kept)}")
+
+    def run(rect):
+        if job is not None and job.is_cancelled():
+            return None
+        return translate_fn(image.crop(tracker.pixel_box(rect, image.size)), api_config)
+
+    texts = []
+    if rects:
+        concurrency = min(config.typed(api_config).tiles.concurrency, len(rects))
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Regions keep the caller's context (rate limit priority)
+            futures = [executor.submit(contextvars.copy_context().run, run, rect) for rect in rects]
+            texts = [future.result() for future in futures]
+
+    if any(text is None for text in texts) or (job is not None and job.is_cancelled()):
+        # Cancelled: the previous frame stays as it was, its regions are not blanked
+        return None
+    for text in texts:
+        if translate.is_error_text(text):
+            # Don't keep a half updated frame
+            tracker.reset()
+            return text
+    segments = list(kept) + list(zip(rects, texts))
+
+    # A newer capture that already committed keeps its frame, this one is still a valid answer
+    tracker.commit(segments, pixels, image.size, version)
+    return tracker.splice(segments)
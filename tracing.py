@@ -0,0 +1,185 @@
+"""
+End-to-end latency spans for translation jobs.
+
+Every hotkey starts a job; the pipeline then marks the moments that matter:
+
+    key_event      key press seen by winutil.KeyListener
+    capture        screenshot taken (span)
+    encode         image encoded for upload (span)
+    request_start  provider request sent
+    first_chunk    first streamed chunk received
+    last_chunk     response complete
+    speech_start   speech synthesis started
+    first_audio    first audio frame played
+
+All times are milliseconds since the start of the job. The last jobs are kept
+in memory (tracer.recent(), tracer.percentiles()) and can optionally be
+appended to a JSONL file, see the TRACE section of api.json5.
+"""
+import itertools
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import config
+
+
+class JobTrace:
+    """Timing marks and spans of one translation job."""
+
+    def __init__(self, job_id, name):
+        self.id = job_id
+        self.name = name
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.marks = {}
+        self.spans = {}
+        self.finished = False
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "time": self.start_time,
+            "marks": {name: round(ms, 2) for name, ms in self.marks.items()},
+            "spans": {name: [round(a, 2), round(b, 2)] for name, (a, b) in self.spans.items()},
+        }
+
+
+class Tracer:
+    """Collects job traces; marks are attached to the current job (if any)."""
+
+    def __init__(self, keep=200, file_path=None, enabled=True):
+        self.enabled = enabled
+        self.file_path = file_path
+        self.jobs = deque(maxlen=keep)
+        self.current = None
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def configure(self, keep=200, file_path=None, enabled=True):
+        with self.lock:
+            self.enabled = enabled
+            self.file_path = file_path or None
+            self.jobs = deque(self.jobs, maxlen=keep)
+
+    def begin_job(self, name="translate"):
+        """Start a new job; an unfinished previous job is closed first."""
+        if not self.enabled:
+            return None
+        previous = self.current
+        if previous is not None:
+            self.finish(previous)
+        job = JobTrace(next(self._ids), name)
+        with self.lock:
+            self.jobs.append(job)
+            self.current = job
+        return job
+
+    def mark(self, name, job=None):
+        """Record the first occurrence of a named moment."""
+        job = job or self.current
+        if job is None or job.finished:
+            return
+        with self.lock:
+            job.marks.setdefault(name, job.elapsed_ms())
+
+    @contextmanager
+    def span(self, name, job=None):
+        """Record the start and end of a stage."""
+        job = job or self.current
+        if job is None or job.finished:
+            yield
+            return
+        start = job.elapsed_ms()
+        try:
+            yield
+        finally:
+            with self.lock:
+                job.spans[name] = (start, job.elapsed_ms())
+
+    def finish(self, job=None):
+        """Close the job and append it to the JSONL file if configured."""
+        job = job or self.current
+        if job is None or job.finished:
+            return
+        with self.lock:
+            job.finished = True
+            if self.current is job:
+                self.current = None
+            file_path = self.file_path
+        if file_path:
+            try:
+                with open(file_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(job.to_dict(), ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Error writing trace file: {e}")
+
+    def recent(self, n=20):
+        """The last n jobs as dicts, newest last."""
+        with self.lock:
+            return [job.to_dict() for job in list(self.jobs)[-n:]]
+
+    def percentiles(self, name, n=None, points=(50, 95, 99)):
+        """
+        Percentiles of a mark (or of a span's duration) over the last n jobs.
+
+        Returns:
+            dict: {50: ms, 95: ms, 99: ms}, empty when no job has the value.
+        """
+        with self.lock:
+            jobs = list(self.jobs)[-n:] if n else list(self.jobs)
+            values = []
+            for job in jobs:
+                if name in job.marks:
+                    values.append(job.marks[name])
+                elif name in job.spans:
+                    start, end = job.spans[name]
+                    values.append(end - start)
+        return percentiles(values, points)
+
+    def summary(self, n=None):
+        """Percentiles of every known mark and span."""
+        with self.lock:
+            names = []
+            for job in self.jobs:
+                for name in itertools.chain(job.marks, job.spans):
+                    if name not in names:
+                        names.append(name)
+        return {name: self.percentiles(name, n) for name in names}
+
+
+"""
+Nearest-rank percentiles of a list of values.
+"""
+def percentiles(values, points=(50, 95, 99)):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        rank = max(0, min(len(ordered) - 1, math.ceil(point / 100 * len(ordered)) - 1))
+        result[point] = round(ordered[rank], 2)
+    return result
+
+
+# Create single instance
+tracer = Tracer()
+
+"""
+Applies the TRACE section of api.json5 to the process-wide tracer.
+"""
+def configure(api_config):
+    trace_config = config.typed(api_config or {}).trace
+    file_path = trace_config.file
+    if file_path:
+        file_path = config.get_resource_path(file_path, external=True)
+    tracer.configure(
+        keep=trace_config.keep,
+        file_path=file_path,
+        enabled=trace_config.enable)
@@ -1,46 +1,451 @@
-import gemini
-import openchat
+import backends
 import speech
+import encoder
+import bands
+import config
+import ocr
+import memory
+import segment
+import tracing
+import providers
+import hedge
+import health
+import ratelimit
+import asyncio
 import threading
+import time
+from collections import deque
 
 class TextStreamMemory:
+    """
+    Text of the translation being streamed.
+
+    Chunks are kept in a list and joined once when the text is read, so a long
+    stream costs linear time instead of a copy of the whole text per chunk.
+    Consumers (e.g. a segment.SentenceSegmenter) subscribe to follow the stream
+    as it arrives instead of re-scanning the complete text at the end.
+    """
     def __init__(self):
         """Initialize with empty text storage."""
-        self.text = ""
+        self.chunks = []
+        self._text = ""  # Join of chunks[:self._joined]
+        self._joined = 0
+        self.finished = False
+        self.subscribers = {}
+        self._next_token = 0
+        self.lock = threading.Lock()
     
+    def subscribe(self, on_chunk=None, on_clear=None, on_end=None):
+        """
+        Registers callbacks: on_chunk(text) per appended chunk, on_clear() when a
+        new stream starts and on_end() when the stream is finished.
+
+        Returns:
+            int: Token for unsubscribe().
+        """
+        with self.lock:
+            self._next_token += 1
+            self.subscribers[self._next_token] = (on_chunk, on_clear, on_end)
+            return self._next_token
+
+    def unsubscribe(self, token):
+        with self.lock:
+            self.subscribers.pop(token, None)
+
+    def _notify(self, index, *args):
+        with self.lock:
+            callbacks = [entry[index] for entry in self.subscribers.values() if entry[index]]
+        for callback in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                # A failing consumer must not break the stream
+                print(f"Error in stream subscriber: {e}")
+
     def append(self, new_text):
         """Append new text to the stream."""
-        self.text += new_text
-        return self.text  # Returns current state for convenience
+        if not new_text:
+            return
+        with self.lock:
+            self.chunks.append(new_text)
+        self._notify(0, new_text)
     
     def clear(self):
         """Clear all stored text."""
-        self.text = ""
+        with self.lock:
+            self.chunks = []
+            self._text = ""
+            self._joined = 0
+            self.finished = False
+        self._notify(1)
+
+    def finish(self):
+        """Mark the end of the stream, subscribers flush what they buffered."""
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+        self._notify(2)
         
     def get_text(self):
         """Return the current complete text."""
-        return self.text
+        with self.lock:
+            if self._joined < len(self.chunks):
+                # Only the chunks that arrived since the last read are joined
+                self._text += "".join(self.chunks[self._joined:])
+                self._joined = len(self.chunks)
+            return self._text
 
 streamed_text = TextStreamMemory()
 
+# Every provider reports failures as plain text starting with one of these
+ERROR_PREFIXES = ("Request Error", "HTTP Error", "JSON Decode Error", "Error preparing image")
+
+"""
+Checks whether a text returned by a provider is an error message instead of a translation.
+"""
+def is_error_text(text):
+    return bool(text) and text.lstrip().startswith(ERROR_PREFIXES)
+
+"""
+Checks whether a translation contains an error message anywhere, e.g. a failed
+band streamed inline between the bands that succeeded. Such a text is partial
+and must not be cached or remembered.
+"""
+def contains_error_text(text):
+    return bool(text) and any(line.lstrip().startswith(ERROR_PREFIXES) for line in text.splitlines())
+
+
+"""
+Selects the provider functions for the configured API.
+
+Returns:
+    tuple: (stream function, non-stream function), both taking an encoder.ImagePayload.
+"""
+def select_backend(api_config):
+    # Only the configured provider module (and its SDK) is imported, on first use
+    backend = backends.get(api_config)
+    # Every caller (hotkeys, watch, bands, hedges, failover, batch) shares the provider's budget
+    if ratelimit.is_enabled(api_config):
+        return ratelimit.wrap_backend(*backend, api_config)
+    return backend
+
+# Timings of the most recent requests, one dict per request:
+# {"path": "text" | "image", "ocr_ms", "encode_ms", "encode_bytes", "image_format", "request_ms", "ocr_confidence"}
+request_timings = deque(maxlen=100)
+# The same dict of the last request made by each thread
+_thread_timings = threading.local()
+
+"""
+Returns:
+    dict: Timings of the last request started by the calling thread ({} if none),
+    unaffected by requests running concurrently in other threads.
+"""
+def last_timings():
+    return getattr(_thread_timings, "timings", {})
+
+"""
+Runs the optional local OCR stage.
+
+Returns:
+    tuple: (ocr.TextPayload or None, timings dict). None means the image path
+    must be used, either because OCR is disabled or its confidence is too low.
+"""
+def run_ocr(image, api_config):
+    timings = {"path": "image"}
+    backend = ocr.get_backend(api_config)
+    if backend is None or isinstance(image, encoder.ImagePayload):
+        return None, timings
+    try:
+        result = backend.recognize(image)
+    except Exception as e:
+        print(f"OCR failed, using the image: {e}")
+        return None, timings
+
+    timings["ocr_ms"] = result.elapsed_ms
+    timings["ocr_confidence"] = result.confidence
+    if not result.text or result.confidence < ocr.min_confidence(api_config):
+        print(f"OCR confidence {result.confidence:.2f} too low, using the image")
+        return None, timings
+    timings["path"] = "text"
+    return ocr.TextPayload(result.text), timings
+
+"""
+Serves the OCR text from the translation memory where possible.
+
+Returns:
+    tuple: (ocr.TextPayload with only the unknown paragraphs or None when every
+    paragraph is known, formatted pairs of the known paragraphs, number of known paragraphs)
+"""
+def split_known_paragraphs(payload, api_config):
+    translation_memory = memory.get_memory(api_config)
+    if translation_memory is None:
+        return payload, "", 0
+    paragraphs = [line.strip() for line in payload.text.split("\n") if line.strip()]
+    known = translation_memory.lookup_many(paragraphs)
+    known_pairs = [(p, known[memory.normalize(p)]) for p in paragraphs if memory.normalize(p) in known]
+    unknown = [p for p in paragraphs if memory.normalize(p) not in known]
+    remaining = ocr.TextPayload("\n".join(unknown)) if unknown else None
+    return remaining, memory.format_pairs(known_pairs), len(known_pairs)
+
+"""
+Remembers the paragraph pairs of a finished translation in the translation memory.
+"""
+def remember_translation(text, api_config):
+    translation_memory = memory.get_memory(api_config)
+    if translation_memory is None or not text or contains_error_text(text):
+        return
+    try:
+        translation_memory.record_text(text)
+    except Exception as e:
+        print(f"Error updating translation memory: {e}")
+
+"""
+Remembers the paragraph pairs of a streamed translation as the paragraphs close.
+
+Subscribes a segment.SentenceSegmenter to the stream memory: each finished
+paragraph is parsed while the rest is still streaming, the end of the stream
+only stores the pairs. A stream with an error paragraph (e.g. a failed band)
+stores nothing, like remember_translation. Starting a new stream (clear())
+drops this one.
+
+Returns:
+    bool: True when subscribed, False when the translation memory is disabled.
+"""
+def remember_stream(api_config, stream=streamed_text):
+    translation_memory = memory.get_memory(api_config)
+    if translation_memory is None:
+        return False
+    pairs = []
+    failed = []
+
+    def on_paragraph(paragraph):
+        if contains_error_text(paragraph):
+            failed.append(paragraph)
+        else:
+            pairs.extend(memory.parse_pairs(paragraph))
+
+    segmenter = segment.SentenceSegmenter(on_paragraph=on_paragraph)
+    token = None
+
+    def end(flush=True):
+        stream.unsubscribe(token)
+        if not flush:
+            return
+        segmenter.flush()
+        if not pairs or failed:
+            return
+        try:
+            translation_memory.add_pairs(pairs)
+        except Exception as e:
+            print(f"Error updating translation memory: {e}")
+
+    token = stream.subscribe(on_chunk=segmenter.feed, on_clear=lambda: end(flush=False), on_end=end)
+    return True
+
+"""
+Wraps a stream callback to mark the first and last chunk of the job.
+
+The job trace is the one captured when the request started: a late chunk of a
+superseded request must not mark the trace of the job that replaced it.
+"""
+def traced_callback(callback, job):
+    def traced(text, end=False):
+        if end:
+            tracing.tracer.mark("last_chunk", job)
+        elif text:
+            tracing.tracer.mark("first_chunk", job)
+        callback(text, end=end)
+    return traced
+
+"""
+Runs the stages before the request: local OCR and the translation memory.
+
+Returns:
+    tuple: (ocr.TextPayload with the unknown paragraphs or None, formatted
+    pairs of the known paragraphs, timings dict). timings["path"] is "memory"
+    when every paragraph is known and no request is needed.
+"""
+def prepare_request(image, api_config):
+    # Local OCR first, the provider then only gets the text
+    payload, timings = run_ocr(image, api_config)
+    request_timings.append(timings)
+    _thread_timings.timings = timings
+
+    # Known paragraphs are served from the translation memory, only the rest goes to the model
+    known_text = ""
+    if payload is not None:
+        payload, known_text, timings["memory_hits"] = split_known_paragraphs(payload, api_config)
+        if payload is None:
+            timings["path"] = "memory"
+    return payload, known_text, timings
+
 # Function to call API for OCR and translation
-def call_real_api(image, api_config, callback=None):
-    # Check if the API is compatible with OpenAI
-    openai_compatible = api_config["API"]["OPENAI_COMPATIBLE"]
-    # No value then not compatible
-    if not openai_compatible:
-        # Gemini API
-        return gemini.call_gemini_api_stream(image, api_config, callback) if callback else gemini.call_gemini_api_client(image, api_config)
-    
-    # Check if the API is compatible with OpenAI
-    openai_compatible = openai_compatible.lower()
-    compatible_result = True if openai_compatible == "true" or openai_compatible == "yes" else False
-    if compatible_result:
-        # OpenAI API
-        return openchat.call_openai_api_stream(image, api_config, callback) if callback else openchat.call_openai_api_client(image, api_config)
-    else:
-        # Gemini API
-        return gemini.call_gemini_api_stream(image, api_config, callback) if callback else gemini.call_gemini_api_client(image, api_config)
+# image: PIL image or an already encoded encoder.ImagePayload
+# job: the jobs.Job of the request, cancelling it stops the bands not sent yet
+def call_real_api(image, api_config, callback=None, job=None):
+    # PROVIDERS profiles: the first one is used, hedging races the others against it
+    # and failover (FAILOVER) moves on to the next healthy one when it fails
+    profile_list = providers.profiles(api_config)
+    hedged = hedge.is_enabled(api_config) and len(profile_list) > 1
+    api_config = profile_list[0].api_config
+    stream_fn, client_fn = select_backend(api_config)
+    trace = tracing.tracer.current
+    if callback:
+        callback = traced_callback(callback, trace)
+
+    def send(payload, cfg, on_chunk):
+        # Hedging and failover apply to every streamed request, a whole capture or one band
+        if hedged:
+            return hedge.call_hedged(payload, cfg, on_chunk, profile_list)
+        if health.is_enabled(cfg):
+            return health.call_with_failover(payload, cfg, on_chunk, profile_list)
+        return stream_fn(payload, cfg, on_chunk)
+
+    payload, known_text, timings = prepare_request(image, api_config)
+    if timings["path"] == "memory":
+        return replay_text(known_text, callback)
+    if known_text and callback:
+        callback(known_text, end=False)
+
+    # Tall captures can be split into bands translated in parallel
+    in_bands = (payload is None and callback and not isinstance(image, encoder.ImagePayload)
+                and bands.should_use_bands(image, api_config))
+
+    if payload is None and not in_bands:
+        # Encode once, every backend (and any retry) shares the same payload
+        try:
+            payload = encoder.as_payload(image, api_config)
+        except Exception as e:
+            formatted_text = f"Error preparing image: {e}"
+            if callback:
+                callback(formatted_text, end=True)
+                return ""
+            return formatted_text
+        if payload.stats:
+            timings.update(payload.stats.to_timings())
+
+    start = time.perf_counter()
+    tracing.tracer.mark("request_start", trace)
+    try:
+        if in_bands:
+            return bands.translate_in_bands(image, api_config, callback, send, job)
+        if callback:
+            return send(payload, api_config, callback)
+        if hedged:
+            formatted_text = hedge.call_hedged(payload, api_config, None, profile_list)
+        elif health.is_enabled(api_config):
+            # Healthy providers in order, failing over instead of showing an error
+            formatted_text = health.call_with_failover(payload, api_config, None, profile_list)
+        else:
+            formatted_text = client_fn(payload, api_config)
+        tracing.tracer.mark("last_chunk", trace)
+        return known_text + formatted_text if known_text and not is_error_text(formatted_text) else formatted_text
+    finally:
+        timings["request_ms"] = (time.perf_counter() - start) * 1000
+
+"""
+Selects the async provider stream (aio event loop) for the configured API.
+"""
+def select_async_backend(api_config):
+    stream_async = backends.get_async(api_config)
+    if ratelimit.is_enabled(api_config):
+        return ratelimit.wrap_async(stream_async, api_config)
+    return stream_async
+
+"""
+Async variant of call_real_api: yields the translation chunk by chunk.
+
+Runs on the aio event loop; OCR and encoding run in the default executor so the
+loop is never blocked. Failures are yielded as the last chunk (see
+is_error_text). Cancelling the consuming task stops the request and closes the
+HTTP response. job is the trace of the request (default: the current one).
+"""
+async def stream_real_api(image, api_config, job=None):
+    job = job or tracing.tracer.current
+    loop = asyncio.get_running_loop()
+    api_config = providers.primary(api_config).api_config
+    stream_async = select_async_backend(api_config)
+
+    payload, known_text, timings = await loop.run_in_executor(None, prepare_request, image, api_config)
+    if known_text:
+        yield known_text
+    if timings["path"] == "memory":
+        return
+
+    if payload is None and not isinstance(image, encoder.ImagePayload) and bands.should_use_bands(image, api_config):
+        tracing.tracer.mark("request_start", job)
+        async for chunk in bands.translate_in_bands_async(image, api_config, stream_async):
+            yield chunk
+        return
+
+    if payload is None:
+        try:
+            payload = await loop.run_in_executor(None, encoder.as_payload, image, api_config)
+        except Exception as e:
+            yield f"Error preparing image: {e}"
+            return
+        if payload.stats:
+            timings.update(payload.stats.to_timings())
+
+    start = time.perf_counter()
+    tracing.tracer.mark("request_start", job)
+    try:
+        async for chunk in stream_async(payload, api_config):
+            yield chunk
+    except Exception as e:
+        yield f"Request Error: {e}"
+    finally:
+        timings["request_ms"] = (time.perf_counter() - start) * 1000
+
+"""
+Async variant of call_real_api with the same callback protocol, for callers
+that want chunks pushed to them (e.g. the app's renderer).
+
+Returns:
+    str: The whole translation when no callback is given, otherwise "".
+"""
+async def call_real_api_async(image, api_config, callback=None, job=None):
+    job = job or tracing.tracer.current
+    if callback:
+        callback = traced_callback(callback, job)
+    chunks = []
+    async for chunk in stream_real_api(image, api_config, job):
+        if is_error_text(chunk):
+            if callback:
+                callback(chunk, end=True)
+                return ""
+            return chunk
+        chunks.append(chunk)
+        if callback:
+            callback(chunk, end=False)
+    if callback:
+        callback("", end=True)
+        return ""
+    tracing.tracer.mark("last_chunk", job)
+    return "".join(chunks)
+
+"""
+Starts a translation on the aio event loop.
+
+Returns:
+    concurrent.futures.Future: cancel() it to stop the request mid-stream.
+"""
+def submit_real_api(image, api_config, callback=None):
+    import aio
+    # The loop runs other jobs too, the trace is taken in the calling thread
+    return aio.submit(call_real_api_async(image, api_config, callback, tracing.tracer.current))
+
+"""
+Delivers a complete text (cache, translation memory) through the same stream
+callback used by the providers, so the UI and speech behave exactly like a live response.
+"""
+def replay_text(text, callback=None):
+    if callback is None:
+        return text
+    callback(text, end=False)
+    callback("", end=True)
+    return ""
 
 
 """
@@ -62,29 +467,68 @@ def call_speech(text, api_config):
     # Set the global variable to the API configuration
     speech._app_config = api_config
     # Check whether streaming speech
-    speech_stream = speech._app_config["SPEECH"]["STREAM"]
-    if not speech_stream:
-        return None
-    
-    speech_stream = speech_stream.lower()
-    speech_result = True if speech_stream == "true" or speech_stream == "yes" else False
-    if speech_result:
-        speech_type = api_config["SPEECH"]["TYPE"]
+    speech_config = config.typed(api_config).speech
+    job = tracing.tracer.current
+    if speech_config.stream:
+        speech_type = speech_config.type
         # daemon thread for speeching
         if speech_type == "kokoro-online":
-            thread = threading.Thread(target=speech.call_kokoro_online, args=(text, api_config), daemon=True)
+            target = speech.call_kokoro_online
         elif speech_type == "sambert":
-            thread = threading.Thread(target=speech.call_sambert_client, args=(text, api_config), daemon=True)
+            target = speech.call_sambert_client
         elif speech_type == "kokoro-offline":
-            thread = threading.Thread(target=speech.call_kokoro_offline, args=(text, api_config), daemon=True)
+            target = speech.call_kokoro_offline
         else:
+            tracing.tracer.finish(job)
             return None
+
+        # The job is complete once the speech has been played
+        # A newer translation cancels this speech through speech.cancel_pending()
+        generation = speech.current_generation()
+        def speak():
+            try:
+                if speech.is_current(generation):
+                    target(text, api_config, generation, job)
+            finally:
+                tracing.tracer.finish(job)
+
+        tracing.tracer.mark("speech_start", job)
+        thread = threading.Thread(target=speak, daemon=True)
         thread.start()
         return thread
     
+    tracing.tracer.finish(job)
     return None
         
 
+"""
+Speaks a streamed translation sentence by sentence while it is still arriving.
+
+Subscribes a segment.SentenceSegmenter to the stream memory: each completed
+sentence goes to speech.IncrementalSpeech, the end of the stream speaks the
+rest. Starting a new stream (memory.clear()) closes this one.
+
+Returns:
+    speech.IncrementalSpeech or None: The speaker, None when incremental speech is off.
+"""
+def speak_stream(api_config, memory=streamed_text):
+    speech._app_config = api_config
+    speech_config = config.typed(api_config).speech
+    if not (speech_config.stream and speech_config.incremental) or speech_config.type not in speech.SYNTHESIZERS:
+        return None
+    speaker = speech.IncrementalSpeech(api_config, tracing.tracer.current)
+    segmenter = segment.SentenceSegmenter(on_sentence=speaker.say)
+    token = None
+
+    def end(flush=True):
+        memory.unsubscribe(token)
+        if flush:
+            segmenter.flush()
+        speaker.close()
+
+    token = memory.subscribe(on_chunk=segmenter.feed, on_clear=lambda: end(flush=False), on_end=end)
+    return speaker
+
 # use for testing
 _all_text = ""
 _all_cfg = None
@@ -0,0 +1,157 @@
+"""
+Watch mode - retranslate the locked region automatically when it changes.
+
+The watcher samples the region at a low frame rate, compares a small grayscale
+thumbnail with the frame that was last translated and, once a meaningful change
+has been seen, waits for the screen to settle (debounce) before triggering the
+normal translate pipeline. Sampling pauses while a translation is in flight,
+and the sampling interval stretches automatically so that the watcher stays
+under its CPU budget.
+"""
+import threading
+import time
+from PIL import Image, ImageChops, ImageStat
+
+
+"""
+Reduces a capture to a small luminance thumbnail, cheap to diff.
+"""
+def luminance_thumbnail(image, width=96):
+    gray = image.convert("L")
+    height = max(1, int(gray.height * width / max(1, gray.width)))
+    return gray.resize((width, height), Image.BILINEAR)
+
+"""
+Mean absolute luminance difference (0-255) between two thumbnails.
+"""
+def thumbnail_diff(a, b):
+    if a.size != b.size:
+        return 255.0
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0]
+
+
+class RegionWatcher:
+    """
+    Samples a region and calls trigger() once the content changed and settled.
+
+    Parameters:
+        grab (callable): grab() -> PIL.Image of the watched region, or None.
+        trigger (callable): Starts a translation of the region; returns False when
+            it was not accepted (dropped), the change is then retried.
+        is_busy (callable): Returns True while a translation is in flight.
+        fps (float): Maximum sampling rate.
+        threshold (float): Mean luminance diff that counts as a change.
+        settle_ms (int): How long the screen must stay still before triggering.
+        cpu_target (float): Fraction of one core the sampling may use.
+    """
+
+    def __init__(self, grab, trigger, is_busy, fps=2.0, threshold=3.0, settle_ms=500,
+                 cpu_target=0.02, thumb_width=96):
+        self.grab = grab
+        self.trigger = trigger
+        self.is_busy = is_busy
+        self.min_interval = 1.0 / max(0.1, fps)
+        self.threshold = threshold
+        self.settle_seconds = settle_ms / 1000.0
+        self.cpu_target = cpu_target
+        self.thumb_width = thumb_width
+        self.interval = self.min_interval
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.samples = 0
+        self.hits = 0  # translations triggered
+        self.rejected = 0  # triggers that were not accepted
+        self.skipped_unchanged = 0
+        self.skipped_unsettled = 0
+        self.skipped_busy = 0
+        self.sample_seconds = 0.0
+
+    def stats(self):
+        """Return the hit/skip counters of the current session."""
+        return {
+            "samples": self.samples,
+            "hits": self.hits,
+            "rejected": self.rejected,
+            "skipped_unchanged": self.skipped_unchanged,
+            "skipped_unsettled": self.skipped_unsettled,
+            "skipped_busy": self.skipped_busy,
+            "interval_ms": round(self.interval * 1000),
+            "sample_seconds": round(self.sample_seconds, 3),
+        }
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        self.stop_event.clear()
+        self.reset_counters()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.thread = None
+
+    def _run(self):
+        reference = None  # thumbnail of the last translated frame
+        previous = None   # thumbnail of the previous sample
+        still_since = None  # when the content stopped moving
+
+        while not self.stop_event.wait(self.interval):
+            if self.is_busy():
+                # Don't sample while translating, the result would be stale anyway
+                self.skipped_busy += 1
+                previous = None
+                continue
+
+            sample_start = time.perf_counter()
+            image = self.grab()
+            if image is None:
+                continue
+            thumb = luminance_thumbnail(image, self.thumb_width)
+            self.samples += 1
+            now = time.monotonic()
+
+            if reference is None:
+                # The first sample is what is on screen right now, translate it once
+                if self._fire():
+                    reference = thumb
+            elif thumbnail_diff(thumb, reference) <= self.threshold:
+                self.skipped_unchanged += 1
+            else:
+                if still_since is None or previous is None or thumbnail_diff(thumb, previous) > self.threshold:
+                    # Still moving (scrolling, typing animation), debounce
+                    still_since = now
+                if now - still_since >= self.settle_seconds:
+                    # Only a translated frame becomes the reference, a dropped one is retried
+                    if self._fire():
+                        reference = thumb
+                    still_since = None
+                else:
+                    self.skipped_unsettled += 1
+            previous = thumb
+
+            # Keep the sampling cost under the CPU budget. Wall time is used because
+            # the screen grab may run in a helper process (screencapture on macOS).
+            cost = time.perf_counter() - sample_start
+            self.sample_seconds += cost
+            self.interval = max(self.min_interval, cost / max(self.cpu_target, 1e-3))
+
+    def _fire(self):
+        try:
+            accepted = self.trigger()
+        except Exception as e:
+            print(f"Watch mode trigger failed: {e}")
+            accepted = False
+        if accepted is False:
+            self.rejected += 1
+            return False
+        self.hits += 1
+        return True
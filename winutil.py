@@ -6,7 +6,7 @@ transparent overlay window with a control panel for managing the overlay.
 from AppKit import NSScreen, NSWorkspace, NSApplicationActivateIgnoringOtherApps
 from Cocoa import NSEvent, NSKeyDownMask
 import tkinter as tk
-import time
+import tracing
 
 def switch_to_app(app_name):
     workspace = NSWorkspace.sharedWorkspace()
@@ -28,13 +28,32 @@ def get_screen_size():
 class RegionManager:
     def __init__(self):
         self.last_region = None
+        self.tile_tracker = None
         
     def select_region(self, region):
         self.last_region = region
+        # A new region invalidates the last frame and the per-tile results
+        if self.tile_tracker:
+            self.tile_tracker.reset()
         
     def get_last_region(self):
         return self.last_region
 
+    """
+    Opt-in dirty-tile mode: keep the last frame of the locked region so that
+    subsequent captures only send the changed tiles for translation.
+    """
+    def enable_dirty_tiles(self, rows=8, cols=8, max_dirty_ratio=0.6, tolerance=24):
+        # numpy is only needed by this mode
+        import tiles
+        self.tile_tracker = tiles.TileTracker(rows, cols, max_dirty_ratio, tolerance)
+
+    # The tracker only applies while a region is locked
+    def get_tile_tracker(self):
+        if self.last_region is None:
+            return None
+        return self.tile_tracker
+
 # Create single instance
 region_manager = RegionManager()
 
@@ -256,51 +275,39 @@ class ScreenCaptureWindow:
             self.canvas = None
 
 
+"""
+Slides a window from start_x to final_x with Tk timers (window.after), the
+caller and the event loop are never blocked: the function returns at once and
+the window keeps handling events while it moves.
+
+Parameters:
+    on_done (callable): Optional, called once the window is in place.
+"""
+def slide_window(window, start_x, final_x, y, width, height, animation_duration=0.1, steps=20, on_done=None):
+    delay_ms = max(1, int(animation_duration * 1000 / steps))
+    window.geometry(f"{width}x{height}+{start_x}+{y}")
+
+    def step(index):
+        current_x = start_x + int((final_x - start_x) * index / steps)
+        window.geometry(f"{width}x{height}+{current_x}+{y}")
+        if index < steps:
+            window.after(delay_ms, step, index + 1)
+        elif on_done:
+            on_done()
+
+    window.after(delay_ms, step, 1)
+
 # animate your tkinter window sliding in from the right side of the screen:
-def animate_window_from_right(window, final_x, start_y, width, height, animation_duration=0.1):
-    # Get screen width
-    screen_width = window.winfo_screenwidth()
-    
+def animate_window_from_right(window, final_x, start_y, width, height, animation_duration=0.1, on_done=None):
     # Start position (off-screen to the right)
-    start_x = screen_width
-    
-    # Set initial window position and size
-    window.geometry(f"{width}x{height}+{start_x}+{start_y}")
-    window.update()
-    
-    # Calculate animation steps
-    steps = 30
-    delay = animation_duration / steps
-    distance_per_step = (start_x - final_x) / steps
-    
-    # Animate window sliding in
-    for step in range(steps + 1):
-        current_x = start_x - int(step * distance_per_step)
-        window.geometry(f"{width}x{height}+{current_x}+{start_y}")
-        window.update()
-        time.sleep(delay)
+    start_x = window.winfo_screenwidth()
+    slide_window(window, start_x, final_x, start_y, width, height, animation_duration, 30, on_done)
 
 # animate your tkinter window sliding in from the left side of the screen
-def animate_window_from_left(window, final_x, start_y, width, height, animation_duration=0.1):
+def animate_window_from_left(window, final_x, start_y, width, height, animation_duration=0.1, on_done=None):
     # Start position (off-screen to the left)
     start_x = -width
-    
-    # Set initial window position and size
-    window.geometry(f"{width}x{height}+{start_x}+{start_y}")
-    window.update()
-    
-    # Calculate animation steps
-    steps = 20
-    delay = animation_duration / steps
-    distance_per_step = (final_x - start_x) / steps
-    
-    # Animate window sliding in
-    for step in range(steps + 1):
-        current_x = start_x + int(step * distance_per_step)
-        window.geometry(f"{width}x{height}+{current_x}+{start_y}")
-        window.update()
-        time.sleep(delay)
-
+    slide_window(window, start_x, final_x, start_y, width, height, animation_duration, 20, on_done)
 
 
 # Mouse event masks
@@ -404,6 +411,7 @@ class MouseListener:
 NSKeyCTRLTMask = 1 << 1 # ctrl + t
 NSKeyCTRLCMDTMask = 1 << 2 # ctrl + cmd + t
 NSKeyCTRLCMDRMask = 1 << 3 # ctrl + cmd + r
+NSKeyCTRLCMDWMask = 1 << 4 # ctrl + cmd + w
 
 class KeyListener:
     def __init__(self, notify=None):
@@ -416,6 +424,8 @@ class KeyListener:
 
     ctrl + t: APP_EVENT_CT
     ctrl + cmd + t: APP_EVENT_CMT
+    ctrl + cmd + r: APP_EVENT_CMR
+    ctrl + cmd + w: APP_EVENT_CMW
     """
     def handle_event(self, event):
         if not self.notify:
@@ -433,19 +443,31 @@ class KeyListener:
         # Check for Ctrl+T
         if key_code == 17 and (modifiers & control_key_mask) and not (modifiers & command_key_mask):            
             print("Ctrl+T was pressed!")
+            self._begin_job()
             self.notify(NSKeyCTRLTMask)            
         # Check for Ctrl+Cmd+T
         elif key_code == 17 and (modifiers & control_key_mask) and (modifiers & command_key_mask):
             print("Ctrl+Cmd+T was pressed!")
+            self._begin_job()
             self.notify(NSKeyCTRLCMDTMask)
         # Check for Ctrl+Cmd+R
         elif key_code == 15 and (modifiers & control_key_mask) and (modifiers & command_key_mask):
             print("Ctrl+Cmd+R was pressed!")
+            self._begin_job()
             self.notify(NSKeyCTRLCMDRMask)
+        # Check for Ctrl+Cmd+W
+        elif key_code == 13 and (modifiers & control_key_mask) and (modifiers & command_key_mask):
+            print("Ctrl+Cmd+W was pressed!")
+            self.notify(NSKeyCTRLCMDWMask)
         else:
             #self.event_queue.put(f"Key: {key_char}, Code: {key_code}, Modifiers: {modifiers}")
             pass
 
+    # Every translation hotkey starts a new traced job
+    def _begin_job(self):
+        tracing.tracer.begin_job()
+        tracing.tracer.mark("key_event")
+
     def start(self):
         # Set up a global monitor for key events
         mask = NSKeyDownMask